@@ -54,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -87,9 +88,52 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Workers keep their connection between requests
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Reads of safe requests go to replicas, users are pinned to the primary
+# for REPLICA_PIN_SECONDS after their writes
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'],
+        HOST=os.environ.get('DB_REPLICA_HOST'),
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append('replica')
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+REPLICA_HEALTH_CHECK_INTERVAL = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+# List caches, filter indexes, token state and replica pins are
+# invalidated through the cache, so every server process must share it.
+# Without CACHE_LOCATION each process has its own cache and gunicorn runs
+# a single worker (see gunicorn.conf.py).
+if os.environ.get('CACHE_LOCATION'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': os.environ['CACHE_LOCATION'].split(','),
+            'OPTIONS': {
+                # Matches `memcached -I 4m`, filter indexes of large
+                # accounts exceed the default 1 MB
+                'server_max_value_length': 4 * 2 ** 20,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
@@ -133,5 +177,61 @@ MEDIA_URL = '/media/'
 STATIC_ROOT = '/vol/web/static'
 MEDIA_ROOT = '/vol/web/media'
 
+# Uploads are named by content hash, run `gc_images` to remove orphans
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
+# Media bytes are sent by the front server when it supports it:
+# 'x-sendfile' (Apache, lighttpd) or 'x-accel-redirect' (nginx, serving
+# MEDIA_ROOT from an internal location at MEDIA_ACCEL_REDIRECT_PREFIX)
+MEDIA_SERVE_PREFIXES = ('uploads/',)
+MEDIA_SENDFILE_BACKEND = os.environ.get('MEDIA_SENDFILE_BACKEND') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Uploaded recipe images are optimized off the request thread. Jobs are
+# kept in memory by the worker and lost when it restarts, run
+# `resume_image_processing` periodically to process images left behind
+IMAGE_PROCESSING_ASYNC = True
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+IMAGE_MAX_DIMENSION = 1600
+IMAGE_JPEG_QUALITY = 85
+
+# Resized image variants served from /media/recipe/<file>?w=&fmt=
+IMAGE_VARIANT_WIDTHS = (100, 200, 400, 800)
+IMAGE_VARIANT_CACHE_DIR = '/vol/web/cache/variants'
+IMAGE_VARIANT_CACHE_SIZE = int(
+    os.environ.get('IMAGE_VARIANT_CACHE_SIZE', 512 * 2 ** 20)
+)
+
+
+# Users whose autocomplete indexes are kept in memory by each process
+AUTOCOMPLETE_MAX_USERS = 1000
+
+# Text search configuration of recipe search vectors on PostgreSQL
+RECIPE_SEARCH_CONFIG = 'english'
+
+# Read recipe counts of tags and ingredients from counters maintained on
+# relation writes instead of counting them in list queries, for accounts
+# with very many recipes
+RECIPE_COUNT_FROM_COUNTERS = \
+    os.environ.get('RECIPE_COUNT_FROM_COUNTERS') in ('1', 'true')
 
 AUTH_USER_MODEL = 'core.User'
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 100)),
+}
+
+# Seconds a resolved API token is cached by CachedTokenAuthentication
+TOKEN_AUTH_CACHE_TTL = int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 300))
+
+# Stateless HMAC signed access/refresh tokens (see user.tokens)
+SIGNED_TOKEN_AUTH_ENABLED = os.environ.get('SIGNED_TOKEN_AUTH') == '1'
+SIGNED_TOKEN_ACCESS_TTL = int(os.environ.get('SIGNED_TOKEN_ACCESS_TTL', 300))
+SIGNED_TOKEN_REFRESH_TTL = int(
+    os.environ.get('SIGNED_TOKEN_REFRESH_TTL', 14 * 24 * 3600)
+)
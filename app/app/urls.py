@@ -15,14 +15,20 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
-from django.conf import settings
+
+from core.views import health_live, health_ready, serve_media
+from recipe.views import recipe_image_variant
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('health/live', health_live, name='health-live'),
+    path('health/ready', health_ready, name='health-ready'),
     path('api/', include([
         path('user/', include('user.urls')),
         path('recipe/', include('recipe.urls')),
     ])),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('media/recipe/<str:filename>', recipe_image_variant,
+         name='recipe-image-variant'),
+    path('media/<path:path>', serve_media, name='media'),
+]
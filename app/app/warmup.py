@@ -0,0 +1,88 @@
+"""
+Warmup of the application before it serves traffic.
+
+`warm_up()` runs when `app.wsgi` is imported, so with a preloading server
+(see gunicorn.conf.py) the work is done once in the master and shared by
+forked workers. It must not open database connections, which can not be
+shared between processes. `warm_worker()` runs in each worker after fork
+and opens its persistent database connection.
+"""
+import logging
+import time
+
+from django.apps import apps
+from django.db import DatabaseError, connections
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.renderers import JSONRenderer
+
+
+logger = logging.getLogger(__name__)
+
+_warm = False
+
+
+def is_warm():
+    return _warm
+
+
+def iter_patterns(resolver):
+    """ Yield URL patterns of resolver and its includes, populating them """
+    resolver.reverse_dict
+    for pattern in resolver.url_patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern)
+        elif isinstance(pattern, URLPattern):
+            yield pattern
+
+
+def warm_view(callback):
+    """ Build serializers of every action routed to an API view """
+    view_class = getattr(callback, 'cls', None)
+    if view_class is None or not hasattr(view_class, 'get_serializer_class'):
+        return 0
+
+    actions = getattr(callback, 'actions', None) or {'get': None}
+    warmed = 0
+    for action in set(actions.values()):
+        view = view_class(**getattr(callback, 'initkwargs', {}))
+        view.action = action
+        view.request = None
+        view.format_kwarg = None
+        try:
+            serializer_class = view.get_serializer_class()
+        except (AssertionError, AttributeError):
+            continue
+        serializer_class().fields
+        warmed += 1
+    return warmed
+
+
+def warm_up():
+    """ Populate URL resolvers, model metadata and API serializers """
+    global _warm
+    started = time.perf_counter()
+
+    for model in apps.get_models():
+        model._meta.get_fields()
+        model._meta.concrete_fields
+
+    serializers = 0
+    for pattern in iter_patterns(get_resolver()):
+        serializers += warm_view(pattern.callback)
+
+    JSONRenderer().render({'warm': True})
+    _warm = True
+    logger.info('Warmed up %d serializers in %.1f ms', serializers,
+                (time.perf_counter() - started) * 1000)
+
+
+def warm_worker():
+    """ Open persistent database connections of a forked worker """
+    for connection in connections.all():
+        connection.close()
+    try:
+        connections['default'].ensure_connection()
+    except DatabaseError as error:
+        # The first request connects again, readiness reports the outage
+        logger.warning('Worker could not connect to database: %s', error)
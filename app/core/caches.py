@@ -0,0 +1,14 @@
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+# Backends whose entries are not seen by other server processes
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared(cache):
+    """
+    Return whether entries of the cache are seen by every server process,
+    so that an invalidation made by one worker reaches the others.
+    """
+    return not isinstance(cache, PROCESS_LOCAL_BACKENDS)
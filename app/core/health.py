@@ -0,0 +1,74 @@
+import logging
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from app import warmup
+from core import routers
+
+
+logger = logging.getLogger(__name__)
+
+
+def check_database(alias):
+    """ Return round trip of a `SELECT 1` and persistent connection state """
+    connection = connections[alias]
+    reused = connection.connection is not None
+    started = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except DatabaseError as error:
+        connection.close()
+        # Errors may name hosts and users, readiness is unauthenticated
+        logger.warning('Health check of database %s failed: %s', alias,
+                       error)
+        return {'ok': False}
+
+    result = {
+        'ok': True,
+        'latency_ms': round((time.perf_counter() - started) * 1000, 3),
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'reused_connection': reused,
+    }
+    if connection.close_at is not None:
+        result['connection_expires_in'] = round(
+            connection.close_at - time.time(), 1
+        )
+    return result
+
+
+def check_media():
+    """ Return whether a file can be written to and removed from media """
+    try:
+        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=settings.MEDIA_ROOT,
+                                         prefix='.health-'):
+            pass
+    except OSError as error:
+        logger.warning('Health check of media failed: %s', error)
+        return {'ok': False}
+    return {'ok': True}
+
+
+def get_readiness():
+    """
+    Return (ready, checks) of the worker.
+
+    The worker must be warmed up and the primary database and media
+    volume must work. Replicas are reported but do not fail readiness,
+    reads fail over to the primary.
+    """
+    checks = {
+        'warm': warmup.is_warm(),
+        'database': {alias: check_database(alias)
+                     for alias in ['default', *routers.get_replicas()]},
+        'media': check_media(),
+    }
+    ready = checks['warm'] and checks['database']['default']['ok'] and \
+        checks['media']['ok']
+    return ready, checks
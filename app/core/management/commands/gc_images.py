@@ -0,0 +1,67 @@
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+
+
+IMAGE_DIRECTORY = 'uploads/recipe'
+
+
+class Command(BaseCommand):
+    """
+        Django command to delete recipe image files no recipe references
+    """
+    help = 'Delete unreferenced content addressed recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help='Keep files modified within this many seconds'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Only report files that would be deleted'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            _dirs, files = default_storage.listdir(IMAGE_DIRECTORY)
+        except FileNotFoundError:
+            files = []
+
+        referenced = set(
+            Recipe.objects.exclude(image='')
+            .order_by()
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+
+        removed = size = kept = 0
+        for filename in files:
+            name = os.path.join(IMAGE_DIRECTORY, filename)
+            if name in referenced:
+                kept += 1
+                continue
+            try:
+                if default_storage.get_modified_time(name) > cutoff:
+                    continue
+                file_size = default_storage.size(name)
+                if not options['dry_run']:
+                    default_storage.delete(name)
+            except FileNotFoundError:
+                continue
+            removed += 1
+            size += file_size
+            if options['verbosity'] > 1:
+                self.stdout.write(name)
+
+        action = 'Would remove' if options['dry_run'] else 'Removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {removed} unreferenced images ({size} bytes), '
+            f'{kept} referenced images kept'
+        ))
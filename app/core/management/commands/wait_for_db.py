@@ -1,23 +1,50 @@
+import random
 import time
 
 from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     """
-        Django command to pause execution until database is available
+        Django command to pause execution until database accepts
+        connections, retrying with exponential backoff and jitter
     """
 
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Give up after this many seconds'
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Longest pause between attempts in seconds'
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_conn = None
-        while not db_conn:
+        connection = connections[options['database']]
+        deadline = time.monotonic() + options['timeout']
+        attempt = 0
+        while True:
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                connection.ensure_connection()
+                break
+            except OperationalError as error:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        f'Database unavailable after '
+                        f'{options["timeout"]:g} seconds: {error}'
+                    )
+                delay = min(options['max_delay'], 0.1 * 2 ** attempt)
+                delay = min(remaining, random.uniform(delay / 2, delay))
+                attempt += 1
+                self.stdout.write(
+                    f'Database unavailable, waiting {delay:.2f} seconds...'
+                )
+                time.sleep(delay)
 
         self.stdout.write(self.style.SUCCESS('Database available!'))
@@ -0,0 +1,22 @@
+from core import routers
+
+
+class ReplicaRoutingMiddleware:
+    """
+        Route reads of safe requests to replicas and pin users to the
+        primary after their writes
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.request_routing(request):
+            response = self.get_response(request)
+
+        if request.method not in routers.SAFE_METHODS and \
+                routers.get_replicas():
+            user_id = routers.get_request_user_id(request)
+            if user_id is not None:
+                routers.pin_to_primary(user_id)
+        return response
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """ Merge tags and ingredients whose names differ only by case """
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, relation in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, relation).through
+        column = f'{model_name.lower()}_id'
+
+        keepers = {}
+        duplicates = {}
+        for pk, user_id, name in model.objects.order_by('id') \
+                .values_list('id', 'user_id', 'name'):
+            key = (user_id, name.lower())
+            if key in keepers:
+                duplicates[pk] = keepers[key]
+            else:
+                keepers[key] = pk
+        if not duplicates:
+            continue
+
+        rows = through.objects.filter(**{f'{column}__in': duplicates}) \
+            .values_list('recipe_id', column)
+        linked = set(
+            through.objects.filter(**{f'{column}__in': keepers.values()})
+            .values_list('recipe_id', column)
+        )
+        merged = {(recipe_id, duplicates[pk]) for recipe_id, pk in rows}
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, **{column: pk})
+            for recipe_id, pk in merged - linked
+        ])
+        model.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_user_token_generation'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names,
+                             migrations.RunPython.noop),
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX core_tag_user_id_lower_name_uniq '
+             'ON core_tag (user_id, lower(name))'],
+            ['DROP INDEX core_tag_user_id_lower_name_uniq'],
+        ),
+        migrations.RunSQL(
+            ['CREATE UNIQUE INDEX core_ingredient_user_id_lower_name_uniq '
+             'ON core_ingredient (user_id, lower(name))'],
+            ['DROP INDEX core_ingredient_user_id_lower_name_uniq'],
+        ),
+    ]
@@ -0,0 +1,50 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """ Index and fill search vectors where tsvector is supported """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_search_vector_gin '
+        'ON core_recipe USING gin (search_vector)'
+    )
+    schema_editor.execute('''
+        UPDATE core_recipe SET search_vector =
+            setweight(to_tsvector('english', title), 'A') ||
+            setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(core_tag.name, ' ')
+                FROM core_tag JOIN core_recipe_tags
+                ON core_recipe_tags.tag_id = core_tag.id
+                WHERE core_recipe_tags.recipe_id = core_recipe.id
+            ), '')), 'B') ||
+            setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(core_ingredient.name, ' ')
+                FROM core_ingredient JOIN core_recipe_ingredients
+                ON core_recipe_ingredients.ingredient_id = core_ingredient.id
+                WHERE core_recipe_ingredients.recipe_id = core_recipe.id
+            ), '')), 'B')
+    ''')
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX core_recipe_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
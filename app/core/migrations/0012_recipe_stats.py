@@ -0,0 +1,95 @@
+# Generated by Django 2.1.15 on 2026-10-17 04:57
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def restore_sqlite_indexes(apps, schema_editor):
+    """
+    SQLite adds fields by copying tables, which drops the unique
+    (user_id, lower(name)) indexes unknown to the migration state
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in ('core_tag', 'core_ingredient'):
+        schema_editor.execute(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS {table}_user_id_lower_name_uniq '
+            f'ON {table} (user_id, lower(name))'
+        )
+
+
+def fill_recipe_stats(apps, schema_editor):
+    """ Compute stats and recipe counts of existing data """
+    User = apps.get_model('core', 'User')
+    Recipe = apps.get_model('core', 'Recipe')
+    RecipeStats = apps.get_model('core', 'RecipeStats')
+    rows = Recipe.objects.order_by().values('user_id').annotate(
+        recipe_count=Count('id'),
+        price_total=Sum('price'),
+        price_min=Min('price'),
+        price_max=Max('price'),
+        time_minutes_total=Sum('time_minutes'),
+        time_minutes_min=Min('time_minutes'),
+        time_minutes_max=Max('time_minutes'),
+    )
+    rows = {row['user_id']: row for row in rows}
+    RecipeStats.objects.bulk_create(
+        RecipeStats(**rows.get(user_id, {'user_id': user_id}))
+        for user_id in User.objects.values_list('id', flat=True)
+    )
+
+    for model_name, relation in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        column = f'{model_name.lower()}_id'
+        counts = getattr(Recipe, relation).through.objects \
+            .filter(**{column: OuterRef('pk')}) \
+            .order_by().values(column) \
+            .annotate(count=Count('*')).values('count')
+        apps.get_model('core', model_name).objects.update(
+            recipe_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recipe_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('price_total', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('price_min', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('price_max', models.DecimalField(decimal_places=2, max_digits=5, null=True)),
+                ('time_minutes_total', models.BigIntegerField(default=0)),
+                ('time_minutes_min', models.PositiveIntegerField(null=True)),
+                ('time_minutes_max', models.PositiveIntegerField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count'], name='core_ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count'], name='core_tag_user_count_idx'),
+        ),
+        migrations.RunPython(restore_sqlite_indexes, migrations.RunPython.noop),
+        migrations.RunPython(fill_recipe_stats, migrations.RunPython.noop),
+    ]
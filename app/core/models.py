@@ -1,7 +1,7 @@
-import uuid
 import os
 
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models, router
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
@@ -9,11 +9,14 @@ from django.conf import settings
 
 
 def recipe_image_file_path(instance, filename):
-    """ Generate file path for new recipe image """
-    ext = filename.split('.')[-1]
-    filename = f'{uuid.uuid4()}.{ext}'
+    """
+        Generate file path for new recipe image. Only the directory and
+        extension matter, ContentAddressedStorage names the file by the
+        hash of its content.
+    """
+    ext = os.path.splitext(filename)[1].lower()
 
-    return os.path.join('uploads/recipe/', filename)
+    return os.path.join('uploads/recipe/', f'image{ext}')
 
 
 class UserManager(BaseUserManager):
@@ -47,17 +50,74 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    token_generation = models.PositiveIntegerField(default=0)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
 
+class NamedAttrManager(models.Manager):
+    """
+        Manager for user owned objects with case insensitive unique names,
+        backed by unique (user_id, lower(name)) indexes
+    """
+
+    def get_or_create_by_names(self, user, names):
+        """
+            Return ((id, stored name) in order of names, number of created
+            rows). Stored names keep the case they were created with.
+        """
+        if not names:
+            return [], 0
+
+        connection = connections[self._db or router.db_for_write(self.model)]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        values = ', '.join(['(%s, %s)'] * len(names))
+        rows = ', '.join(['(%s, %s, 0)'] * len(names))
+        insert_params = [param for name in names for param in (user.pk, name)]
+        select_params = [param for item in enumerate(names) for param in item]
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, name, recipe_count) '
+                f'VALUES {rows} ON CONFLICT DO NOTHING',
+                insert_params
+            )
+            created = cursor.rowcount
+            cursor.execute(
+                f'WITH requested (position, name) AS '
+                f'(VALUES {values}) '
+                f'SELECT requested.position, {table}.id, {table}.name '
+                f'FROM requested JOIN {table} '
+                f'ON {table}.user_id = %s '
+                f'AND lower({table}.name) = lower(requested.name)',
+                select_params + [user.pk]
+            )
+            rows = {position: (id_, name)
+                    for position, id_, name in cursor.fetchall()}
+        return [rows[position] for position in range(len(names))], created
+
+
 class Tag(models.Model):
     """ Tag for recipe """
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
+    # Maintained by recipe.stats on writes of recipe relations
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = NamedAttrManager()
+
+    class Meta:
+        indexes = [
+            # Lists of a user ordered by -name, -id
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_tag_user_name_idx'),
+            # Most used of a user
+            models.Index(fields=['user', '-recipe_count'],
+                         name='core_tag_user_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -68,12 +128,35 @@ class Ingredient(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     name = models.CharField(max_length=255)
+    # Maintained by recipe.stats on writes of recipe relations
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = NamedAttrManager()
+
+    class Meta:
+        indexes = [
+            # Lists of a user ordered by -name, -id
+            models.Index(fields=['user', 'name', 'id'],
+                         name='core_ingredient_user_name_idx'),
+            # Most used of a user
+            models.Index(fields=['user', '-recipe_count'],
+                         name='core_ingredient_user_count_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class Recipe(models.Model):
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
@@ -83,6 +166,46 @@ class Recipe(models.Model):
     ingredients = models.ManyToManyField('Ingredient')
     tags = models.ManyToManyField('Tag')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image_status = models.CharField(max_length=16, blank=True,
+                                    choices=IMAGE_STATUS_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by recipe.search on PostgreSQL, GIN indexed there
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # Lists of a user ordered by -id
+        indexes = [models.Index(fields=['user', 'id'],
+                                name='core_recipe_user_id_idx')]
 
     def __str__(self):
         return self.title
+
+
+class RecipeStats(models.Model):
+    """ Aggregates of the recipes of a user, maintained by recipe.stats """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL,
+                                on_delete=models.CASCADE, primary_key=True,
+                                related_name='recipe_stats')
+    recipe_count = models.PositiveIntegerField(default=0)
+    price_total = models.DecimalField(max_digits=15, decimal_places=2,
+                                      default=0)
+    price_min = models.DecimalField(max_digits=5, decimal_places=2,
+                                    null=True)
+    price_max = models.DecimalField(max_digits=5, decimal_places=2,
+                                    null=True)
+    time_minutes_total = models.BigIntegerField(default=0)
+    time_minutes_min = models.PositiveIntegerField(null=True)
+    time_minutes_max = models.PositiveIntegerField(null=True)
+
+    def __str__(self):
+        return f'{self.user} recipe stats'
+
+
+class UsedRefreshToken(models.Model):
+    """ Id of a rotated signed refresh token, see user.tokens """
+    jti = models.CharField(max_length=32, primary_key=True)
+    # Rows are removed once the token would have expired anyway
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
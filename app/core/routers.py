@@ -0,0 +1,157 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from django.utils.functional import LazyObject, empty
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Models read right after being written by another request, e.g. a token
+# used just after login, are always read from the primary
+PRIMARY_MODELS = ('authtoken.Token', 'sessions.Session')
+
+_state = threading.local()
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+def pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+def get_pin_cache():
+    return caches[getattr(settings, 'REPLICA_PIN_CACHE', 'default')]
+
+
+def pin_to_primary(user_id):
+    """ Read data of the user from the primary for the pin window """
+    get_pin_cache().set(pin_key(user_id), True,
+                        getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def get_request_user_id(request):
+    """ Return id of the authenticated user without loading lazy users """
+    user = request.__dict__.get('user')
+    if isinstance(user, LazyObject):
+        user = user._wrapped
+        if user is empty:
+            return None
+    if user is None or not getattr(user, 'is_authenticated', False):
+        return None
+    return user.pk
+
+
+@contextmanager
+def request_routing(request):
+    """ Route reads of queries run while handling the request """
+    _state.request = request
+    _state.pinned = {}
+    _state.replica = empty
+    try:
+        yield
+    finally:
+        _state.request = None
+
+
+class ReplicaHealth:
+    """
+    Process local replica health, checked with a `SELECT 1` at most once
+    per REPLICA_HEALTH_CHECK_INTERVAL seconds for each replica.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {}
+
+    def is_healthy(self, alias):
+        interval = getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10)
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._status.get(alias, (False, None))
+            if checked_at is not None and now - checked_at < interval:
+                return healthy
+            # Other threads keep the last result while this one checks
+            self._status[alias] = (healthy, now)
+
+        healthy = self.check(alias)
+        with self._lock:
+            self._status[alias] = (healthy, now)
+        return healthy
+
+    @staticmethod
+    def check(alias):
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except DatabaseError:
+            connection.close()
+            return False
+
+    def reset(self):
+        with self._lock:
+            self._status.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """
+    Send reads of safe method requests to a healthy replica.
+
+    A user is pinned to the primary for REPLICA_PIN_SECONDS after each of
+    their writes, so they always read what they wrote. The pin is kept in
+    the cache, which should be shared between workers. Writes, reads of
+    unsafe requests and reads outside of requests (commands, workers) use
+    the primary. Every read of one request goes to the same replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        request = getattr(_state, 'request', None)
+        if request is None or request.method not in SAFE_METHODS or \
+                not get_replicas() or model._meta.label in PRIMARY_MODELS \
+                or model._meta.label == settings.AUTH_USER_MODEL:
+            return None
+
+        user_id = get_request_user_id(request)
+        if user_id is not None:
+            if user_id not in _state.pinned:
+                _state.pinned[user_id] = bool(
+                    get_pin_cache().get(pin_key(user_id))
+                )
+            if _state.pinned[user_id]:
+                return None
+
+        if _state.replica is empty:
+            healthy = [alias for alias in get_replicas()
+                       if replica_health.is_healthy(alias)]
+            _state.replica = random.choice(healthy) if healthy else None
+        return _state.replica
+
+    def db_for_write(self, model, **hints):
+        """ Write to the primary, also objects read from a replica """
+        if get_replicas():
+            return 'default'
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """ Primary and replicas hold the same rows """
+        aliases = {'default', *get_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """ Replicas get their schema by replication """
+        if db in get_replicas():
+            return False
+        return None
@@ -0,0 +1,69 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage naming files by the SHA-256 of their content.
+
+    `uploads/recipe/<anything>.jpg` is stored as
+    `uploads/recipe/<sha256>.jpg`, so identical uploads share one file.
+    Saving content that already exists only refreshes the file mtime,
+    which protects it from `gc_images` for the grace period. Files are
+    written to a temporary file and renamed into place, so concurrent
+    writers of the same content never see partial files.
+
+    Files are never deleted on replace, as other recipes may reference
+    them. Unreferenced files are removed by the `gc_images` command.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.content_name(name, content)
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    @staticmethod
+    def content_name(name, content):
+        """ Return name with the basename replaced by content hash """
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(os.path.dirname(name),
+                            f'{digest.hexdigest()}{ext}').replace('\\', '/')
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    tmp.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(tmp_path, self.file_permissions_mode)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
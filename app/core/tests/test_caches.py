@@ -0,0 +1,22 @@
+import tempfile
+
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from core.caches import is_shared
+
+
+class SharedCacheTests(SimpleTestCase):
+    """ Test detection of caches shared between server processes """
+
+    def test_process_local_caches(self):
+        """ Test memory and dummy caches are not shared """
+        self.assertFalse(is_shared(LocMemCache('test', {})))
+        self.assertFalse(is_shared(DummyCache('test', {})))
+
+    def test_shared_cache(self):
+        """ Test caches stored outside of the process are shared """
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertTrue(is_shared(FileBasedCache(directory, {})))
@@ -1,28 +1,119 @@
+import os
+from io import StringIO
 from unittest.mock import patch
 
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
 from django.test import TestCase
 
+from core.models import Recipe
+
+
+ENSURE_CONNECTION = (
+    'django.db.backends.base.base.BaseDatabaseWrapper.ensure_connection'
+)
+
 
 class CommandTests(TestCase):
 
     def test_wait_for_db_ready(self):
         """
-            If db is available then ConnectionHandler should be
-            invoked once.
+            If db is available then connection should be opened once
         """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 1)
+        with patch(ENSURE_CONNECTION) as ensure:
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(ensure.call_count, 1)
 
     @patch('time.sleep', return_value=True)
     def test_wait_for_db_with_fails(self, ts):
         """
-            ConnectionHandler should try to reconnect each time after fail
+            Connection should be retried with growing jittered delays
+        """
+        with patch(ENSURE_CONNECTION) as ensure:
+            ensure.side_effect = [OperationalError] * 5 + [None]
+            call_command('wait_for_db', stdout=StringIO())
+            self.assertEqual(ensure.call_count, 6)
+
+        delays = [call[0][0] for call in ts.call_args_list]
+        self.assertEqual(len(delays), 5)
+        for attempt, delay in enumerate(delays):
+            self.assertGreaterEqual(delay, 0.1 * 2 ** attempt / 2)
+            self.assertLessEqual(delay, 0.1 * 2 ** attempt)
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_delay_is_capped(self, ts):
+        """
+            Delay between attempts should not exceed max delay
         """
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count, 6)
+        with patch(ENSURE_CONNECTION) as ensure:
+            ensure.side_effect = [OperationalError] * 10 + [None]
+            call_command('wait_for_db', '--max-delay', '0.5',
+                         stdout=StringIO())
+
+        self.assertTrue(all(call[0][0] <= 0.5 for call in ts.call_args_list))
+
+    @patch('time.sleep', return_value=True)
+    def test_wait_for_db_timeout(self, ts):
+        """
+            Command should fail once the timeout has passed
+        """
+        with patch(ENSURE_CONNECTION) as ensure, \
+                patch('time.monotonic', side_effect=[0, 1, 2, 31]):
+            ensure.side_effect = OperationalError('refused')
+            with self.assertRaises(CommandError):
+                call_command('wait_for_db', '--timeout', '30',
+                             stdout=StringIO())
+
+        self.assertEqual(ensure.call_count, 3)
+
+
+class GcImagesCommandTests(TestCase):
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('user@mail.com', '123')
+        self.referenced = default_storage.save('uploads/recipe/a.jpg',
+                                               ContentFile(b'referenced'))
+        self.orphan = default_storage.save('uploads/recipe/b.jpg',
+                                           ContentFile(b'orphan'))
+        Recipe.objects.create(user=user, title='Sample', time_minutes=1,
+                              price=1, image=self.referenced)
+        os.utime(default_storage.path(self.orphan), (1, 1))
+
+    def tearDown(self):
+        for name in (self.referenced, self.orphan):
+            default_storage.delete(name)
+
+    def test_gc_images_removes_unreferenced(self):
+        """
+            Files no recipe references should be deleted
+        """
+        out = StringIO()
+        call_command('gc_images', stdout=out)
+
+        self.assertTrue(default_storage.exists(self.referenced))
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertIn('Removed 1 unreferenced images', out.getvalue())
+
+    def test_gc_images_keeps_recent_files(self):
+        """
+            Files modified within the grace period should be kept
+        """
+        os.utime(default_storage.path(self.orphan))
+
+        call_command('gc_images', stdout=StringIO())
+
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_gc_images_dry_run(self):
+        """
+            Dry run should only report files
+        """
+        out = StringIO()
+        call_command('gc_images', '--dry-run', stdout=out)
+
+        self.assertTrue(default_storage.exists(self.orphan))
+        self.assertIn('Would remove 1', out.getvalue())
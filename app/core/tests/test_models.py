@@ -1,5 +1,4 @@
-from unittest.mock import patch
-
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -71,12 +70,33 @@ class ModelTests(TestCase):
                                               price=5.00)
         self.assertEqual(str(recipe), recipe.title)
 
-    @patch('uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
+    def test_recipe_file_name_path(self):
         """ Test that image is saved in the correct location """
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
-        file_path = models.recipe_image_file_path(None, 'myimage.jpg')
+        file_path = models.recipe_image_file_path(None, 'myimage.JPG')
+
+        self.assertEqual(file_path, 'uploads/recipe/image.jpg')
+
+    def test_tag_name_unique_per_user_ignoring_case(self):
+        """ Tag names should be unique per user regardless of case """
+        user = create_user()
+        models.Tag.objects.create(user=user, name='Vegan')
+        models.Tag.objects.create(user=create_user('guest@mail.com'),
+                                  name='Vegan')
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.Tag.objects.create(user=user, name='VEGAN')
+
+    def test_get_or_create_by_names(self):
+        """ Existing names should be reused and missing ones created """
+        user = create_user()
+        salt = models.Ingredient.objects.create(user=user, name='Salt')
+
+        rows, created = models.Ingredient.objects.get_or_create_by_names(
+            user, ['salt', 'Pepper', 'pepper']
+        )
 
-        exp_path = f'uploads/recipe/{uuid}.jpg'
-        self.assertEqual(file_path, exp_path)
+        self.assertEqual(created, 1)
+        self.assertEqual(rows[0], (salt.id, 'Salt'))
+        self.assertEqual(rows[1], rows[2])
+        self.assertEqual(rows[2][1], 'Pepper')
+        self.assertEqual(models.Ingredient.objects.count(), 2)
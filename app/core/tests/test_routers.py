@@ -0,0 +1,137 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class ReplicaRoutingTests(TestCase):
+    """ Test reads routed to a second local database standing in as replica """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        fd, cls.replica_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        connections.databases['replica'] = dict(
+            connections.databases['default'], NAME=cls.replica_path
+        )
+        call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        del connections._connections.replica
+        os.remove(cls.replica_path)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        routers.replica_health.reset()
+        self.addCleanup(self.clear_replica)
+        self.settings = override_settings(DATABASE_REPLICAS=['replica'])
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.user = get_user_model().objects.create_user('user@mail.com',
+                                                         '123')
+        get_user_model().objects.using('replica').create(
+            id=self.user.id, email=self.user.email
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.create_recipe('default', 'Primary recipe')
+        self.create_recipe('replica', 'Replica recipe')
+
+    def clear_replica(self):
+        Recipe.objects.using('replica').all().delete()
+        get_user_model().objects.using('replica').all().delete()
+
+    def create_recipe(self, alias, title):
+        return Recipe.objects.using(alias).create(
+            user_id=self.user.id, title=title, time_minutes=1, price=1
+        )
+
+    def get_titles(self):
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(response.status_code, 200)
+        return [recipe['title'] for recipe in response.data]
+
+    def test_safe_requests_read_from_replica(self):
+        """ Test list is read from the replica """
+        self.assertEqual(self.get_titles(), ['Replica recipe'])
+
+    def test_writer_reads_own_writes(self):
+        """ Test user is pinned to the primary after writing """
+        response = self.client.post(RECIPES_URL, {
+            'title': 'New recipe', 'time_minutes': 1, 'price': 1,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(
+            Recipe.objects.using('replica').filter(title='New recipe')
+            .exists()
+        )
+
+        self.assertEqual(self.get_titles(),
+                         ['New recipe', 'Primary recipe'])
+
+    def test_pin_expires(self):
+        """ Test reads return to the replica after the pin window """
+        with override_settings(REPLICA_PIN_SECONDS=-1):
+            self.client.post(RECIPES_URL, {
+                'title': 'New recipe', 'time_minutes': 1, 'price': 1,
+            })
+
+        self.assertEqual(self.get_titles(), ['Replica recipe'])
+
+    @contextmanager
+    def replica_down(self):
+        """ Point the replica connection at a missing database """
+        connection = connections['replica']
+        connection.close()
+        name = connection.settings_dict['NAME']
+        connection.settings_dict['NAME'] = '/nonexistent/replica.sqlite3'
+        try:
+            yield
+        finally:
+            connection.close()
+            connection.settings_dict['NAME'] = name
+
+    def test_unhealthy_replica_fails_over(self):
+        """ Test reads use the primary while the replica is down """
+        with self.replica_down():
+            self.assertEqual(self.get_titles(), ['Primary recipe'])
+
+    @override_settings(REPLICA_HEALTH_CHECK_INTERVAL=0)
+    def test_health_is_rechecked_after_interval(self):
+        """ Test replica is used again once it recovers """
+        with self.replica_down():
+            self.assertFalse(routers.replica_health.is_healthy('replica'))
+
+        self.assertTrue(routers.replica_health.is_healthy('replica'))
+
+    def test_reads_outside_requests_use_primary(self):
+        """ Test commands and workers read from the primary """
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)),
+            ['Primary recipe']
+        )
+
+    def test_migrations_skip_replica(self):
+        """ Test schema changes are not applied to replicas """
+        router = routers.ReplicaRouter()
+
+        self.assertFalse(router.allow_migrate('replica', 'core'))
+        self.assertIsNone(router.allow_migrate('default', 'core'))
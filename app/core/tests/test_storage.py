@@ -0,0 +1,49 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(TestCase):
+    """ Test naming stored files by their content """
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage(location=tempfile.mkdtemp())
+
+    def test_name_by_content_hash(self):
+        """ Test file is named by SHA-256 of its content """
+        name = self.storage.save('uploads/recipe/photo.JPG',
+                                 ContentFile(b'image'))
+
+        digest = hashlib.sha256(b'image').hexdigest()
+        self.assertEqual(name, f'uploads/recipe/{digest}.jpg')
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'image')
+
+    def test_deduplicate_identical_content(self):
+        """ Test identical uploads share one file """
+        first = self.storage.save('uploads/recipe/a.jpg',
+                                  ContentFile(b'image'))
+        os.utime(self.storage.path(first), (1, 1))
+
+        second = self.storage.save('uploads/recipe/b.jpg',
+                                   ContentFile(b'image'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.storage.listdir('uploads/recipe')[1], [
+            os.path.basename(first)
+        ])
+        self.assertGreater(os.path.getmtime(self.storage.path(first)), 1)
+
+    def test_different_content(self):
+        """ Test different content is stored separately """
+        first = self.storage.save('uploads/recipe/a.jpg',
+                                  ContentFile(b'one'))
+        second = self.storage.save('uploads/recipe/a.jpg',
+                                   ContentFile(b'two'))
+
+        self.assertNotEqual(first, second)
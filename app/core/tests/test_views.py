@@ -0,0 +1,228 @@
+import hashlib
+import os
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+
+
+CONTENT = bytes(range(256)) * 4
+
+
+def media_url(name):
+    return reverse('media', args=[name])
+
+
+class ServeMediaTests(TestCase):
+    """ Test serving uploaded media files """
+
+    def setUp(self):
+        self.name = default_storage.save('uploads/recipe/photo.jpg',
+                                         ContentFile(CONTENT))
+        self.url = media_url(self.name)
+        self.user = get_user_model().objects.create_user('user@mail.com',
+                                                         'secret')
+        self.recipe = Recipe.objects.create(user=self.user, title='Cake',
+                                            time_minutes=5, price=5,
+                                            image=self.name)
+        token = Token.objects.create(user=self.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+
+    def tearDown(self):
+        default_storage.delete(self.name)
+
+    def test_serve_content_addressed_file(self):
+        """ Test file is served with immutable caching and hash ETag """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        digest = hashlib.sha256(CONTENT).hexdigest()
+        self.assertEqual(response['ETag'], f'"{digest}"')
+
+    def test_not_modified(self):
+        """ Test matching ETag returns 304 without body """
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_range_request(self):
+        """ Test single byte range is served as partial content """
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content),
+                         CONTENT[10:20])
+
+    def test_suffix_range_request(self):
+        """ Test range of the last bytes """
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content),
+                         CONTENT[-4:])
+
+    def test_unsatisfiable_range(self):
+        """ Test range past the end of file is rejected """
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_stale_if_range_serves_full_file(self):
+        """ Test range of an older file version returns the whole file """
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9',
+                                   HTTP_IF_RANGE='"other"')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_mutable_file_is_revalidated(self):
+        """ Test files not named by content hash are not immutable """
+        path = os.path.join(os.path.dirname(default_storage.path(self.name)),
+                            'plain.txt')
+        with open(path, 'wb') as file:
+            file.write(b'text')
+        self.recipe.image = 'uploads/recipe/plain.txt'
+        self.recipe.save()
+
+        response = self.client.get(media_url('uploads/recipe/plain.txt'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        os.remove(path)
+
+    def test_reject_paths_outside_uploads(self):
+        """ Test files outside allowed prefixes are not served """
+        for path in ('../settings.py', 'uploads/../../etc/passwd',
+                     'other/file.jpg', 'uploads/recipe/missing.jpg'):
+            response = self.client.get(f'/media/{path}')
+            self.assertEqual(response.status_code, 404, path)
+
+    def test_reject_anonymous_users(self):
+        """ Test media is not served without credentials """
+        del self.client.defaults['HTTP_AUTHORIZATION']
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_reject_invalid_credentials(self):
+        """ Test media is not served with an unknown token """
+        response = self.client.get(self.url,
+                                   HTTP_AUTHORIZATION='Token unknown')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_reject_other_users(self):
+        """ Test images of recipes of other users are not served """
+        guest = get_user_model().objects.create_user('guest@mail.com',
+                                                     'secret')
+        token = Token.objects.create(user=guest)
+
+        response = self.client.get(self.url,
+                                   HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_reject_unsafe_methods(self):
+        """ Test media can not be modified """
+        response = self.client.post(self.url)
+
+        self.assertEqual(response.status_code, 405)
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='x-accel-redirect')
+    def test_accel_redirect(self):
+        """ Test nginx is asked to send the file """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    @override_settings(MEDIA_SENDFILE_BACKEND='x-sendfile')
+    def test_sendfile(self):
+        """ Test front server is given the absolute file path """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['X-Sendfile'],
+                         default_storage.path(self.name))
+
+
+class HealthTests(TestCase):
+    """ Test liveness and readiness endpoints """
+
+    def setUp(self):
+        warm = patch('app.warmup.is_warm', return_value=True)
+        warm.start()
+        self.addCleanup(warm.stop)
+
+    def test_live(self):
+        """ Test liveness does not depend on anything """
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('health-live'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_ready(self):
+        """ Test readiness reports database and media checks """
+        response = self.client.get(reverse('health-ready'))
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'ok')
+        database = data['checks']['database']['default']
+        self.assertTrue(database['ok'])
+        self.assertIn('latency_ms', database)
+        self.assertIn('reused_connection', database)
+        self.assertEqual(data['checks']['media'], {'ok': True})
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_not_ready_without_database(self):
+        """ Test readiness fails when the database does not answer """
+        with patch('django.db.backends.base.base.BaseDatabaseWrapper.cursor',
+                   side_effect=OperationalError('down at db.internal')), \
+                self.assertLogs('core.health', 'WARNING') as logs:
+            response = self.client.get(reverse('health-ready'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['database']['default'],
+                         {'ok': False})
+        self.assertNotIn(b'db.internal', response.content)
+        self.assertIn('db.internal', logs.output[0])
+
+    def test_not_ready_before_warmup(self):
+        """ Test readiness fails until the worker is warmed up """
+        with patch('app.warmup.is_warm', return_value=False):
+            response = self.client.get(reverse('health-ready'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['checks']['warm'])
+
+    def test_not_ready_without_media(self):
+        """ Test readiness fails when media is not writable """
+        with override_settings(MEDIA_ROOT='/proc/not-writable'), \
+                self.assertLogs('core.health', 'WARNING'):
+            response = self.client.get(reverse('health-ready'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['checks']['media'], {'ok': False})
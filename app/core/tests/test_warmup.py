@@ -0,0 +1,45 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+
+from app import warmup
+from recipe import views
+
+
+class WarmupTests(TestCase):
+    """ Test warming up the application before serving traffic """
+
+    def test_warm_up_without_queries(self):
+        """ Test warmup does not touch the database before fork """
+        with patch('app.warmup._warm', False):
+            with self.assertNumQueries(0):
+                warmup.warm_up()
+
+            self.assertTrue(warmup.is_warm())
+
+    def test_warm_up_builds_viewset_serializers(self):
+        """ Test serializers of every routed viewset are built """
+        built = set()
+        original = warmup.warm_view
+
+        def warm_view(callback):
+            built.add(getattr(callback, 'cls', None))
+            return original(callback)
+
+        with patch('app.warmup._warm', False), \
+                patch('app.warmup.warm_view', side_effect=warm_view):
+            warmup.warm_up()
+
+        self.assertIn(views.RecipeViewSet, built)
+        self.assertIn(views.TagViewSet, built)
+        self.assertIn(views.IngredientViewSet, built)
+
+    def test_warm_worker_connects(self):
+        """ Test forked workers open a fresh database connection """
+        with patch.object(connection, 'close') as close, \
+                patch.object(connection, 'ensure_connection') as connect:
+            warmup.warm_worker()
+
+        close.assert_called()
+        connect.assert_called_once_with()
@@ -0,0 +1,224 @@
+import mimetypes
+import os
+import posixpath
+import re
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from core import health
+from core.models import Recipe
+from user.authentication import (
+    CachedTokenAuthentication, SignedTokenAuthentication
+)
+
+
+CONTENT_ADDRESSED_RE = re.compile(r'^[0-9a-f]{64}(\.[0-9a-z]+)?$')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+# Media is read with the credentials of the API
+MEDIA_AUTHENTICATION_CLASSES = (SignedTokenAuthentication,
+                                CachedTokenAuthentication)
+
+
+def get_media_path(path):
+    """ Return normalized media path if clients may read it, else None """
+    path = posixpath.normpath(path).lstrip('/')
+    if path.startswith('.') or '\\' in path or '/.' in path:
+        return None
+    prefixes = getattr(settings, 'MEDIA_SERVE_PREFIXES', ('uploads/',))
+    if not path.startswith(tuple(prefixes)):
+        return None
+    return path
+
+
+def get_media_user(request):
+    """ Return user authenticated by the API token of request, or None """
+    api_request = Request(request, authenticators=[
+        authentication() for authentication in MEDIA_AUTHENTICATION_CLASSES
+    ])
+    try:
+        user = api_request.user
+    except AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+
+def can_read_media(request, path):
+    """
+    Return whether the request may read the media file. Recipe images are
+    private, they are served to the owners of recipes referencing them.
+    """
+    user = get_media_user(request)
+    if user is None:
+        return False
+    return Recipe.objects.filter(user=user, image=path).exists()
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) of a single byte range, None to serve the whole
+    file, or False when the range can not be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def read_range(full_path, start, length):
+    with open(full_path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def if_range_matches(request, etag, last_modified):
+    """ Return whether range applies to the current file version """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    try:
+        return int(parsedate_to_datetime(if_range).timestamp()) == \
+            int(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+
+def offload_response(path, full_path):
+    """ Return header-only response for the front server, if configured """
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    if backend == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = full_path
+    elif backend == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX',
+                         '/protected-media/')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = prefix + path
+    else:
+        return None
+    # Let the front server set the length and type of the real body
+    del response['Content-Type']
+    return response
+
+
+def file_response(request, full_path, stat, etag):
+    """ Stream file, or the single byte range requested by the client """
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    size = stat.st_size
+
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and \
+            if_range_matches(request, etag, stat.st_mtime):
+        byte_range = parse_range(request.META['HTTP_RANGE'], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end - start + 1),
+            status=206, content_type=content_type
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    else:
+        response = FileResponse(open(full_path, 'rb'),
+                                content_type=content_type)
+        response['Content-Length'] = size
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve an uploaded media file to a user allowed to read it.
+
+    After access checks the bytes are handed to the front server with
+    X-Sendfile or X-Accel-Redirect when MEDIA_SENDFILE_BACKEND is set,
+    otherwise they are streamed here with single range support.
+    Content addressed files never change and are cached as immutable by
+    the client only. Files the user may not read are reported missing.
+    """
+    path = get_media_path(path)
+    if path is None or not can_read_media(request, path):
+        raise Http404()
+    full_path = os.path.join(settings.MEDIA_ROOT, path)
+    try:
+        stat = os.stat(full_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404()
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    filename = posixpath.basename(path)
+    immutable = CONTENT_ADDRESSED_RE.match(filename)
+    if immutable:
+        etag = quote_etag(filename.split('.')[0])
+    else:
+        etag = quote_etag(f'{int(stat.st_mtime):x}-{stat.st_size:x}')
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = offload_response(path, full_path) or \
+            file_response(request, full_path, stat, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if immutable:
+        patch_cache_control(response, private=True,
+                            max_age=365 * 24 * 3600, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@never_cache
+@require_safe
+def health_live(request):
+    """ Report that the process serves requests, without dependencies """
+    return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_safe
+def health_ready(request):
+    """ Report whether the worker can serve traffic, 503 when it can not """
+    ready, checks = health.get_readiness()
+    return JsonResponse(
+        {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+        status=200 if ready else 503
+    )
@@ -0,0 +1,44 @@
+"""
+Production server config, run with
+
+    gunicorn -c gunicorn.conf.py app.wsgi:application
+
+The app is imported and warmed up once in the master (`preload_app`), so
+forked workers share URL resolvers, model metadata and serializers and the
+first request of a worker is as fast as the following ones. Every worker
+then opens its own persistent database connection, kept for
+DB_CONN_MAX_AGE seconds.
+
+Workers share caches through memcached at CACHE_LOCATION. Without it
+each worker would have its own cache and miss invalidations made by the
+others, so a single worker is run.
+"""
+import multiprocessing
+import os
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+if os.environ.get('CACHE_LOCATION'):
+    workers = int(os.environ.get('GUNICORN_WORKERS',
+                                 multiprocessing.cpu_count() * 2 + 1))
+else:
+    workers = 1
+preload_app = True
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = timeout
+keepalive = 5
+
+# Restart workers now and then against memory growth, jittered so they
+# do not all restart and go cold at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """ Drop connections inherited from the master and connect anew """
+    from app.warmup import warm_worker
+
+    warm_worker()
@@ -0,0 +1,203 @@
+import bisect
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.models import Tag, Ingredient, Recipe
+
+
+KIND_TAG = 'tag'
+KIND_INGREDIENT = 'ingredient'
+KIND_RECIPE = 'recipe'
+
+SOURCES = (
+    (KIND_TAG, Tag, 'name'),
+    (KIND_INGREDIENT, Ingredient, 'name'),
+    (KIND_RECIPE, Recipe, 'title'),
+)
+
+MIN_SIMILARITY = 0.3
+
+
+def trigrams(text):
+    """ Return set of trigrams of text padded like pg_trgm does """
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Names of one user searchable by prefix or trigram similarity.
+
+    Entries are kept sorted by lowercased name for prefix lookups with
+    bisect, and an inverted trigram map serves typo tolerant matches when
+    there are not enough prefix matches. Additions build a new entries
+    list and new trigram sets and swap the references, never mutating
+    what a concurrent search may be reading.
+    """
+
+    def __init__(self, version, items=()):
+        self.version = version
+        self.entries = sorted({
+            (name.lower(), kind, id_, name) for kind, id_, name in items
+        })
+        grams = {}
+        for entry in self.entries:
+            for gram in trigrams(entry[0]):
+                grams.setdefault(gram, set()).add(entry)
+        self.grams = {gram: frozenset(group) for gram, group in grams.items()}
+        self.names = {
+            (kind, id_): name for _key, kind, id_, name in self.entries
+        }
+
+    def add(self, kind, id_, name):
+        """ Add a name, copying the entries list instead of inserting """
+        entry = (name.lower(), kind, id_, name)
+        entries = self.entries
+        position = bisect.bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            return
+        self.names[(kind, id_)] = name
+        for gram in trigrams(entry[0]):
+            self.grams[gram] = self.grams.get(gram, frozenset()) | {entry}
+        self.entries = entries[:position] + [entry] + entries[position:]
+
+    def search(self, query, kinds, limit):
+        """ Return up to limit (kind, id, name) best matching the query """
+        query = query.lower()
+        matches = []
+        # Additions swap in a new list, this one never changes
+        entries = self.entries
+        position = bisect.bisect_left(entries, (query, ))
+        while position < len(entries) and len(matches) < limit:
+            entry = entries[position]
+            if not entry[0].startswith(query):
+                break
+            if entry[1] in kinds:
+                matches.append(entry)
+            position += 1
+
+        if len(matches) < limit and len(query) >= 3:
+            matches += self.similar(query, kinds, limit - len(matches),
+                                    exclude=set(matches))
+        return [entry[1:] for entry in matches]
+
+    def similar(self, query, kinds, limit, exclude):
+        """ Return entries ordered by trigram similarity with query """
+        query_grams = trigrams(query)
+        shared = {}
+        for gram in query_grams:
+            for entry in self.grams.get(gram, ()):
+                shared[entry] = shared.get(entry, 0) + 1
+
+        scored = []
+        for entry, count in shared.items():
+            if entry in exclude or entry[1] not in kinds:
+                continue
+            similarity = count / len(query_grams | trigrams(entry[0]))
+            if similarity >= MIN_SIMILARITY:
+                scored.append((-similarity, entry))
+        scored.sort()
+        return [entry for _score, entry in scored[:limit]]
+
+
+class AutocompleteIndexes:
+    """
+    Process local LRU of per user name indexes.
+
+    Indexes are built on first use and updated when this process creates
+    names. Any other change bumps a version token in the cache, so indexes
+    are rebuilt after renames, deletes and writes by other workers. Bumps
+    only reach other processes through a shared cache backend (see
+    CACHES in settings).
+    """
+
+    def __init__(self, max_users=1000, alias='default'):
+        self.max_users = max_users
+        self.alias = alias
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, user_id):
+        return f'autocomplete:{user_id}:version'
+
+    def get_version(self, user_id):
+        key = self.version_key(user_id)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, uuid.uuid4().hex, None)
+            version = self.cache.get(key)
+        return version
+
+    def get(self, user_id):
+        """ Return current index of the user, building it when needed """
+        version = self.get_version(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        index = self.build(user_id, version)
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    @staticmethod
+    def build(user_id, version):
+        items = []
+        for kind, model, field in SOURCES:
+            rows = model.objects.filter(user_id=user_id) \
+                .values_list('id', field)
+            items.extend((kind, id_, name) for id_, name in rows)
+        return NameIndex(version, items)
+
+    def add(self, user_id, kind, id_, name):
+        """ Add created name to the loaded index and publish a version """
+        previous = self.get_version(user_id)
+        version = uuid.uuid4().hex
+        self.cache.set(self.version_key(user_id), version, None)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                return
+            if index.version == previous:
+                index.add(kind, id_, name)
+                index.version = version
+            else:
+                del self._indexes[user_id]
+
+    def update(self, user_id, kind, id_, name):
+        """
+        Invalidate indexes of the user unless the name is unchanged,
+        return whether they were invalidated
+        """
+        version = self.get_version(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and index.version == version and \
+                    index.names.get((kind, id_)) == name:
+                return False
+        self.invalidate(user_id)
+        return True
+
+    def invalidate(self, user_id):
+        """ Force every process to rebuild the index of the user """
+        self.cache.set(self.version_key(user_id), uuid.uuid4().hex, None)
+        with self._lock:
+            self._indexes.pop(user_id, None)
+
+
+autocomplete_indexes = AutocompleteIndexes(
+    max_users=getattr(settings, 'AUTOCOMPLETE_MAX_USERS', 1000)
+)
@@ -0,0 +1,246 @@
+from django.db import connections, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Cast
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from core.models import Tag, Ingredient, Recipe
+
+from recipe import stats
+from recipe.autocomplete import autocomplete_indexes
+from recipe.cache import tag_list_cache, ingredient_list_cache
+from recipe.filters import invalidate_recipe_index
+from recipe.search import update_search_vectors
+from recipe.serializers import RecipeBulkItemSerializer
+
+
+STATUS_CREATED = 'created'
+STATUS_UPDATED = 'updated'
+STATUS_ERROR = 'error'
+
+RELATIONS = (
+    ('tags', Tag, 'tag_id'),
+    ('ingredients', Ingredient, 'ingredient_id'),
+)
+
+
+class BulkRecipeWriter:
+    """
+    Validate and save many recipes of one user together.
+
+    Items with an `id` update that recipe (only the given fields), others
+    create new recipes. Ownership of recipes, tags and ingredients is
+    checked with one query per model for the whole batch, rows are
+    written with `bulk_create` and CASE updates in a single transaction.
+    Invalid items are reported and skipped, valid ones are saved.
+    """
+
+    def __init__(self, user, items):
+        self.user = user
+        self.items = items
+        self.results = [None] * len(items)
+        self.bulk_inserted = False
+
+    def save(self):
+        """ Save valid items and return per item results """
+        valid = self.validate()
+        creates = [(index, data) for index, data in valid
+                   if 'id' not in data]
+        updates = [(index, data) for index, data in valid if 'id' in data]
+
+        with transaction.atomic():
+            old_values = stats.get_values(
+                data['id'] for _index, data in updates
+                if set(data) & set(stats.VALUE_FIELDS)
+            )
+            old_related = self.get_related_ids(updates)
+            created = self.create(creates)
+            self.update(updates)
+            self.clear_relations(updates)
+            self.add_relations(created + updates)
+            update_search_vectors(
+                data['id'] for _index, data in created + updates
+            )
+            self.update_stats(created, updates, old_values, old_related)
+
+        if valid:
+            tag_list_cache.bump(self.user.id)
+            ingredient_list_cache.bump(self.user.id)
+            invalidate_recipe_index(self.user.id)
+            autocomplete_indexes.invalidate(self.user.id)
+        return self.results
+
+    def validate(self):
+        """ Return list of (index, validated data) of valid items """
+        parsed = []
+        for index, item in enumerate(self.items):
+            partial = isinstance(item, dict) and 'id' in item
+            serializer = RecipeBulkItemSerializer(data=item, partial=partial)
+            if serializer.is_valid():
+                parsed.append((index, serializer.validated_data))
+            else:
+                self.fail(index, serializer.errors)
+
+        owned = self.get_owned_ids(parsed)
+        valid = []
+        seen = set()
+        for index, data in parsed:
+            errors = {}
+            if 'id' in data and data['id'] not in owned['id']:
+                errors['id'] = [_('Recipe does not exist.')]
+            elif 'id' in data and data['id'] in seen:
+                errors['id'] = [_('Recipe is repeated in the batch.')]
+            for field, model, _column in RELATIONS:
+                missing = set(data.get(field, ())) - owned[field]
+                if missing:
+                    errors[field] = [
+                        _('Invalid pk "{pk}" - object does not exist.')
+                        .format(pk=pk) for pk in sorted(missing)
+                    ]
+            if errors:
+                self.fail(index, errors)
+            else:
+                seen.add(data.get('id'))
+                valid.append((index, data))
+        return valid
+
+    def get_owned_ids(self, parsed):
+        """ Return ids referenced by the batch that belong to the user """
+        requested = {'id': {data['id'] for _i, data in parsed if 'id' in data}}
+        models = {'id': Recipe}
+        for field, model, _column in RELATIONS:
+            requested[field] = {
+                pk for _i, data in parsed for pk in data.get(field, ())
+            }
+            models[field] = model
+
+        return {
+            field: set(
+                models[field].objects
+                .filter(user=self.user, id__in=ids)
+                .values_list('id', flat=True)
+            ) if ids else set()
+            for field, ids in requested.items()
+        }
+
+    def fail(self, index, errors):
+        self.results[index] = {
+            'index': index, 'status': STATUS_ERROR, 'errors': errors,
+        }
+
+    def succeed(self, index, status, recipe_id):
+        self.results[index] = {
+            'index': index, 'status': status, 'id': recipe_id,
+        }
+
+    def create(self, creates):
+        """ Insert new recipes and return (index, data) with their ids """
+        recipes = [
+            Recipe(user=self.user, **self.model_fields(data))
+            for _index, data in creates
+        ]
+        connection = connections[Recipe.objects.db]
+        self.bulk_inserted = \
+            connection.features.can_return_ids_from_bulk_insert
+        if self.bulk_inserted:
+            Recipe.objects.bulk_create(recipes)
+        else:
+            # Saved one by one, signals add these recipes to stats
+            for recipe in recipes:
+                recipe.save()
+
+        created = []
+        for (index, data), recipe in zip(creates, recipes):
+            self.succeed(index, STATUS_CREATED, recipe.id)
+            created.append((index, dict(data, id=recipe.id)))
+        return created
+
+    def update(self, updates):
+        """ Update given fields of existing recipes with one query """
+        if not updates:
+            return
+
+        changes = {}
+        for _index, data in updates:
+            for name, value in self.model_fields(data).items():
+                field = Recipe._meta.get_field(name)
+                changes.setdefault(name, []).append(
+                    When(pk=data['id'], then=Value(value, output_field=field))
+                )
+
+        values = {}
+        for name, whens in changes.items():
+            field = Recipe._meta.get_field(name)
+            values[name] = Cast(Case(*whens, default=F(name),
+                                     output_field=field),
+                                output_field=field)
+        Recipe.objects.filter(pk__in=[data['id'] for _i, data in updates]) \
+            .update(updated_at=timezone.now(), **values)
+
+        for index, data in updates:
+            self.succeed(index, STATUS_UPDATED, data['id'])
+
+    def clear_relations(self, updates):
+        """ Remove tags and ingredients replaced by updated recipes """
+        for field, _model, _column in RELATIONS:
+            ids = [data['id'] for _index, data in updates if field in data]
+            if ids:
+                through = getattr(Recipe, field).through
+                through.objects.filter(recipe_id__in=ids).delete()
+
+    def add_relations(self, saved):
+        """ Insert tags and ingredients of saved recipes in bulk """
+        for field, _model, column in RELATIONS:
+            through = getattr(Recipe, field).through
+            rows = [
+                through(recipe_id=data['id'], **{column: pk})
+                for _index, data in saved
+                for pk in set(data.get(field, ()))
+            ]
+            if rows:
+                through.objects.bulk_create(rows)
+
+    def get_related_ids(self, updates):
+        """ Return map of related model to ids replaced by the updates """
+        related = {}
+        for field, model, column in RELATIONS:
+            ids = [data['id'] for _index, data in updates if field in data]
+            if ids:
+                related[model] = set(
+                    getattr(Recipe, field).through.objects
+                    .filter(recipe_id__in=ids)
+                    .values_list(column, flat=True)
+                )
+        return related
+
+    def update_stats(self, created, updates, old_values, old_related):
+        """ Apply saved recipes to stats and recount their relations """
+        added = []
+        if self.bulk_inserted:
+            added = [tuple(data[field] for field in stats.VALUE_FIELDS)
+                     for _index, data in created]
+        for _index, data in updates:
+            old = old_values.get(data['id'])
+            if old is not None:
+                added.append(tuple(
+                    data.get(field, value)
+                    for field, value in zip(stats.VALUE_FIELDS, old)
+                ))
+        stats.record_recipes(self.user.id, added=added,
+                             removed=old_values.values())
+
+        for field, model, _column in RELATIONS:
+            ids = old_related.get(model, set()) | {
+                pk for _index, data in created + updates
+                for pk in data.get(field, ())
+            }
+            stats.refresh_recipe_counts(model, ids)
+
+    @staticmethod
+    def model_fields(data):
+        """ Return recipe column values of validated item data """
+        relation_fields = [field for field, _m, _c in RELATIONS]
+        return {
+            name: value for name, value in data.items()
+            if name != 'id' and name not in relation_fields
+        }
@@ -0,0 +1,108 @@
+import hashlib
+import threading
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+# Seconds versions and entries are kept, bounding how long a list stays
+# stale when an invalidation is missed, e.g. after a raw SQL update
+LIST_CACHE_TIMEOUT = 10 * 60
+
+
+def invalidate_on_commit(invalidate, *args):
+    """
+    Run invalidation now and again once the current transaction commits.
+
+    A request reading before the commit does not see the write, so what
+    it caches under the version of the first run is dropped by the second
+    one. Outside of transactions the write is already committed.
+    """
+    invalidate(*args)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: invalidate(*args))
+
+
+class VersionedListCache:
+    """
+    Per user cache of list responses keyed by a version counter.
+
+    Every write to the cached objects bumps the user's version, so entries
+    of older versions are never read again and age out of the cache
+    backend. Versions are random tokens rather than increments, so a
+    version evicted by the backend can never be recreated with a value of
+    stale entries.
+
+    Bumps only reach processes sharing the cache backend, so the backend
+    must be shared by all workers (see CACHES in settings). Entries and
+    versions still expire after `timeout` seconds as a safety net for
+    writes that miss the bump.
+    """
+
+    def __init__(self, name, alias='default', timeout=LIST_CACHE_TIMEOUT):
+        self.name = name
+        self.alias = alias
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, user_id):
+        return f'list-cache:{self.name}:{user_id}:version'
+
+    def entry_key(self, user_id, version, params):
+        query = '&'.join(
+            f'{key}={value}' for key, value in sorted(params.lists())
+        )
+        digest = hashlib.md5(query.encode()).hexdigest()
+        return f'list-cache:{self.name}:{user_id}:{version}:{digest}'
+
+    def get_version(self, user_id):
+        """ Return current version token of the user lists """
+        key = self.version_key(user_id)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, uuid.uuid4().hex, self.timeout)
+            version = self.cache.get(key)
+        return version
+
+    def bump(self, user_id):
+        """ Invalidate every cached list of the user """
+        self.cache.set(self.version_key(user_id), uuid.uuid4().hex,
+                       self.timeout)
+
+    def get(self, user_id, params):
+        """
+        Return key and cached entry for the query params.
+
+        The key is bound to the version read before the entry, so a
+        response computed after a miss is stored under that version even
+        if a write bumps it meanwhile.
+        """
+        version = self.get_version(user_id)
+        key = self.entry_key(user_id, version, params)
+        entry = self.cache.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, entry
+
+    def set(self, key, entry):
+        """ Store entry under the key returned by get """
+        self.cache.set(key, entry, self.timeout)
+
+    def stats(self):
+        """ Return hit and miss counters of this process """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+tag_list_cache = VersionedListCache('tags')
+ingredient_list_cache = VersionedListCache('ingredients')
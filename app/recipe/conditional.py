@@ -0,0 +1,35 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """ Return a strong quoted ETag built from the given parts """
+    value = '|'.join(str(part) for part in parts)
+    return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+
+def to_timestamp(modified):
+    """ Return datetime as an integer unix timestamp or None """
+    return int(modified.timestamp()) if modified else None
+
+
+def get_not_modified(request, etag, last_modified=None):
+    """
+    Return a 304 (or 412) response when the request preconditions
+    match the validators, otherwise None.
+    """
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=to_timestamp(last_modified)
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    """ Add ETag and Last-Modified headers to the response """
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(to_timestamp(last_modified))
+    return response
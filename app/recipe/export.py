@@ -0,0 +1,109 @@
+import csv
+import io
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe
+from recipe.fast import compile_converter
+
+
+COLUMNS = ('id', 'title', 'time_minutes', 'price', 'link')
+
+# Recipe relation and the through table foreign key of the related model
+RELATIONS = (
+    ('tags', 'tag'),
+    ('ingredients', 'ingredient'),
+)
+
+FIELDS = COLUMNS + tuple(field for field, _related in RELATIONS)
+
+# Joins tag and ingredient names in one CSV cell
+NAME_SEPARATOR = '|'
+
+
+def iterate_chunks(queryset, chunk_size):
+    """ Yield lists of rows read through a server-side cursor """
+    chunk = []
+    for row in queryset.iterator(chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def get_names(field, related, recipe_ids):
+    """ Return map of recipe id to sorted names of one relation """
+    names = {}
+    rows = getattr(Recipe, field).through.objects \
+        .filter(recipe_id__in=recipe_ids) \
+        .order_by(f'{related}__name') \
+        .values_list('recipe_id', f'{related}__name')
+    for recipe_id, name in rows:
+        names.setdefault(recipe_id, []).append(name)
+    return names
+
+
+def iterate_export(queryset, chunk_size=2000):
+    """
+    Yield chunks of recipe dicts with tag and ingredient names.
+
+    Recipe columns are read with a server-side cursor ordered by id, names
+    are joined for a whole chunk with one query per relation. At most one
+    chunk is held in memory whatever the number of recipes.
+    """
+    convert_price = compile_converter(Recipe._meta.get_field('price'))
+    rows = queryset.prefetch_related(None).order_by('id') \
+        .values_list(*COLUMNS)
+    for chunk in iterate_chunks(rows, chunk_size):
+        recipe_ids = [row[0] for row in chunk]
+        names = [get_names(field, related, recipe_ids)
+                 for field, related in RELATIONS]
+        items = []
+        for row in chunk:
+            item = dict(zip(COLUMNS, row))
+            item['price'] = convert_price(item['price'])
+            for (field, _related), related_names in zip(RELATIONS, names):
+                item[field] = related_names.get(item['id'], [])
+            items.append(item)
+        yield items
+
+
+def render_csv(chunks):
+    """ Render chunks of recipes as CSV text, one write per chunk """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for items in chunks:
+        writer.writerows(
+            [item[name] for name in COLUMNS] +
+            [NAME_SEPARATOR.join(item[field]) for field, _r in RELATIONS]
+            for item in items
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header of an empty export
+        yield buffer.getvalue()
+
+
+def render_ndjson(chunks):
+    """ Render chunks of recipes as newline delimited JSON text """
+    renderer = JSONRenderer()
+    for items in chunks:
+        yield b''.join(
+            renderer.render(item) + b'\n' for item in items
+        ).decode()
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'ndjson': render_ndjson,
+}
+
+
+def export_recipes(queryset, fmt, chunk_size=2000):
+    """ Yield text of the recipes exported in the format """
+    return RENDERERS[fmt](iterate_export(queryset, chunk_size))
@@ -0,0 +1,245 @@
+import re
+import uuid
+from array import array
+
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import filters, serializers
+
+from core.models import Recipe
+
+
+MODE_ALL = 'all'
+MODE_ANY = 'any'
+MODE_NONE = 'none'
+FILTER_MODES = (MODE_ALL, MODE_ANY, MODE_NONE)
+
+INDEX_VERSION_KEY = 'recipe-filter-index:{user_id}:version'
+INDEX_CACHE_KEY = 'recipe-filter-index:{user_id}:{version}'
+
+# Seconds a cached index is used, bounding how long it stays wrong after
+# a write that missed the invalidation, e.g. a raw SQL update
+INDEX_CACHE_TIMEOUT = 10 * 60
+
+# Larger matches are selected with subqueries on the through tables
+# rather than with a list of ids
+MAX_MATCHED_IDS = 1000
+
+# Column of the related object in the through table of each relation
+RELATED_COLUMNS = {
+    'tags': 'tag_id',
+    'ingredients': 'ingredient_id',
+}
+
+IDS_PATTERN = re.compile(r'[0-9]+')
+
+
+def positions_to_bitset(positions):
+    """ Pack integer positions into a bitset where bit N is set for N """
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def bitset_to_positions(bitset):
+    """ Unpack a bitset into a sorted list of positions """
+    positions = []
+    data = bitset.to_bytes((bitset.bit_length() + 7) // 8, 'little')
+    for byte_index, byte in enumerate(data):
+        while byte:
+            low_bit = byte & -byte
+            positions.append(byte_index * 8 + low_bit.bit_length() - 1)
+            byte ^= low_bit
+    return positions
+
+
+def count_bits(bitset):
+    return bin(bitset).count('1')
+
+
+class RecipeIndex:
+    """
+    Per user bitsets of recipes for every tag and ingredient.
+
+    Bit N stands for the user's Nth recipe by id, `ids[N]`, so bitsets
+    grow with the number of recipes of the user rather than with ids of
+    the whole table.
+    """
+
+    def __init__(self, ids, tags, ingredients):
+        self.ids = array('q', ids)
+        self.recipes = (1 << len(self.ids)) - 1
+        self.tags = tags
+        self.ingredients = ingredients
+
+    @classmethod
+    def build(cls, user_id):
+        """ Build the index from the recipe through tables """
+        ids = list(Recipe.objects.filter(user_id=user_id).order_by('id')
+                   .values_list('id', flat=True))
+        positions = {id_: position for position, id_ in enumerate(ids)}
+        return cls(
+            ids=ids,
+            tags=cls._group(Recipe.tags.through, 'tag_id', user_id,
+                            positions),
+            ingredients=cls._group(Recipe.ingredients.through,
+                                   'ingredient_id', user_id, positions),
+        )
+
+    @staticmethod
+    def _group(through, attr_field, user_id, positions):
+        """ Group positions of the user's recipes by related object id """
+        groups = {}
+        rows = through.objects.filter(recipe__user_id=user_id) \
+            .values_list(attr_field, 'recipe_id')
+        for attr_id, recipe_id in rows:
+            # Recipes created after the ids were read are left out
+            if recipe_id in positions:
+                groups.setdefault(attr_id, []).append(positions[recipe_id])
+        return {
+            attr_id: positions_to_bitset(recipe_positions)
+            for attr_id, recipe_positions in groups.items()
+        }
+
+    def to_ids(self, bitset):
+        """ Return sorted recipe ids of the bitset """
+        return [self.ids[position]
+                for position in bitset_to_positions(bitset)]
+
+    def match(self, bitsets, ids, mode):
+        """ Return a bitset of recipes matching ids in the given mode """
+        selected = [bitsets.get(id_, 0) for id_ in ids]
+        if mode == MODE_ALL:
+            result = self.recipes
+            for bitset in selected:
+                result &= bitset
+            return result
+
+        union = 0
+        for bitset in selected:
+            union |= bitset
+        if mode == MODE_ANY:
+            return union
+        return self.recipes & ~union
+
+
+def get_index_version(user_id):
+    """ Return current version token of the user's recipe index """
+    key = INDEX_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, INDEX_CACHE_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def get_recipe_index(user_id):
+    """
+    Return cached recipe index for the user, building it if needed.
+
+    The index is stored under the version read before it is built, so an
+    index built while a write invalidates it is never read again.
+    """
+    key = INDEX_CACHE_KEY.format(user_id=user_id,
+                                 version=get_index_version(user_id))
+    index = cache.get(key)
+    if index is None:
+        index = RecipeIndex.build(user_id)
+        cache.set(key, index, INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def invalidate_recipe_index(user_id):
+    """ Move the user's recipe index to a new version """
+    cache.set(INDEX_VERSION_KEY.format(user_id=user_id), uuid.uuid4().hex,
+              INDEX_CACHE_TIMEOUT)
+
+
+def parse_ids(param, value):
+    """ Parse comma separated ids, dropping duplicates """
+    ids = []
+    for item in value.split(','):
+        item = item.strip()
+        if not IDS_PATTERN.fullmatch(item):
+            raise serializers.ValidationError(
+                {param: _('Expected comma separated list of ids.')}
+            )
+        ids.append(int(item))
+    return sorted(set(ids))
+
+
+def parse_names(value):
+    """ Parse comma separated names into a set """
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def parse_mode(param, value):
+    """ Validate filter mode """
+    if value not in FILTER_MODES:
+        raise serializers.ValidationError(
+            {param: _('Expected one of: {modes}.').format(
+                modes=', '.join(FILTER_MODES))}
+        )
+    return value
+
+
+class RecipeAttrFilter(filters.BaseFilterBackend):
+    """
+    Filter recipes by tags and ingredients.
+
+    Supports `?tags=1,2&tags_mode=all` and the same for `ingredients`,
+    where mode is one of `all`, `any` (default) or `none`.
+    """
+    attrs = ('tags', 'ingredients')
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        criteria = []
+        for attr in self.attrs:
+            mode_param = f'{attr}_mode'
+            mode = parse_mode(mode_param, params.get(mode_param, MODE_ANY))
+            value = params.get(attr)
+            if value:
+                criteria.append((attr, parse_ids(attr, value), mode))
+
+        if not criteria:
+            return queryset
+
+        index = get_recipe_index(request.user.id)
+        result = index.recipes
+        for attr, ids, mode in criteria:
+            result &= index.match(getattr(index, attr), ids, mode)
+        if count_bits(result) <= MAX_MATCHED_IDS:
+            return queryset.filter(id__in=index.to_ids(result))
+        return self.filter_by_relations(queryset, criteria)
+
+    @staticmethod
+    def filter_by_relations(queryset, criteria):
+        """
+        Select recipes with subqueries served by the (related_id,
+        recipe_id) indexes of the through tables, keeping the query size
+        bounded whatever the number of matches.
+        """
+        for attr, ids, mode in criteria:
+            column = RELATED_COLUMNS[attr]
+            related = getattr(Recipe, attr).through.objects \
+                .values('recipe_id')
+            if mode == MODE_ALL:
+                for id_ in ids:
+                    queryset = queryset.filter(
+                        id__in=related.filter(**{column: id_})
+                    )
+            elif mode == MODE_ANY:
+                queryset = queryset.filter(
+                    id__in=related.filter(**{f'{column}__in': ids})
+                )
+            else:
+                queryset = queryset.exclude(
+                    id__in=related.filter(**{f'{column}__in': ids})
+                )
+        return queryset
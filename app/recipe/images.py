@@ -0,0 +1,113 @@
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from core.models import Recipe, recipe_image_file_path
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """ Return process wide pool running image jobs """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2),
+                thread_name_prefix='recipe-image'
+            )
+        return _executor
+
+
+def schedule_image_processing(recipe_id, name):
+    """
+    Process the uploaded image once the current transaction commits.
+
+    Jobs run on a thread pool unless IMAGE_PROCESSING_ASYNC is disabled,
+    in which case they run inline after commit.
+    """
+    def submit():
+        if getattr(settings, 'IMAGE_PROCESSING_ASYNC', True):
+            get_executor().submit(run_job, recipe_id, name)
+        else:
+            process_recipe_image(recipe_id, name)
+
+    transaction.on_commit(submit)
+
+
+def run_job(recipe_id, name):
+    """ Worker entry point, owning its own database connection """
+    close_old_connections()
+    try:
+        process_recipe_image(recipe_id, name)
+    except Exception:
+        logger.exception('Processing image %s of recipe %s failed',
+                         name, recipe_id)
+    finally:
+        close_old_connections()
+
+
+def optimize_image(data):
+    """
+    Decode-verify image bytes, drop metadata, downscale and recompress.
+
+    Returns (bytes, extension).
+    """
+    Image.open(io.BytesIO(data)).verify()
+    image = Image.open(io.BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+
+    max_dimension = getattr(settings, 'IMAGE_MAX_DIMENSION', 1600)
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    output = io.BytesIO()
+    has_alpha = image.mode in ('RGBA', 'LA') or \
+        (image.mode == 'P' and 'transparency' in image.info)
+    if has_alpha:
+        image.save(output, format='PNG', optimize=True)
+        return output.getvalue(), 'png'
+
+    image.convert('RGB').save(
+        output,
+        format='JPEG',
+        quality=getattr(settings, 'IMAGE_JPEG_QUALITY', 85),
+        optimize=True,
+        progressive=True
+    )
+    return output.getvalue(), 'jpg'
+
+
+def process_recipe_image(recipe_id, name):
+    """
+    Replace the original upload of the recipe with an optimized copy.
+
+    The swap only happens while the recipe still points at `name`, so a
+    newer upload is never overwritten by an older job. Files may be
+    shared with other recipes, unreferenced ones are left to `gc_images`.
+    """
+    recipes = Recipe.objects.filter(pk=recipe_id, image=name)
+    try:
+        with default_storage.open(name) as source:
+            data, ext = optimize_image(source.read())
+    except Exception:
+        recipes.update(image_status=Recipe.IMAGE_FAILED,
+                       updated_at=timezone.now())
+        raise
+
+    new_name = default_storage.save(
+        recipe_image_file_path(None, f'image.{ext}'), ContentFile(data)
+    )
+    recipes.update(image=new_name, image_status=Recipe.IMAGE_READY,
+                   updated_at=timezone.now())
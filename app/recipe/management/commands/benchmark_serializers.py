@@ -0,0 +1,110 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import fast, serializers
+
+
+class Command(BaseCommand):
+    """
+        Django command to compare per object cost of DRF serializers and
+        fast read serializers. Works in a transaction that is rolled back.
+    """
+    help = 'Benchmark recipe, tag and ingredient list serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--objects', type=int, default=1000)
+        parser.add_argument('--rounds', type=int, default=5)
+
+    def handle(self, *args, **options):
+        count = options['objects']
+        rounds = options['rounds']
+
+        with transaction.atomic():
+            user = self.seed(count)
+            cases = (
+                ('recipe', Recipe, serializers.RecipeSerializer,
+                 fast.FastRecipeSerializer),
+                ('tag', Tag, serializers.TagSerializer,
+                 fast.FastTagSerializer),
+                ('ingredient', Ingredient, serializers.IngredientSerializer,
+                 fast.FastIngredientSerializer),
+            )
+            for name, model, serializer_class, fast_class in cases:
+                queryset = model.objects.filter(user=user).order_by('id')
+                drf = self.measure(rounds, lambda: self.run_drf(
+                    queryset, serializer_class
+                ))
+                fast_ = self.measure(rounds, lambda: self.run_fast(
+                    queryset, fast_class
+                ))
+                if drf[1] != fast_[1]:
+                    self.stderr.write(f'{name}: outputs differ')
+                self.stdout.write(
+                    f'{name:>10}: drf {drf[0] / count * 1e6:8.1f} us/object, '
+                    f'fast {fast_[0] / count * 1e6:8.1f} us/object '
+                    f'({drf[0] / fast_[0]:.1f}x)'
+                )
+
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        """ Create user with count recipes, tags and ingredients """
+        user = get_user_model().objects.create_user(
+            email='benchmark-serializers@example.com',
+            password='benchmark'
+        )
+        Tag.objects.bulk_create(
+            Tag(user=user, name=f'Tag {i}') for i in range(count)
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(user=user, name=f'Ingredient {i}')
+            for i in range(count)
+        )
+        tags = list(Tag.objects.filter(user=user).order_by('id'))
+        ingredients = list(
+            Ingredient.objects.filter(user=user).order_by('id')
+        )
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                user=user, title=f'Recipe {i}', time_minutes=i % 120,
+                price=f'{i % 100}.{i % 10}5', link=f'https://example.com/{i}'
+            )
+            recipe.tags.add(*tags[i:i + 3])
+            recipe.ingredients.add(*ingredients[i:i + 5])
+        return user
+
+    @staticmethod
+    def run_drf(queryset, serializer_class):
+        model = queryset.model
+        prefetch = [
+            Prefetch(field.name,
+                     queryset=field.related_model.objects.order_by('id'))
+            for field in model._meta.many_to_many
+        ]
+        objects = list(queryset.prefetch_related(*prefetch))
+        return JSONRenderer().render(
+            serializer_class(objects, many=True).data
+        )
+
+    @staticmethod
+    def run_fast(queryset, fast_class):
+        reader = fast_class()
+        rows = list(reader.get_rows(queryset))
+        return JSONRenderer().render(reader.serialize(rows))
+
+    @staticmethod
+    def measure(rounds, func):
+        """ Return best duration of rounds and the last output """
+        best = None
+        for _ in range(rounds):
+            started = time.perf_counter()
+            output = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
@@ -0,0 +1,183 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.autocomplete import autocomplete_indexes
+from recipe.cache import tag_list_cache, ingredient_list_cache
+from recipe.filters import invalidate_recipe_index
+from recipe.search import update_search_vectors
+
+
+def explain(sql, params):
+    """ Return names of tables read by a sequential scan in the query plan """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return sorted(set(postgres_seq_scans(plan[0]['Plan'])))
+
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        details = [detail for *_, detail in cursor.fetchall()]
+        tables = set(connection.introspection.table_names(cursor))
+        return sorted(set(sqlite_seq_scans(details, tables)))
+
+
+def postgres_seq_scans(node):
+    if node['Node Type'] == 'Seq Scan':
+        yield node['Relation Name']
+    for child in node.get('Plans', ()):
+        yield from postgres_seq_scans(child)
+
+
+def sqlite_seq_scans(details, tables):
+    """
+    Yield tables of `SCAN [TABLE] name` steps, which read every row, in
+    order of an index when `USING INDEX`. Index lookups are `SEARCH` steps.
+    """
+    for detail in details:
+        words = detail.split()
+        if words[0] != 'SCAN':
+            continue
+        name = words[2] if words[1] == 'TABLE' else words[1]
+        if name in tables:
+            yield name
+
+
+class QueryRecorder:
+    """ Execute wrapper collecting SELECT statements with their params """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    """
+        Django command to request each API endpoint against seeded data
+        and report queries whose plan contains a sequential scan. Works in
+        a transaction that is rolled back.
+    """
+    help = 'Check query plans of API endpoints for sequential scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--objects', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            users = self.seed(options['users'], options['objects'])
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            failures = self.check_endpoints(users[0])
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                f'{failures} queries use sequential scans'
+            )
+        self.stdout.write(self.style.SUCCESS('No sequential scans'))
+
+    def get_endpoints(self, user):
+        """ Return (name, url) of the requests to check """
+        recipe = Recipe.objects.filter(user=user).first()
+        tag = Tag.objects.filter(user=user).first()
+        ingredient = Ingredient.objects.filter(user=user).first()
+        recipes = reverse('recipe:recipe-list')
+        return [
+            ('tag list', reverse('recipe:tag-list')),
+            ('ingredient list', reverse('recipe:ingredient-list')),
+            ('assigned tag list',
+             f'{reverse("recipe:tag-list")}?assigned_only=1'),
+            ('recipe list', recipes),
+            ('recipe list by tag', f'{recipes}?tags={tag.id}'),
+            ('recipe list by ingredient',
+             f'{recipes}?ingredients={ingredient.id}'),
+            ('recipe search', f'{recipes}?search=recipe'),
+            ('recipe detail', reverse('recipe:recipe-detail',
+                                      args=[recipe.id])),
+            ('autocomplete', f'{reverse("recipe:autocomplete")}?q=rec'),
+            ('recipe stats', reverse('recipe:stats')),
+        ]
+
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def check_endpoints(self, user):
+        """ Request every endpoint, explain its queries, count failures """
+        client = APIClient()
+        client.force_authenticate(user)
+        failures = 0
+        for name, url in self.get_endpoints(user):
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{name}: {url} answered {response.status_code}'
+                )
+
+            self.stdout.write(f'{name} ({len(recorder.queries)} queries)')
+            for sql, params in recorder.queries:
+                tables = explain(sql, params)
+                if tables:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR(
+                        f'  sequential scan of {", ".join(tables)}: {sql}'
+                    ))
+        return failures
+
+    def seed(self, users, count):
+        """ Create users with count recipes, tags and ingredients each """
+        created = []
+        for n in range(users):
+            user = get_user_model().objects.create_user(
+                email=f'check-query-plans-{n}@example.com',
+                password='check'
+            )
+            Tag.objects.bulk_create(
+                Tag(user=user, name=f'Tag {i}') for i in range(count)
+            )
+            Ingredient.objects.bulk_create(
+                Ingredient(user=user, name=f'Ingredient {i}')
+                for i in range(count)
+            )
+            tags = list(Tag.objects.filter(user=user).order_by('id'))
+            ingredients = list(
+                Ingredient.objects.filter(user=user).order_by('id')
+            )
+            Recipe.objects.bulk_create(
+                Recipe(user=user, title=f'Recipe {i}', time_minutes=i % 120,
+                       price=f'{i % 100}.{i % 10}5')
+                for i in range(count)
+            )
+            recipes = Recipe.objects.filter(user=user).order_by('id')
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+                for i, recipe in enumerate(recipes)
+                for tag in tags[i:i + 3]
+            )
+            Recipe.ingredients.through.objects.bulk_create(
+                Recipe.ingredients.through(recipe_id=recipe.id,
+                                           ingredient_id=ingredient.id)
+                for i, recipe in enumerate(recipes)
+                for ingredient in ingredients[i:i + 5]
+            )
+            update_search_vectors(recipe.id for recipe in recipes)
+            # Endpoints must query, not answer from caches of a former user
+            tag_list_cache.bump(user.id)
+            ingredient_list_cache.bump(user.id)
+            invalidate_recipe_index(user.id)
+            autocomplete_indexes.invalidate(user.id)
+            created.append(user)
+        return created
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe import export
+
+
+class Command(BaseCommand):
+    """
+        Django command to export every recipe of a user with tag and
+        ingredient names, reading and writing one chunk at a time.
+    """
+    help = 'Export recipes of a user as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the recipes owner')
+        parser.add_argument('--format', choices=sorted(export.RENDERERS),
+                            default='csv')
+        parser.add_argument('--output', help='File to write, stdout if not '
+                                             'given')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {options["email"]} does not exist')
+
+        chunks = export.export_recipes(Recipe.objects.filter(user=user),
+                                       options['format'],
+                                       options['chunk_size'])
+        if not options['output']:
+            for text in chunks:
+                self.stdout.write(text, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            for text in chunks:
+                output.write(text)
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported recipes to {options["output"]}'
+        ))
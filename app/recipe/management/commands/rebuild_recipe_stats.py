@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipe import stats
+
+
+class Command(BaseCommand):
+    """
+        Django command to recompute recipe stats and tag and ingredient
+        recipe counts from scratch, e.g. after writes that bypassed them.
+    """
+    help = 'Rebuild recipe stats and recipe counts of tags and ingredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append',
+                            dest='user_ids',
+                            help='Rebuild only the user with this id')
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        with transaction.atomic():
+            stats.rebuild_stats(user_ids)
+            for _field, model, _column in stats.RELATIONS:
+                ids = None
+                if user_ids is not None:
+                    ids = model.objects.filter(user_id__in=user_ids) \
+                        .values_list('id', flat=True)
+                stats.refresh_recipe_counts(model, ids)
+
+        self.stdout.write(self.style.SUCCESS('Recipe stats rebuilt'))
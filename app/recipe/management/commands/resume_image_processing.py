@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe import images
+
+
+class Command(BaseCommand):
+    """
+        Django command to process images of recipes left in the processing
+        state, e.g. when the worker running their jobs was restarted
+    """
+    help = 'Process recipe images stuck in the processing state'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=600,
+            help='Only process images uploaded this many seconds ago'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        stuck = Recipe.objects.filter(
+            image_status=Recipe.IMAGE_PROCESSING, updated_at__lt=cutoff
+        ).exclude(image='').values_list('id', 'image')
+
+        processed = failed = 0
+        for recipe_id, name in stuck.iterator():
+            try:
+                images.process_recipe_image(recipe_id, name)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(
+                    f'Processing image {name} of recipe {recipe_id} '
+                    f'failed: {error}'
+                )
+            else:
+                processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {processed} stuck images, {failed} failed'
+        ))
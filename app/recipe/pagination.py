@@ -0,0 +1,154 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate by an opaque cursor holding the sort key of the last row.
+
+    Rows are ordered by the view `ordering` or `get_ordering()` (or
+    `?ordering=` when the field is listed in the view `ordering_fields`)
+    with `id` as a tie breaker, and the next page is selected with a
+    `WHERE key < last_key` condition, so every page costs the same
+    regardless of how deep the client pages.
+    Pages may hold model instances or `values()` rows. The page body stays
+    a plain list, the next page is advertised with a `Link: <...>;
+    rel="next"` header.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    default_ordering = '-id'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, view)
+        self.next_cursor = None
+
+        field, descending = self.ordering.lstrip('-'), \
+            self.ordering.startswith('-')
+        tie_breaker = '-id' if descending else 'id'
+        queryset = queryset.order_by(self.ordering, tie_breaker)
+
+        position = self.decode_cursor(request, queryset)
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(field, descending, position)
+            )
+
+        page = list(queryset[:self.page_size + 1])
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            last = page[-1]
+            if isinstance(last, dict):
+                position = [last[field], last['id']]
+            else:
+                position = [getattr(last, field), last.id]
+            self.next_cursor = self.encode_cursor(position)
+        return page
+
+    def get_paginated_response(self, data):
+        headers = {}
+        next_link = self.get_next_link()
+        if next_link:
+            headers['Link'] = f'<{next_link}>; rel="next"'
+        return Response(data, headers=headers)
+
+    def get_page_size(self, request):
+        """ Return page size from query params limited by max page size """
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, request, view):
+        """ Return validated ordering for the view """
+        if hasattr(view, 'get_ordering'):
+            default = view.get_ordering()
+        else:
+            default = getattr(view, 'ordering', self.default_ordering)
+        ordering = request.query_params.get(self.ordering_query_param)
+        if not ordering:
+            return default
+
+        allowed = getattr(view, 'ordering_fields', ())
+        if ordering.lstrip('-') not in allowed:
+            raise ValidationError({
+                self.ordering_query_param: _('Expected one of: {fields}.')
+                .format(fields=', '.join(allowed))
+            })
+        return ordering
+
+    def get_position_filter(self, field, descending, position):
+        """ Return condition selecting rows after the cursor position """
+        value, id_ = position
+        lookup = 'lt' if descending else 'gt'
+        return Q(**{f'{field}__{lookup}': value}) | \
+            Q(**{field: value, f'id__{lookup}': id_})
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.next_cursor)
+
+    def encode_cursor(self, position):
+        """ Encode ordering and sort key of the last row into a cursor """
+        payload = json.dumps([self.ordering, position], cls=DjangoJSONEncoder)
+        return urlsafe_b64encode(payload.encode()).decode()
+
+    @staticmethod
+    def get_sort_field(queryset, name):
+        """ Return model field or annotation output field sorted by """
+        annotation = queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return queryset.model._meta.get_field(name)
+
+    def decode_cursor(self, request, queryset):
+        """
+        Return sort key position from the cursor query param, with values
+        converted by the fields sorted by so tampered cursors are rejected
+        here rather than failing in the query.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            ordering, position = json.loads(
+                urlsafe_b64decode(encoded.encode()).decode()
+            )
+            value, id_ = position
+            if ordering != self.ordering:
+                raise NotFound(self.invalid_cursor_message)
+            field = self.get_sort_field(queryset, ordering.lstrip('-'))
+            id_field = queryset.model._meta.pk
+            value = field.get_prep_value(field.to_python(value))
+            id_ = id_field.get_prep_value(id_field.to_python(id_))
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if value is None or id_ is None:
+            raise NotFound(self.invalid_cursor_message)
+        return value, id_
@@ -0,0 +1,39 @@
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class NDJSONRenderer(JSONRenderer):
+    """ Render list data as newline delimited JSON, one object per line """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return b''.join(
+            super(NDJSONRenderer, self).render(item) + b'\n'
+            for item in data
+        )
+
+
+class CSVRenderer(BaseRenderer):
+    """ Render a dict or list of dicts as CSV with a header row """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        fields = list(dict.fromkeys(name for row in data for name in row))
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fields)
+        writer.writeheader()
+        writer.writerows(data)
+        return buffer.getvalue().encode(self.charset)
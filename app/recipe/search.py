@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections, router
+from django.db.models import (
+    Case, Exists, F, IntegerField, OuterRef, Q, Value, When
+)
+from rest_framework.filters import BaseFilterBackend
+
+from core.models import Recipe
+
+
+SEARCH_PARAM = 'search'
+MAX_QUERY_LENGTH = 200
+MAX_TERMS = 8
+
+UPDATE_VECTORS_SQL = '''
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector(%(config)s, title), 'A') ||
+    setweight(to_tsvector(%(config)s, coalesce((
+        SELECT string_agg(core_tag.name, ' ')
+        FROM core_tag JOIN core_recipe_tags
+        ON core_recipe_tags.tag_id = core_tag.id
+        WHERE core_recipe_tags.recipe_id = core_recipe.id
+    ), '')), 'B') ||
+    setweight(to_tsvector(%(config)s, coalesce((
+        SELECT string_agg(core_ingredient.name, ' ')
+        FROM core_ingredient JOIN core_recipe_ingredients
+        ON core_recipe_ingredients.ingredient_id = core_ingredient.id
+        WHERE core_recipe_ingredients.recipe_id = core_recipe.id
+    ), '')), 'B')
+WHERE core_recipe.id = ANY(%(ids)s)
+'''
+
+
+def get_search_config():
+    return getattr(settings, 'RECIPE_SEARCH_CONFIG', 'english')
+
+
+def uses_search_vector(alias=None):
+    """ Return whether the database maintains recipe search vectors """
+    return connections[alias or Recipe.objects.db].vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids):
+    """
+    Recompute search vectors of the recipes from their title, tag and
+    ingredient names. Does nothing on databases without tsvector.
+    """
+    recipe_ids = list(recipe_ids)
+    alias = router.db_for_write(Recipe)
+    if not recipe_ids or not uses_search_vector(alias):
+        return
+    with connections[alias].cursor() as cursor:
+        cursor.execute(UPDATE_VECTORS_SQL, {
+            'config': get_search_config(), 'ids': recipe_ids,
+        })
+
+
+def search_recipes(queryset, text):
+    """ Filter recipes matching text, annotated and ordered by rank """
+    if uses_search_vector(queryset.db):
+        return search_vector_recipes(queryset, text)
+    return search_like_recipes(queryset, text)
+
+
+def search_vector_recipes(queryset, text):
+    """ Full-text search over the GIN indexed search vector """
+    query = SearchQuery(text, config=get_search_config())
+    return queryset.filter(search_vector=query) \
+        .annotate(search_rank=SearchRank(F('search_vector'), query)) \
+        .order_by('-search_rank', '-id')
+
+
+def search_like_recipes(queryset, text):
+    """
+    Fallback matching each term against title (weight 2) or tag and
+    ingredient names (weight 1), used where tsvector is not available.
+    """
+    terms = text.lower().split()[:MAX_TERMS]
+    rank = Value(0, output_field=IntegerField())
+    for position, term in enumerate(terms):
+        in_tags = f'_search_tag_{position}'
+        in_ingredients = f'_search_ingredient_{position}'
+        queryset = queryset.annotate(**{
+            in_tags: Exists(Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'), tag__name__icontains=term
+            )),
+            in_ingredients: Exists(Recipe.ingredients.through.objects.filter(
+                recipe_id=OuterRef('pk'), ingredient__name__icontains=term
+            )),
+        }).filter(
+            Q(title__icontains=term) | Q(**{in_tags: True}) |
+            Q(**{in_ingredients: True})
+        )
+        rank = rank + Case(
+            When(title__icontains=term, then=Value(2)),
+            When(Q(**{in_tags: True}) | Q(**{in_ingredients: True}),
+                 then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    return queryset.annotate(search_rank=rank).order_by('-search_rank', '-id')
+
+
+def get_search_text(request):
+    return request.query_params.get(SEARCH_PARAM, '') \
+        .strip()[:MAX_QUERY_LENGTH]
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+    """ Rank recipes matching `?search=` in title, tags and ingredients """
+
+    def filter_queryset(self, request, queryset, view):
+        text = get_search_text(request)
+        if not text:
+            return queryset
+        return search_recipes(queryset, text)
@@ -1,9 +1,25 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from core.models import Tag, Ingredient, Recipe
 
 
-class TagSerializer(serializers.ModelSerializer):
+class UniqueNameMixin:
+    """ Reject names the user already has, ignoring case """
+
+    def validate_name(self, value):
+        request = self.context.get('request')
+        model = self.Meta.model
+        if request and model.objects.filter(user=request.user,
+                                            name__iexact=value).exists():
+            raise serializers.ValidationError(
+                _('{name} with this name already exists.')
+                .format(name=model._meta.verbose_name.capitalize())
+            )
+        return value
+
+
+class TagSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """ Serializer for tag objects """
 
     class Meta:
@@ -12,7 +28,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """ Serializer for ingredient objects """
 
     class Meta:
@@ -21,8 +37,46 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', )
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class TagUsageSerializer(TagSerializer):
+    """ Serializer for tags with the number of recipes using them """
+
+    class Meta(TagSerializer.Meta):
+        fields = ('id', 'name', 'recipe_count')
+        read_only_fields = ('id', 'recipe_count')
+
+
+class IngredientUsageSerializer(IngredientSerializer):
+    """ Serializer for ingredients with the number of recipes using them """
+
+    class Meta(IngredientSerializer.Meta):
+        fields = ('id', 'name', 'recipe_count')
+        read_only_fields = ('id', 'recipe_count')
+
+
+class SparseFieldsMixin:
+    """
+    Narrow output to the `fields` and inline the `expand` relations given
+    in the serializer context.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in self.context.get('expand', ()):
+            self.fields[name] = self.expandable_fields[name](many=True,
+                                                             read_only=True)
+        requested = self.context.get('fields')
+        if requested:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """ Serializer for recipe objects """
+    expandable_fields = {
+        'ingredients': IngredientSerializer,
+        'tags': TagSerializer,
+    }
 
     ingredients = serializers.PrimaryKeyRelatedField(
         many=True,
@@ -47,10 +101,96 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class RecipeBulkItemSerializer(serializers.ModelSerializer):
+    """ Validate one recipe of a bulk request without database lookups """
+    id = serializers.IntegerField(required=False, min_value=1)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False
+    )
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'ingredients', 'tags', 'time_minutes',
+                  'price', 'link')
+
+
+class RecipeBulkSerializer(serializers.Serializer):
+    """ Serializer for bulk recipe create/update requests """
+    recipes = serializers.ListField(
+        child=serializers.JSONField(),
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class NamesSerializer(serializers.Serializer):
+    """ Serializer for get-or-create by names requests """
+    names = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        allow_empty=False,
+        max_length=1000
+    )
+
+
+class AutocompleteQuerySerializer(serializers.Serializer):
+    """ Serializer for autocomplete query params """
+    KINDS = ('tag', 'ingredient', 'recipe')
+
+    q = serializers.CharField(max_length=100)
+    types = serializers.CharField(required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+    def validate_types(self, value):
+        kinds = {kind.strip() for kind in value.split(',') if kind.strip()}
+        unknown = kinds - set(self.KINDS)
+        if unknown or not kinds:
+            raise serializers.ValidationError(
+                _('Expected comma separated list of: {kinds}.')
+                .format(kinds=', '.join(self.KINDS))
+            )
+        return kinds
+
+
 class RecipeImageSerializer(serializers.ModelSerializer):
     """ Serializer to upload images to recipes """
 
     class Meta:
         model = Recipe
-        fields = ('id', 'image', )
-        read_only_fields = ('id', )
+        fields = ('id', 'image', 'image_status', )
+        read_only_fields = ('id', 'image_status', )
+
+
+class PriceStatsSerializer(serializers.Serializer):
+    """ Serializer for price aggregates """
+    average = serializers.DecimalField(max_digits=15, decimal_places=2)
+    min = serializers.DecimalField(max_digits=5, decimal_places=2)
+    max = serializers.DecimalField(max_digits=5, decimal_places=2)
+
+
+class TimeStatsSerializer(serializers.Serializer):
+    """ Serializer for preparation time aggregates """
+    average = serializers.DecimalField(max_digits=15, decimal_places=1,
+                                       coerce_to_string=False)
+    min = serializers.IntegerField()
+    max = serializers.IntegerField()
+
+
+class TopAttrSerializer(serializers.Serializer):
+    """ Serializer for most used tags and ingredients """
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    recipe_count = serializers.IntegerField()
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    """ Serializer for recipe stats of a user """
+    recipe_count = serializers.IntegerField()
+    price = PriceStatsSerializer()
+    time_minutes = TimeStatsSerializer()
+    top_tags = TopAttrSerializer(many=True)
+    top_ingredients = TopAttrSerializer(many=True)
@@ -0,0 +1,273 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+from recipe import stats
+from recipe.autocomplete import (
+    KIND_TAG, KIND_INGREDIENT, KIND_RECIPE, autocomplete_indexes
+)
+from recipe.cache import (
+    tag_list_cache, ingredient_list_cache, invalidate_on_commit
+)
+from recipe.filters import invalidate_recipe_index
+from recipe.search import update_search_vectors, uses_search_vector
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_index_on_change(sender, instance, **kwargs):
+    """ Drop recipe index of the owner when recipes or attributes change """
+    invalidate_on_commit(invalidate_recipe_index, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_index_on_m2m_change(sender, instance, action, **kwargs):
+    """ Drop recipe index of the owner when recipe relations change """
+    if action.startswith('pre_'):
+        return
+    invalidate_on_commit(invalidate_recipe_index, instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tag_list_version(sender, instance, **kwargs):
+    """ Invalidate cached tag lists of the owner """
+    invalidate_on_commit(tag_list_cache.bump, instance.user_id)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredient_list_version(sender, instance, **kwargs):
+    """ Invalidate cached ingredient lists of the owner """
+    invalidate_on_commit(ingredient_list_cache.bump, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_tag_list_version_on_m2m_change(sender, instance, action, **kwargs):
+    """ Invalidate cached tag lists of the owner, recipe counts changed """
+    if action.startswith('post_'):
+        invalidate_on_commit(tag_list_cache.bump, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_ingredient_list_version_on_m2m_change(sender, instance, action,
+                                               **kwargs):
+    """ Invalidate cached ingredient lists of the owner, counts changed """
+    if action.startswith('post_'):
+        invalidate_on_commit(ingredient_list_cache.bump, instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def bump_list_versions_on_recipe_delete(sender, instance, **kwargs):
+    """ Invalidate cached lists of the owner, recipe counts changed """
+    invalidate_on_commit(tag_list_cache.bump, instance.user_id)
+    invalidate_on_commit(ingredient_list_cache.bump, instance.user_id)
+
+
+def touch_recipes(queryset):
+    """ Mark recipes as modified now """
+    return queryset.update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipes_on_m2m_change(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """ Mark recipes as modified when their tags or ingredients change """
+    if not reverse:
+        if action.startswith('post_'):
+            instance.updated_at = timezone.now()
+            Recipe.objects.filter(pk=instance.pk) \
+                .update(updated_at=instance.updated_at)
+        return
+
+    if action == 'pre_clear':
+        instance._cleared_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+    elif action == 'post_clear':
+        touch_recipes(Recipe.objects.filter(
+            pk__in=getattr(instance, '_cleared_recipe_ids', ())
+        ))
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_on_attr_change(sender, instance, created=False, **kwargs):
+    """ Mark recipes as modified when their tag or ingredient changes """
+    if not created:
+        touch_recipes(instance.recipe_set.all())
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_vector_on_save(sender, instance, update_fields=None,
+                                 **kwargs):
+    """ Reindex recipe for search when its title may have changed """
+    if update_fields is None or 'title' in update_fields:
+        update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_search_vector_on_m2m_change(sender, instance, action, reverse,
+                                       pk_set, **kwargs):
+    """ Reindex recipes whose tags or ingredients changed """
+    if not action.startswith('post_') or not uses_search_vector():
+        return
+    if not reverse:
+        update_search_vectors([instance.pk])
+    elif action == 'post_clear':
+        update_search_vectors(getattr(instance, '_cleared_recipe_ids', ()))
+    else:
+        update_search_vectors(pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_recipes_on_attr_delete(sender, instance, **kwargs):
+    """ Keep recipes of deleted attribute to reindex after delete """
+    if uses_search_vector():
+        instance._search_recipe_ids = list(
+            instance.recipe_set.values_list('id', flat=True)
+        )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_search_vector_on_attr_change(sender, instance, created=False,
+                                        **kwargs):
+    """ Reindex recipes of renamed or deleted tags and ingredients """
+    if created or not uses_search_vector():
+        return
+    recipe_ids = getattr(instance, '_search_recipe_ids', None)
+    if recipe_ids is None:
+        recipe_ids = instance.recipe_set.values_list('id', flat=True)
+    update_search_vectors(recipe_ids)
+
+
+AUTOCOMPLETE_KINDS = {
+    Tag: (KIND_TAG, 'name'),
+    Ingredient: (KIND_INGREDIENT, 'name'),
+    Recipe: (KIND_RECIPE, 'title'),
+}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+def update_autocomplete_on_save(sender, instance, created, **kwargs):
+    """
+    Add created names to autocomplete once committed, so names of rolled
+    back transactions are never published. Rebuild it on renames.
+    """
+    kind, field = AUTOCOMPLETE_KINDS[sender]
+    name = getattr(instance, field)
+    if created:
+        transaction.on_commit(lambda: autocomplete_indexes.add(
+            instance.user_id, kind, instance.pk, name
+        ))
+    elif autocomplete_indexes.update(instance.user_id, kind, instance.pk,
+                                     name) and \
+            transaction.get_connection().in_atomic_block:
+        # Indexes built before the commit still have the old name
+        transaction.on_commit(
+            lambda: autocomplete_indexes.invalidate(instance.user_id)
+        )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+def invalidate_autocomplete_on_delete(sender, instance, **kwargs):
+    """ Rebuild autocomplete of the owner without the deleted name """
+    invalidate_on_commit(autocomplete_indexes.invalidate, instance.user_id)
+
+
+STATS_RELATIONS = {
+    getattr(Recipe, field).through: (model, column)
+    for field, model, column in stats.RELATIONS
+}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_stats(sender, instance, created, raw=False, using=None,
+                 **kwargs):
+    """ Start empty stats of new users """
+    if created and not raw:
+        RecipeStats.objects.using(using).create(user=instance)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_stats_values(sender, instance, update_fields=None, **kwargs):
+    """ Keep stored values of an updated recipe to replace in stats """
+    if instance._state.adding or (
+            update_fields is not None and
+            not set(update_fields) & set(stats.VALUE_FIELDS)):
+        return
+    instance._stats_values = stats.get_values([instance.pk]).get(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def record_stats_on_save(sender, instance, created, **kwargs):
+    """ Add created recipe to stats, or replace values of updated one """
+    values = stats.get_instance_values(instance)
+    if created:
+        stats.record_recipes(instance.user_id, added=[values])
+        return
+    old = getattr(instance, '_stats_values', None)
+    instance._stats_values = None
+    if old is not None and old != values:
+        stats.record_recipes(instance.user_id, added=[values],
+                             removed=[old])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_stats_relations(sender, instance, **kwargs):
+    """ Keep tags and ingredients of deleted recipe to recount """
+    instance._stats_related_ids = stats.get_related_ids([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def record_stats_on_delete(sender, instance, **kwargs):
+    """ Remove deleted recipe from stats and recount its relations """
+    stats.record_recipes(instance.user_id,
+                         removed=[stats.get_instance_values(instance)])
+    for model, ids in getattr(instance, '_stats_related_ids', {}).items():
+        stats.refresh_recipe_counts(model, ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_recipe_counts_on_m2m_change(sender, instance, action, reverse,
+                                        pk_set, **kwargs):
+    """ Recount recipes of tags and ingredients whose relations changed """
+    model, column = STATS_RELATIONS[sender]
+    if reverse:
+        if action.startswith('post_'):
+            stats.refresh_recipe_counts(model, [instance.pk])
+    elif action == 'pre_clear':
+        instance._stats_cleared_ids = list(
+            sender.objects.filter(recipe_id=instance.pk)
+            .values_list(column, flat=True)
+        )
+    elif action == 'post_clear':
+        stats.refresh_recipe_counts(
+            model, getattr(instance, '_stats_cleared_ids', ())
+        )
+    elif action in ('post_add', 'post_remove'):
+        stats.refresh_recipe_counts(model, pk_set)
@@ -0,0 +1,197 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Count, F, IntegerField, Max, Min, OuterRef, Subquery, Sum, Value
+)
+from django.db.models.functions import Coalesce, Greatest, Least
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+
+
+TOP_LIMIT = 10
+
+# Recipe relation, related model and its column in the through table
+RELATIONS = (
+    ('tags', Tag, 'tag_id'),
+    ('ingredients', Ingredient, 'ingredient_id'),
+)
+
+VALUE_FIELDS = ('price', 'time_minutes')
+
+
+def get_values(recipe_ids):
+    """ Return map of recipe id to its (price, time_minutes) """
+    rows = Recipe.objects.filter(pk__in=list(recipe_ids)) \
+        .values_list('id', *VALUE_FIELDS)
+    return {recipe_id: tuple(values) for recipe_id, *values in rows}
+
+
+def get_instance_values(recipe):
+    """ Return (price, time_minutes) of a recipe instance as stored """
+    return tuple(
+        Recipe._meta.get_field(field).to_python(getattr(recipe, field))
+        for field in VALUE_FIELDS
+    )
+
+
+def value(field, amount):
+    return Value(amount, output_field=RecipeStats._meta.get_field(field))
+
+
+def record_recipes(user_id, added=(), removed=()):
+    """
+    Apply (price, time_minutes) of added and removed recipes of the user
+    to the stats with one UPDATE. Extremes are recomputed from recipes
+    only when a removed value was one of them.
+    """
+    added = list(added)
+    removed = list(removed)
+    if not added and not removed:
+        return
+
+    changes = {'recipe_count': F('recipe_count') + len(added) - len(removed)}
+    for position, field in enumerate(VALUE_FIELDS):
+        total = sum(values[position] for values in added) - \
+            sum(values[position] for values in removed)
+        changes[f'{field}_total'] = F(f'{field}_total') + \
+            value(f'{field}_total', total)
+        if added:
+            low = min(values[position] for values in added)
+            high = max(values[position] for values in added)
+            changes[f'{field}_min'] = Least(
+                Coalesce(F(f'{field}_min'), value(f'{field}_min', low)),
+                value(f'{field}_min', low),
+            )
+            changes[f'{field}_max'] = Greatest(
+                Coalesce(F(f'{field}_max'), value(f'{field}_max', high)),
+                value(f'{field}_max', high),
+            )
+
+    stats = RecipeStats.objects.filter(user_id=user_id)
+    with transaction.atomic():
+        if not stats.update(**changes):
+            # No row yet, or the user is being deleted
+            if not added:
+                return
+            try:
+                with transaction.atomic():
+                    rebuild_stats([user_id])
+                return
+            except IntegrityError:
+                # Created meanwhile without seeing this uncommitted change
+                stats.update(**changes)
+        if removed and removes_extreme(user_id, removed):
+            refresh_extremes(user_id)
+
+
+def removes_extreme(user_id, removed):
+    """ Return whether removed values include a current min or max """
+    stats = RecipeStats.objects.get(user_id=user_id)
+    for position, field in enumerate(VALUE_FIELDS):
+        extremes = {getattr(stats, f'{field}_min'),
+                    getattr(stats, f'{field}_max')}
+        if any(values[position] in extremes for values in removed):
+            return True
+    return False
+
+
+def refresh_extremes(user_id):
+    """ Recompute min and max of the user's recipes """
+    extremes = {}
+    for field in VALUE_FIELDS:
+        extremes[f'{field}_min'] = Min(field)
+        extremes[f'{field}_max'] = Max(field)
+    RecipeStats.objects.filter(user_id=user_id).update(
+        **Recipe.objects.filter(user_id=user_id).aggregate(**extremes)
+    )
+
+
+def get_aggregates():
+    return {
+        'recipe_count': Count('id'),
+        **{f'{field}_{name}': function(field)
+           for field in VALUE_FIELDS
+           for name, function in (('total', Sum), ('min', Min),
+                                  ('max', Max))},
+    }
+
+
+def rebuild_stats(user_ids=None):
+    """ Recompute stats of the users, or of everyone, from recipes """
+    users = get_user_model().objects.all()
+    recipes = Recipe.objects.order_by()
+    stats = RecipeStats.objects.all()
+    if user_ids is not None:
+        users = users.filter(pk__in=user_ids)
+        recipes = recipes.filter(user_id__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        rows = {row['user_id']: row for row in
+                recipes.values('user_id').annotate(**get_aggregates())}
+        stats.delete()
+        RecipeStats.objects.bulk_create(
+            RecipeStats(**rows.get(user_id, {'user_id': user_id}))
+            for user_id in users.values_list('id', flat=True)
+        )
+
+
+def count_recipes(model):
+    """
+    Return expression counting recipes of the outer tag or ingredient,
+    served by the (related_id, recipe_id) index of the through table.
+    """
+    field, column = next((field, column) for field, related, column
+                         in RELATIONS if related is model)
+    counts = getattr(Recipe, field).through.objects \
+        .filter(**{column: OuterRef('pk')}) \
+        .order_by().values(column) \
+        .annotate(count=Count('*')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def refresh_recipe_counts(model, ids=None):
+    """ Recount recipes of the tags or ingredients with one UPDATE """
+    queryset = model.objects.all()
+    if ids is not None:
+        ids = set(ids)
+        if not ids:
+            return
+        queryset = queryset.filter(pk__in=ids)
+    queryset.update(recipe_count=count_recipes(model))
+
+
+def get_related_ids(recipe_ids):
+    """ Return map of related model to ids related to the recipes """
+    return {
+        model: set(getattr(Recipe, field).through.objects
+                   .filter(recipe_id__in=list(recipe_ids))
+                   .values_list(column, flat=True))
+        for field, model, column in RELATIONS
+    }
+
+
+def get_top(model, user_id, limit=TOP_LIMIT):
+    return list(
+        model.objects.filter(user_id=user_id, recipe_count__gt=0)
+        .order_by('-recipe_count', 'name')
+        .values('id', 'name', 'recipe_count')[:limit]
+    )
+
+
+def get_stats(user_id):
+    """ Return stats of the user read from the summary row and counters """
+    stats = RecipeStats.objects.filter(user_id=user_id).first() or \
+        RecipeStats(user_id=user_id)
+    data = {'recipe_count': stats.recipe_count}
+    for field in VALUE_FIELDS:
+        total = getattr(stats, f'{field}_total')
+        data[field] = {
+            'average': total / stats.recipe_count
+            if stats.recipe_count else None,
+            'min': getattr(stats, f'{field}_min'),
+            'max': getattr(stats, f'{field}_max'),
+        }
+    data['top_tags'] = get_top(Tag, user_id)
+    data['top_ingredients'] = get_top(Ingredient, user_id)
+    return data
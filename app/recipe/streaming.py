@@ -0,0 +1,61 @@
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from recipe.renderers import NDJSONRenderer
+
+
+def iterate_in_chunks(queryset, chunk_size, prefetch=()):
+    """
+    Yield chunks of objects read through a server-side cursor.
+
+    `QuerySet.iterator()` ignores `prefetch_related()`, so related
+    objects are prefetched for every chunk with one query per relation.
+    """
+    chunk = []
+    for obj in queryset.prefetch_related(None).iterator(chunk_size):
+        chunk.append(obj)
+        if len(chunk) == chunk_size:
+            prefetch_related_objects(chunk, *prefetch)
+            yield chunk
+            chunk = []
+    if chunk:
+        prefetch_related_objects(chunk, *prefetch)
+        yield chunk
+
+
+def render_json_array(items):
+    """ Render items as a JSON array one item at a time """
+    renderer = JSONRenderer()
+    yield b'['
+    separator = b''
+    for item in items:
+        yield separator + renderer.render(item)
+        separator = b','
+    yield b']'
+
+
+def render_ndjson(items):
+    """ Render items as newline delimited JSON """
+    renderer = NDJSONRenderer()
+    for item in items:
+        yield renderer.render(item)
+
+
+def stream_response(queryset, serializer_class, context, ndjson=False,
+                    chunk_size=500, prefetch=()):
+    """ Serialize queryset chunk by chunk into a streaming response """
+    def items():
+        for chunk in iterate_in_chunks(queryset, chunk_size, prefetch):
+            for obj in chunk:
+                yield serializer_class(obj, context=context).data
+
+    if ndjson:
+        return StreamingHttpResponse(
+            render_ndjson(items()),
+            content_type=NDJSONRenderer.media_type
+        )
+    return StreamingHttpResponse(
+        render_json_array(items()),
+        content_type=JSONRenderer.media_type
+    )
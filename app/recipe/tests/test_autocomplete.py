@@ -0,0 +1,204 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.autocomplete import (
+    AutocompleteIndexes, NameIndex, autocomplete_indexes
+)
+
+
+AUTOCOMPLETE_URL = reverse('recipe:autocomplete')
+ALL_KINDS = ('tag', 'ingredient', 'recipe')
+
+
+class NameIndexTests(TestCase):
+    """ Test matching names of one user """
+
+    def setUp(self):
+        self.index = NameIndex('v1', [
+            ('tag', 1, 'Vegan'),
+            ('tag', 2, 'Vegetarian'),
+            ('ingredient', 3, 'Vegetable stock'),
+            ('recipe', 4, 'Chocolate cake'),
+        ])
+
+    def test_prefix_matches_in_name_order(self):
+        """ Test prefix matching is case insensitive and sorted """
+        self.assertEqual(self.index.search('VEG', ALL_KINDS, 10), [
+            ('tag', 1, 'Vegan'),
+            ('ingredient', 3, 'Vegetable stock'),
+            ('tag', 2, 'Vegetarian'),
+        ])
+
+    def test_filter_kinds_and_limit(self):
+        """ Test results are limited to requested kinds and count """
+        self.assertEqual(self.index.search('veg', ('tag', ), 1),
+                         [('tag', 1, 'Vegan')])
+
+    def test_trigram_matches_typos(self):
+        """ Test similar names are suggested without a prefix match """
+        self.assertEqual(self.index.search('choclate', ALL_KINDS, 10),
+                         [('recipe', 4, 'Chocolate cake')])
+
+    def test_add_name(self):
+        """ Test added names are found by prefix and trigrams """
+        self.index.add('tag', 5, 'Chocolate')
+
+        self.assertEqual(self.index.search('choc', ALL_KINDS, 10), [
+            ('tag', 5, 'Chocolate'),
+            ('recipe', 4, 'Chocolate cake'),
+        ])
+        self.assertIn(('tag', 5, 'Chocolate'),
+                      self.index.search('chcolate', ALL_KINDS, 10))
+
+    def test_add_keeps_entries_being_read(self):
+        """ Test adding swaps in a new list instead of inserting """
+        entries = self.index.entries
+        copy = list(entries)
+
+        self.index.add('tag', 5, 'Chocolate')
+
+        self.assertEqual(entries, copy)
+        self.assertIsNot(self.index.entries, entries)
+        self.assertEqual(len(self.index.entries), len(copy) + 1)
+
+
+class AutocompleteIndexesTests(TestCase):
+    """ Test process local per user indexes """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('user@mail.com',
+                                                         '123')
+        Tag.objects.create(user=self.user, name='Vegan')
+        self.indexes = AutocompleteIndexes(max_users=1)
+
+    def test_build_lazily_once(self):
+        """ Test index is loaded on first use and reused afterwards """
+        with CaptureQueriesContext(connection) as queries:
+            self.indexes.get(self.user.id)
+            index = self.indexes.get(self.user.id)
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual(index.search('ve', ALL_KINDS, 10),
+                         [('tag', index.entries[0][2], 'Vegan')])
+
+    def test_add_updates_loaded_index(self):
+        """ Test created names are added without rebuilding """
+        self.indexes.get(self.user.id)
+
+        self.indexes.add(self.user.id, 'tag', 100, 'Vegetarian')
+        with CaptureQueriesContext(connection) as queries:
+            index = self.indexes.get(self.user.id)
+
+        self.assertEqual(len(queries), 0)
+        self.assertIn(('tag', 100, 'Vegetarian'),
+                      index.search('veg', ALL_KINDS, 10))
+
+    def test_changed_version_rebuilds(self):
+        """ Test writes of other processes rebuild the index """
+        first = self.indexes.get(self.user.id)
+
+        autocomplete_indexes.invalidate(self.user.id)
+
+        self.assertIsNot(self.indexes.get(self.user.id), first)
+
+    def test_unchanged_name_keeps_index(self):
+        """ Test saving an object without renaming keeps the index """
+        index = self.indexes.get(self.user.id)
+        tag_id = index.entries[0][2]
+
+        self.indexes.update(self.user.id, 'tag', tag_id, 'Vegan')
+        self.assertIs(self.indexes.get(self.user.id), index)
+
+        self.indexes.update(self.user.id, 'tag', tag_id, 'Vegetarian')
+        self.assertIsNot(self.indexes.get(self.user.id), index)
+
+    def test_evict_least_recently_used_user(self):
+        """ Test only max_users indexes are kept """
+        other = get_user_model().objects.create_user('other@mail.com', '1')
+        self.indexes.get(self.user.id)
+
+        self.indexes.get(other.id)
+
+        self.assertEqual(list(self.indexes._indexes), [other.id])
+
+
+class AutocompleteApiTests(TestCase):
+    """ Test autocomplete endpoint """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('user@mail.com',
+                                                         '123')
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user,
+                                                    name='Vinegar')
+        self.recipe = Recipe.objects.create(user=self.user, title='Veal',
+                                            time_minutes=1, price=1)
+
+    def test_auth_required(self):
+        """ Test that authentication is required """
+        response = APIClient().get(AUTOCOMPLETE_URL, {'q': 'v'})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_suggest_names(self):
+        """ Test matching names of every kind are returned """
+        response = self.client.get(AUTOCOMPLETE_URL, {'q': 've'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'type': 'recipe', 'id': self.recipe.id, 'name': 'Veal'},
+            {'type': 'tag', 'id': self.tag.id, 'name': 'Vegan'},
+        ])
+
+    def test_suggest_selected_types(self):
+        """ Test results can be limited to some types """
+        response = self.client.get(AUTOCOMPLETE_URL,
+                                   {'q': 'v', 'types': 'ingredient'})
+
+        self.assertEqual(response.data, [
+            {'type': 'ingredient', 'id': self.ingredient.id,
+             'name': 'Vinegar'},
+        ])
+
+    def test_invalid_params(self):
+        """ Test missing query, unknown types and limits are rejected """
+        for params in ({}, {'q': 'v', 'types': 'user'},
+                       {'q': 'v', 'limit': 0}):
+            response = self.client.get(AUTOCOMPLETE_URL, params)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+
+    def test_created_and_deleted_names(self):
+        """ Test index follows created, renamed and deleted objects """
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'v'})
+        self.client.post(reverse('recipe:tag-list'), {'name': 'Vegetarian'})
+        self.client.post(reverse('recipe:ingredient-get-or-create'),
+                         {'names': ['Vanilla']}, format='json')
+        self.tag.name = 'Spicy'
+        self.tag.save()
+        self.recipe.delete()
+
+        response = self.client.get(AUTOCOMPLETE_URL, {'q': 'v'})
+
+        self.assertEqual([item['name'] for item in response.data],
+                         ['Vanilla', 'Vegetarian', 'Vinegar'])
+
+    def test_only_own_names(self):
+        """ Test names of other users are not suggested """
+        other = get_user_model().objects.create_user('other@mail.com', '1')
+        Tag.objects.create(user=other, name='Vanilla')
+
+        response = self.client.get(AUTOCOMPLETE_URL, {'q': 'va'})
+
+        self.assertEqual(response.data, [])
@@ -0,0 +1,151 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe
+from recipe.views import RecipeViewSet
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def read_csv(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+class RecipeExportTests(TestCase):
+    """ Test exporting recipes with tag and ingredient names """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com', 'password'
+        )
+        self.client.force_authenticate(self.user)
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick, easy')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.first = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=20,
+            price=Decimal('4.50'), link='https://example.com/soup'
+        )
+        self.first.tags.add(vegan, quick)
+        self.first.ingredients.add(salt)
+        self.second = Recipe.objects.create(
+            user=self.user, title='Salad', time_minutes=5,
+            price=Decimal('3.00')
+        )
+        Recipe.objects.create(
+            user=get_user_model().objects.create_user('guest@mail.com',
+                                                      'password'),
+            title='Guest recipe', time_minutes=1, price=Decimal('1.00')
+        )
+
+    def get_content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_auth_required(self):
+        """ Test that authentication is required """
+        response = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_csv(self):
+        """ Test recipes of the user are exported as CSV by default """
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('recipes.csv', response['Content-Disposition'])
+        self.assertEqual(read_csv(self.get_content(response)), [
+            {'id': str(self.first.id), 'title': 'Soup', 'time_minutes': '20',
+             'price': '4.50', 'link': 'https://example.com/soup',
+             'tags': 'Quick, easy|Vegan', 'ingredients': 'Salt'},
+            {'id': str(self.second.id), 'title': 'Salad',
+             'time_minutes': '5', 'price': '3.00', 'link': '', 'tags': '',
+             'ingredients': ''},
+        ])
+
+    def test_export_ndjson(self):
+        """ Test recipes are exported as newline delimited JSON """
+        response = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.get_content(response).splitlines()
+        self.assertEqual(json.loads(lines[0]), {
+            'id': self.first.id, 'title': 'Soup', 'time_minutes': 20,
+            'price': '4.50', 'link': 'https://example.com/soup',
+            'tags': ['Quick, easy', 'Vegan'], 'ingredients': ['Salt'],
+        })
+        self.assertEqual(len(lines), 2)
+
+    def test_export_filtered(self):
+        """ Test export applies recipe filters """
+        tag = Tag.objects.get(name='Vegan')
+
+        response = self.client.get(EXPORT_URL, {'tags': tag.id})
+
+        rows = read_csv(self.get_content(response))
+        self.assertEqual([row['title'] for row in rows], ['Soup'])
+
+    def test_export_empty(self):
+        """ Test export of a user without recipes is only a header """
+        Recipe.objects.filter(user=self.user).delete()
+
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(self.get_content(response).splitlines(),
+                         ['id,title,time_minutes,price,link,tags,ingredients'])
+
+    def test_export_query_count_per_chunk(self):
+        """ Test names are read with one query per relation and chunk """
+        for i in range(3):
+            Recipe.objects.create(user=self.user, title=f'Recipe {i}',
+                                  time_minutes=1, price=Decimal('1.00'))
+
+        with patch.object(RecipeViewSet, 'export_chunk_size', 2):
+            response = self.client.get(EXPORT_URL)
+            # recipes, then tags and ingredients of each of three chunks
+            with self.assertNumQueries(7):
+                content = self.get_content(response)
+
+        self.assertEqual(len(read_csv(content)), 5)
+
+    def test_command(self):
+        """ Test export command writes recipes of the user to a file """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'recipes.ndjson')
+            call_command('export_recipes', 'user@mail.com',
+                         format='ndjson', output=path, chunk_size=1,
+                         stdout=io.StringIO())
+
+            with open(path) as output:
+                titles = [json.loads(line)['title'] for line in output]
+
+        self.assertEqual(titles, ['Soup', 'Salad'])
+
+    def test_command_stdout(self):
+        """ Test export command writes CSV to stdout by default """
+        out = io.StringIO()
+
+        call_command('export_recipes', 'user@mail.com', stdout=out)
+
+        self.assertEqual(len(read_csv(out.getvalue())), 2)
+
+    def test_command_unknown_user(self):
+        """ Test export command fails for unknown users """
+        with self.assertRaises(CommandError):
+            call_command('export_recipes', 'nobody@mail.com')
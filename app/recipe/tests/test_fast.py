@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Prefetch
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Tag, Ingredient, Recipe
+from recipe import fast, serializers
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class FastSerializerTests(TestCase):
+    """ Test fast read serializers match DRF serializers """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@mail.com',
+                                                         '123')
+        tags = [Tag.objects.create(user=self.user, name=f'Tag {i}')
+                for i in range(3)]
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        prices = ('5', '0.5', '12.34', '999.99')
+        for i, price in enumerate(prices):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe "{i}" é', time_minutes=i,
+                price=price, link='' if i % 2 else 'https://example.com'
+            )
+            recipe.tags.add(*reversed(tags[:i]))
+            if i:
+                recipe.ingredients.add(ingredient)
+
+    def get_recipes(self):
+        return Recipe.objects.filter(user=self.user).order_by('-id')
+
+    def test_recipe_output_is_identical(self):
+        """ Test fast recipe JSON equals serializer JSON byte for byte """
+        recipes = self.get_recipes().prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch('ingredients', queryset=Ingredient.objects.order_by('id'))
+        )
+        expected = serializers.RecipeSerializer(recipes, many=True).data
+
+        reader = fast.FastRecipeSerializer()
+        data = reader.serialize(list(reader.get_rows(self.get_recipes())))
+
+        self.assertEqual(render(data), render(expected))
+
+    def test_selected_fields(self):
+        """ Test fields are limited and kept in serializer order """
+        reader = fast.FastRecipeSerializer({'price', 'id', 'tags'})
+
+        data = reader.serialize(list(reader.get_rows(self.get_recipes())))
+
+        self.assertEqual(list(data[0]), ['id', 'tags', 'price'])
+        self.assertEqual(data[-1]['price'], '5.00')
+
+    def test_tag_output_is_identical(self):
+        """ Test fast tag JSON equals serializer JSON """
+        tags = Tag.objects.filter(user=self.user).order_by('-name')
+        expected = serializers.TagSerializer(tags, many=True).data
+
+        reader = fast.FastTagSerializer()
+        data = reader.serialize(list(reader.get_rows(tags)))
+
+        self.assertEqual(render(data), render(expected))
+
+    def test_serialize_in_fixed_queries(self):
+        """ Test relations are read with one query each """
+        reader = fast.FastRecipeSerializer()
+        with self.assertNumQueries(3):
+            reader.serialize(list(reader.get_rows(self.get_recipes())))
+
+    def test_benchmark_command(self):
+        """ Test benchmark reports every serializer """
+        out = StringIO()
+        err = StringIO()
+
+        call_command('benchmark_serializers', objects=5, rounds=1,
+                     stdout=out, stderr=err)
+
+        self.assertEqual(err.getvalue(), '')
+        for name in ('recipe', 'tag', 'ingredient'):
+            self.assertIn(f'{name}: drf', out.getvalue())
@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Recipe
+from recipe import filters
+
+
+class BitsetTests(SimpleTestCase):
+    """ Test bitset helpers of the recipe filter index """
+
+    def test_bitset_round_trip(self):
+        """ Test positions survive packing and unpacking """
+        positions = [1, 7, 8, 9, 64, 1000]
+        bitset = filters.positions_to_bitset(reversed(positions))
+
+        self.assertEqual(filters.bitset_to_positions(bitset), positions)
+
+    def test_empty_bitset(self):
+        """ Test empty positions produce empty bitset """
+        self.assertEqual(filters.positions_to_bitset([]), 0)
+        self.assertEqual(filters.bitset_to_positions(0), [])
+
+    def test_index_match_modes(self):
+        """ Test index combines bitsets according to the mode """
+        index = filters.RecipeIndex(
+            ids=[11, 12, 13, 14],
+            tags={
+                10: filters.positions_to_bitset([0, 1]),
+                20: filters.positions_to_bitset([1, 2]),
+            },
+            ingredients={},
+        )
+
+        def match(mode):
+            return index.to_ids(index.match(index.tags, [10, 20], mode))
+
+        self.assertEqual(match(filters.MODE_ALL), [12])
+        self.assertEqual(match(filters.MODE_ANY), [11, 12, 13])
+        self.assertEqual(match(filters.MODE_NONE), [14])
+
+    def test_index_size_follows_user_recipes(self):
+        """ Test bitsets are sized by recipe count, not by recipe ids """
+        index = filters.RecipeIndex(
+            ids=[10 ** 9, 10 ** 9 + 5],
+            tags={10: filters.positions_to_bitset([1])},
+            ingredients={},
+        )
+
+        self.assertEqual(index.recipes.bit_length(), 2)
+        self.assertEqual(index.to_ids(index.match(index.tags, [10],
+                                                  filters.MODE_ANY)),
+                         [10 ** 9 + 5])
+
+
+class RecipeIndexCacheTests(TestCase):
+    """ Test caching of recipe indexes """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('user@mail.com',
+                                                         'secret')
+
+    def create_recipe(self):
+        return Recipe.objects.create(user=self.user, title='Cake',
+                                     time_minutes=5, price=5)
+
+    def test_invalidated_during_build(self):
+        """ Test index built while a write invalidates it is not reused """
+        first = self.create_recipe()
+        build = filters.RecipeIndex.build
+        created = []
+
+        def build_with_concurrent_write(user_id):
+            index = build(user_id)
+            created.append(self.create_recipe())
+            return index
+
+        with patch.object(filters.RecipeIndex, 'build',
+                          build_with_concurrent_write):
+            index = filters.get_recipe_index(self.user.id)
+        self.assertEqual(list(index.ids), [first.id])
+
+        index = filters.get_recipe_index(self.user.id)
+
+        self.assertEqual(list(index.ids), [first.id, created[0].id])
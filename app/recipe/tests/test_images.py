@@ -0,0 +1,192 @@
+import io
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe import images
+
+
+def make_image(size=(100, 50), mode='RGB', format='JPEG', **params):
+    """ Return encoded sample image """
+    output = io.BytesIO()
+    Image.new(mode, size).save(output, format=format, **params)
+    return output.getvalue()
+
+
+class OptimizeImageTests(TestCase):
+    """ Test recompressing uploaded images """
+
+    def test_downscale_to_max_dimension(self):
+        """ Test large images are downscaled keeping aspect ratio """
+        with override_settings(IMAGE_MAX_DIMENSION=40):
+            data, ext = images.optimize_image(make_image((100, 50)))
+
+        self.assertEqual(ext, 'jpg')
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (40, 20))
+
+    def test_strip_exif(self):
+        """ Test EXIF metadata is removed """
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        original = make_image(exif=exif.tobytes())
+        self.assertIn('exif', Image.open(io.BytesIO(original)).info)
+
+        data, _ext = images.optimize_image(original)
+
+        self.assertNotIn('exif', Image.open(io.BytesIO(data)).info)
+
+    def test_keep_transparency(self):
+        """ Test images with alpha channel are stored as PNG """
+        data, ext = images.optimize_image(
+            make_image(mode='RGBA', format='PNG')
+        )
+
+        self.assertEqual(ext, 'png')
+        self.assertEqual(Image.open(io.BytesIO(data)).mode, 'RGBA')
+
+    def test_reject_invalid_image(self):
+        """ Test bytes that are not an image fail verification """
+        with self.assertRaises(Exception):
+            images.optimize_image(b'not an image')
+
+
+class ProcessRecipeImageTests(TestCase):
+    """ Test swapping recipe images for optimized copies """
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('user@mail.com', '123')
+        self.recipe = Recipe.objects.create(
+            user=user, title='Sample', time_minutes=1, price=1,
+            image_status=Recipe.IMAGE_PROCESSING
+        )
+
+    def save_original(self, data):
+        name = default_storage.save('uploads/recipe/original.jpg',
+                                    ContentFile(data))
+        Recipe.objects.filter(pk=self.recipe.pk).update(image=name)
+        return name
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            self.recipe.image.delete()
+
+    def test_process_swaps_image(self):
+        """ Test processed image replaces original upload """
+        name = self.save_original(make_image((3000, 3000)))
+
+        images.process_recipe_image(self.recipe.id, name)
+
+        self.recipe.refresh_from_db()
+        self.assertNotEqual(self.recipe.image.name, name)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertTrue(default_storage.exists(name))
+        with self.recipe.image.open() as file:
+            self.assertEqual(Image.open(file).size, (1600, 1600))
+        default_storage.delete(name)
+
+    def test_stale_job_keeps_newer_upload(self):
+        """ Test job of replaced upload does not overwrite newer image """
+        name = self.save_original(make_image())
+        newer = self.save_original(make_image((60, 30)))
+
+        images.process_recipe_image(self.recipe.id, name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, newer)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PROCESSING)
+        default_storage.delete(name)
+
+    def test_process_invalid_image(self):
+        """ Test undecodable upload marks recipe image as failed """
+        name = self.save_original(b'broken')
+
+        with self.assertRaises(Exception):
+            images.process_recipe_image(self.recipe.id, name)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+
+class ResumeImageProcessingTests(TestCase):
+    """ Test processing images left behind by restarted workers """
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('user@mail.com', '123')
+        self.name = default_storage.save('uploads/recipe/original.jpg',
+                                         ContentFile(make_image()))
+        self.recipe = Recipe.objects.create(
+            user=user, title='Sample', time_minutes=1, price=1,
+            image=self.name, image_status=Recipe.IMAGE_PROCESSING
+        )
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        if self.recipe.image.name != self.name:
+            self.recipe.image.delete()
+        default_storage.delete(self.name)
+
+    def test_process_stuck_images(self):
+        """ Test images processing for longer than the threshold resume """
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+        out = StringIO()
+
+        call_command('resume_image_processing', stdout=out)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertNotEqual(self.recipe.image.name, self.name)
+        self.assertIn('Processed 1 stuck images, 0 failed', out.getvalue())
+
+    def test_skip_recent_uploads(self):
+        """ Test images uploaded within the threshold are left to workers """
+        call_command('resume_image_processing', stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PROCESSING)
+        self.assertEqual(self.recipe.image.name, self.name)
+
+
+class UploadImageSchedulingTests(TestCase):
+    """ Test upload endpoint hands images to the worker pool """
+
+    def setUp(self):
+        self.client = APIClient()
+        user = get_user_model().objects.create_user('user@mail.com', '123')
+        self.client.force_authenticate(user)
+        self.recipe = Recipe.objects.create(user=user, title='Sample',
+                                            time_minutes=1, price=1)
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        self.recipe.image.delete()
+
+    @patch('recipe.images.schedule_image_processing')
+    def test_upload_schedules_processing(self, schedule):
+        """ Test upload returns processing status and schedules a job """
+        url = reverse('recipe:recipe-upload-image', args=[self.recipe.id])
+        image = ContentFile(make_image(), name='photo.jpg')
+
+        response = self.client.post(url, {'image': image},
+                                    format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['image_status'],
+                         Recipe.IMAGE_PROCESSING)
+        self.recipe.refresh_from_db()
+        schedule.assert_called_once_with(self.recipe.id,
+                                         self.recipe.image.name)
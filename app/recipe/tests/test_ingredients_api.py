@@ -1,16 +1,20 @@
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from django.test import TestCase
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingredient
+from core.models import Ingredient, Recipe
 
-from recipe.serializers import IngredientSerializer
+from recipe.serializers import IngredientUsageSerializer
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+GET_OR_CREATE_INGREDIENTS_URL = reverse('recipe:ingredient-get-or-create')
 
 
 class PublicIngredientsApiTests(TestCase):
@@ -31,6 +35,7 @@ class PrivateIngredientsApiTests(TestCase):
     """ Test the private ingredients API """
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.auth_user = get_user_model().objects.create_user(
             'bob@mail.com', 'secret'
@@ -48,7 +53,7 @@ class PrivateIngredientsApiTests(TestCase):
         response = self.client.get(INGREDIENTS_URL)
 
         ingredients = Ingredient.objects.all().order_by('-name')
-        serializer = IngredientSerializer(ingredients, many=True)
+        serializer = IngredientUsageSerializer(ingredients, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
@@ -90,3 +95,41 @@ class PrivateIngredientsApiTests(TestCase):
 
         self.assertEqual(response.status_code,
                          status.HTTP_400_BAD_REQUEST)
+
+    def test_ingredients_cache_invalidated_on_create(self):
+        """ Test cached ingredient list is refreshed after create """
+        self.client.get(INGREDIENTS_URL)
+        with self.assertNumQueries(0):
+            self.client.get(INGREDIENTS_URL)
+
+        self.client.post(INGREDIENTS_URL, {'name': 'Cabbage'})
+        response = self.client.get(INGREDIENTS_URL)
+
+        self.assertEqual(response.data[0]['name'], 'Cabbage')
+
+    def test_get_or_create_ingredients(self):
+        """ Test ingredients are resolved by name and missing ones created """
+        kale = Ingredient.objects.create(user=self.auth_user, name='Kale')
+
+        response = self.client.post(GET_OR_CREATE_INGREDIENTS_URL,
+                                    {'names': ['KALE', 'Salt']},
+                                    format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0], {'id': kale.id, 'name': 'Kale'})
+        salt = Ingredient.objects.get(user=self.auth_user, name='Salt')
+        self.assertEqual(response.data[1]['id'], salt.id)
+
+    def test_recipe_count_and_assigned_only(self):
+        """ Test ingredients used by recipes are listed with counts """
+        salt = Ingredient.objects.create(user=self.auth_user, name='Salt')
+        Ingredient.objects.create(user=self.auth_user, name='Kale')
+        recipe = Recipe.objects.create(user=self.auth_user, title='Soup',
+                                       time_minutes=5, price=Decimal('1.00'))
+        recipe.ingredients.add(salt)
+
+        response = self.client.get(INGREDIENTS_URL, {'assigned_only': '1'})
+
+        self.assertEqual(response.data, [
+            {'id': salt.id, 'name': 'Salt', 'recipe_count': 1},
+        ])
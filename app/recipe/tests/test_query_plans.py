@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+
+from core.models import Tag
+from recipe.management.commands.check_query_plans import (
+    explain, sqlite_seq_scans
+)
+
+
+class QueryPlanTests(TestCase):
+    """ Test checking query plans of API endpoints """
+
+    def test_endpoints_use_indexes(self):
+        """ Test no endpoint query scans a whole table """
+        out = StringIO()
+
+        call_command('check_query_plans', users=2, objects=20, stdout=out)
+
+        self.assertIn('tag list (1 queries)', out.getvalue())
+        self.assertIn('No sequential scans', out.getvalue())
+
+    def test_explain_reports_sequential_scan(self):
+        """ Test a query without usable index is reported """
+        sql, params = Tag.objects.filter(name__icontains='a') \
+            .query.sql_with_params()
+
+        self.assertEqual(explain(sql, params), ['core_tag'])
+
+    def test_explain_index_scan(self):
+        """ Test lists of a user are read by index """
+        sql, params = Tag.objects.filter(user_id=1) \
+            .order_by('-name', '-id').query.sql_with_params()
+
+        self.assertEqual(explain(sql, params), [])
+
+    def test_sqlite_plan_details(self):
+        """ Test scans of derived tables and index lookups are ignored """
+        details = [
+            'SCAN TABLE core_tag',
+            'SCAN core_recipe',
+            'SCAN SUBQUERY 1',
+            'SCAN subquery',
+            'SEARCH TABLE core_tag USING INDEX core_tag_user_name_idx '
+            '(user_id=?)',
+        ]
+        tables = {'core_tag', 'core_recipe'}
+
+        self.assertEqual(list(sqlite_seq_scans(details, tables)),
+                         ['core_tag', 'core_recipe'])
+
+    def test_failure_raises(self):
+        """ Test the command fails when a scan is found """
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, 'core_tag'
+            )
+            for name, constraint in constraints.items():
+                if constraint['index'] and not constraint['primary_key']:
+                    cursor.execute(f'DROP INDEX {name}')
+        out = StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command('check_query_plans', users=2, objects=20,
+                         stdout=out)
+
+        self.assertIn('sequential scan of core_tag', out.getvalue())
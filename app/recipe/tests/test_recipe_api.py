@@ -1,15 +1,22 @@
+import json
 import tempfile
 import os
+from base64 import urlsafe_b64encode
+from unittest.mock import patch
 
 from PIL import Image
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
 from core.models import Recipe, Ingredient, Tag
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.views import RecipeViewSet
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
@@ -25,6 +32,14 @@ def get_detail_recipe_url(recipe_id: int) -> str:
     return reverse('recipe:recipe-detail', args=[recipe_id])
 
 
+BULK_RECIPES_URL = reverse('recipe:recipe-bulk')
+
+
+def get_next_link(response):
+    """ Return next page url from the Link header """
+    return response.get('Link', '')[1:].partition('>')[0]
+
+
 def create_ingredient(user, name='Sample ingredient'):
     """ Create and return sample ingredient """
     return Ingredient.objects.create(user=user, name=name)
@@ -201,9 +216,449 @@ class PrivateRecipeAPITests(TestCase):
         self.assertEqual(tags.count(), 0)
 
 
+class RecipePaginationTests(TestCase):
+    """ Test cursor pagination of recipes """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+
+    def collect_pages(self, params):
+        """ Follow next links and return list of pages """
+        pages = []
+        response = self.client.get(RECIPES_URL, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            next_link = get_next_link(response)
+            if not next_link:
+                return pages
+            response = self.client.get(next_link)
+
+    def test_recipes_paginated_by_id(self):
+        """ Test recipes are paged newest first """
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+
+        pages = self.collect_pages({'page_size': 2})
+
+        self.assertEqual(
+            [[recipe['id'] for recipe in page] for page in pages],
+            [[recipes[4].id, recipes[3].id],
+             [recipes[2].id, recipes[1].id],
+             [recipes[0].id]]
+        )
+
+    def test_recipes_paginated_by_sort_key(self):
+        """ Test recipes are paged by chosen sort key with ties by id """
+        for price in (3, 1, 2, 2, 5):
+            create_recipe(user=self.user, price=price)
+
+        pages = self.collect_pages({'page_size': 2, 'ordering': 'price'})
+
+        recipes = Recipe.objects.order_by('price', 'id')
+        self.assertEqual(
+            [recipe['id'] for page in pages for recipe in page],
+            [recipe.id for recipe in recipes]
+        )
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+    def test_page_query_count_is_constant(self):
+        """ Test deep pages cost the same number of queries """
+        [create_recipe(user=self.user) for _ in range(6)]
+        response = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        for _ in range(2):
+            with self.assertNumQueries(4):
+                response = self.client.get(get_next_link(response))
+            self.assertEqual(len(response.data), 2)
+
+    def test_invalid_ordering(self):
+        """ Test unknown ordering returns bad request """
+        response = self.client.get(RECIPES_URL, {'ordering': 'link'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_cursor(self):
+        """ Test malformed cursor returns not found """
+        response = self.client.get(RECIPES_URL, {'cursor': 'garbage'})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_values(self):
+        """ Test cursors with values of the wrong type return not found """
+        create_recipe(user=self.user)
+        cursors = (
+            ('-id', ['abc', 1], {}),
+            ('-id', [[1], 1], {}),
+            ('price', ['x', 1], {'ordering': 'price'}),
+        )
+        for ordering, position, params in cursors:
+            cursor = urlsafe_b64encode(
+                json.dumps([ordering, position]).encode()
+            ).decode()
+
+            response = self.client.get(RECIPES_URL,
+                                       dict(params, cursor=cursor))
+
+            self.assertEqual(response.status_code,
+                             status.HTTP_404_NOT_FOUND, position)
+
+    def test_cursor_bound_to_ordering(self):
+        """ Test cursor can not be reused with another ordering """
+        [create_recipe(user=self.user) for _ in range(3)]
+        response = self.client.get(RECIPES_URL, {'page_size': 1})
+
+        response = self.client.get(
+            get_next_link(response) + '&ordering=title'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeStreamingTests(TestCase):
+    """ Test streaming recipe lists """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        tag = create_tag(user=self.user)
+        for _ in range(3):
+            create_recipe(user=self.user).tags.add(tag)
+        create_recipe(user=get_user_model().objects.create_user(
+            'guest@mail.com',
+            'password'
+        ))
+        self.expected = RecipeSerializer(
+            Recipe.objects.filter(user=self.user).order_by('-id'),
+            many=True
+        ).data
+
+    def test_stream_json_array(self):
+        """ Test streaming recipes as a JSON array """
+        response = self.client.get(RECIPES_URL, {'stream': '1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        content = b''.join(response.streaming_content)
+        self.assertEqual(json.loads(content.decode()),
+                         json.loads(json.dumps(self.expected)))
+
+    def test_stream_ndjson(self):
+        """ Test streaming recipes as newline delimited JSON """
+        response = self.client.get(RECIPES_URL,
+                                   HTTP_ACCEPT='application/x-ndjson')
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         json.loads(json.dumps(self.expected)))
+
+    def test_stream_query_count_is_constant(self):
+        """ Test streaming prefetches relations per chunk """
+        with patch.object(RecipeViewSet, 'stream_chunk_size', 2):
+            response = self.client.get(RECIPES_URL, {'stream': '1'})
+            # two chunks with recipes, tags and ingredients queries each
+            with self.assertNumQueries(5):
+                content = b''.join(response.streaming_content)
+
+        self.assertEqual(len(json.loads(content.decode())), 3)
+
+
+class RecipeBulkTests(TestCase):
+    """ Test bulk recipe create and update """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = create_tag(user=self.user)
+        self.ingredient = create_ingredient(user=self.user)
+
+    def post_bulk(self, recipes):
+        return self.client.post(BULK_RECIPES_URL, {'recipes': recipes},
+                                format='json')
+
+    def test_bulk_create(self):
+        """ Test creating many recipes with relations at once """
+        payload = [
+            {'title': f'Recipe {i}', 'time_minutes': i, 'price': '1.50',
+             'tags': [self.tag.id], 'ingredients': [self.ingredient.id]}
+            for i in range(1, 4)
+        ]
+
+        response = self.post_bulk(payload)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created'] * 3)
+        for result, item in zip(results, payload):
+            recipe = Recipe.objects.get(id=result['id'], user=self.user)
+            self.assertEqual(recipe.title, item['title'])
+            self.assertEqual(list(recipe.tags.all()), [self.tag])
+            self.assertEqual(list(recipe.ingredients.all()),
+                             [self.ingredient])
+
+    def test_bulk_update(self):
+        """ Test updating given fields and relations of many recipes """
+        recipe1 = create_recipe(user=self.user, title='Old 1')
+        recipe1.tags.add(self.tag)
+        recipe2 = create_recipe(user=self.user, title='Old 2', price=3)
+        new_tag = create_tag(user=self.user, name='New')
+
+        response = self.post_bulk([
+            {'id': recipe1.id, 'title': 'New 1', 'tags': [new_tag.id]},
+            {'id': recipe2.id, 'price': '7.25'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe1.title, 'New 1')
+        self.assertEqual(list(recipe1.tags.all()), [new_tag])
+        self.assertEqual(recipe2.title, 'Old 2')
+        self.assertEqual(str(recipe2.price), '7.25')
+
+    def test_bulk_query_count_is_constant(self):
+        """ Test batch size does not change the number of queries """
+        def payload(count):
+            return [{'title': 'Recipe', 'time_minutes': 1, 'price': '1.00',
+                     'tags': [self.tag.id]} for _ in range(count)]
+
+        with CaptureQueriesContext(connection) as small:
+            self.post_bulk(payload(2))
+        recipes = list(Recipe.objects.values_list('id', flat=True))
+        updates = [{'id': pk, 'title': 'Updated', 'tags': [self.tag.id]}
+                   for pk in recipes]
+        with self.assertNumQueries(10):
+            # ownership checks, update, clear and add tags, savepoints,
+            # replaced tags and their recount
+            self.post_bulk(updates)
+        if connection.features.can_return_ids_from_bulk_insert:
+            with self.assertNumQueries(len(small.captured_queries)):
+                self.post_bulk(payload(20))
+
+    def test_bulk_reports_item_errors(self):
+        """ Test invalid items are reported and valid ones saved """
+        guest = get_user_model().objects.create_user('guest@mail.com', 'pwd')
+        guest_tag = create_tag(user=guest)
+        guest_recipe = create_recipe(user=guest)
+
+        response = self.post_bulk([
+            {'title': 'Valid', 'time_minutes': 5, 'price': '1.00'},
+            {'title': 'No time', 'price': '1.00'},
+            {'title': 'Foreign tag', 'time_minutes': 5, 'price': '1.00',
+             'tags': [guest_tag.id]},
+            {'id': guest_recipe.id, 'title': 'Foreign recipe'},
+            'not an object',
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'error', 'error', 'error', 'error'])
+        self.assertIn('time_minutes', results[1]['errors'])
+        self.assertIn('tags', results[2]['errors'])
+        self.assertIn('id', results[3]['errors'])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+        guest_recipe.refresh_from_db()
+        self.assertNotEqual(guest_recipe.title, 'Foreign recipe')
+
+    def test_bulk_all_invalid(self):
+        """ Test batch without valid items returns bad request """
+        response = self.post_bulk([{'title': ''}])
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][0]['status'], 'error')
+
+    def test_bulk_refreshes_filter_index(self):
+        """ Test recipes created in bulk are visible to filters """
+        self.client.get(RECIPES_URL, {'tags': self.tag.id})
+
+        self.post_bulk([{'title': 'Tagged', 'time_minutes': 1,
+                         'price': '1.00', 'tags': [self.tag.id]}])
+        response = self.client.get(RECIPES_URL, {'tags': self.tag.id})
+
+        self.assertEqual([recipe['title'] for recipe in response.data],
+                         ['Tagged'])
+
+
+class RecipeConditionalTests(TestCase):
+    """ Test ETag and Last-Modified support of recipe endpoints """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.url = get_detail_recipe_url(self.recipe.id)
+
+    def test_detail_validators(self):
+        """ Test recipe detail returns ETag and Last-Modified """
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+    def test_detail_not_modified(self):
+        """ Test unchanged recipe detail is answered with 304 """
+        etag = self.client.get(self.url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+    def test_detail_not_modified_since(self):
+        """ Test recipe detail honours If-Modified-Since """
+        last_modified = self.client.get(self.url)['Last-Modified']
+
+        response = self.client.get(self.url,
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_with_relations(self):
+        """ Test changing tags or a tag name changes the recipe ETag """
+        etag = self.client.get(self.url)['ETag']
+        tag = create_tag(user=self.user)
+        self.recipe.tags.add(tag)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        tag.name = 'Renamed'
+        tag.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['tags'][0]['name'], 'Renamed')
+
+    def test_reverse_relation_change_touches_recipe(self):
+        """ Test changes from the tag side mark recipes as modified """
+        tag = create_tag(user=self.user)
+        updated_at = Recipe.objects.get(id=self.recipe.id).updated_at
+
+        tag.recipe_set.add(self.recipe)
+        added_at = Recipe.objects.get(id=self.recipe.id).updated_at
+        tag.recipe_set.clear()
+        cleared_at = Recipe.objects.get(id=self.recipe.id).updated_at
+
+        self.assertGreater(added_at, updated_at)
+        self.assertGreater(cleared_at, added_at)
+
+    def test_list_not_modified(self):
+        """ Test unchanged recipe list is answered with 304 """
+        response = self.client.get(RECIPES_URL)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(RECIPES_URL,
+                                       HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_changes_on_delete(self):
+        """ Test deleting a recipe changes the list ETag """
+        create_recipe(user=self.user)
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        self.recipe.delete()
+        response = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_list_etag_depends_on_query(self):
+        """ Test different pages of the list have different ETags """
+        create_recipe(user=self.user)
+        first = self.client.get(RECIPES_URL, {'page_size': 1})
+        second = self.client.get(get_next_link(first))
+
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+
+class RecipeQueryCountTests(TestCase):
+    """ Test that recipe endpoints run in a fixed number of queries """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = create_tag(user=self.user)
+        self.ingredient = create_ingredient(user=self.user)
+
+    def create_recipes(self, count):
+        """ Create recipes linked to the sample tag and ingredient """
+        recipes = [create_recipe(user=self.user) for _ in range(count)]
+        for recipe in recipes:
+            recipe.tags.add(
+                self.tag,
+                create_tag(user=self.user, name=f'Tag {recipe.id}')
+            )
+            recipe.ingredients.add(self.ingredient)
+        return recipes
+
+    def test_list_query_count_is_constant(self):
+        """ Test listing recipes does not query per recipe """
+        for count in (1, 10):
+            self.create_recipes(count)
+            # etag aggregate, recipes, tags and ingredients prefetch
+            with self.assertNumQueries(4):
+                response = self.client.get(RECIPES_URL)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_filtered_list_query_count_is_constant(self):
+        """ Test filtering recipes does not query per recipe """
+        params = {'tags': self.tag.id, 'ingredients': self.ingredient.id}
+        for count in (1, 10):
+            self.create_recipes(count)
+            # filter index is rebuilt once after recipes change
+            with self.assertNumQueries(7):
+                response = self.client.get(RECIPES_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            with self.assertNumQueries(4):
+                response = self.client.get(RECIPES_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_query_count(self):
+        """ Test retrieving recipe detail with nested tags and ingredients """
+        recipe = self.create_recipes(1)[0]
+        # etag lookup, recipe, tags and ingredients prefetch
+        with self.assertNumQueries(4):
+            response = self.client.get(get_detail_recipe_url(recipe.id))
+        self.assertEqual(len(response.data['tags']), 2)
+        self.assertEqual(len(response.data['ingredients']), 1)
+
+
 class RecipeImageUploadTests(TestCase):
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             'user@mail.com',
@@ -283,3 +738,297 @@ class RecipeImageUploadTests(TestCase):
         self.assertIn(serializer1.data, response.data)
         self.assertIn(serializer2.data, response.data)
         self.assertNotIn(serializer3.data, response.data)
+
+
+class RecipeFilterTests(TestCase):
+    """ Test filtering recipes by tags and ingredients """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = create_tag(user=self.user, name='Vegan')
+        self.dessert = create_tag(user=self.user, name='Dessert')
+        self.carrot = create_ingredient(user=self.user, name='Carrot')
+
+        self.cake = create_recipe(user=self.user, title='Carrot cake')
+        self.cake.tags.add(self.vegan, self.dessert)
+        self.cake.ingredients.add(self.carrot)
+        self.salad = create_recipe(user=self.user, title='Salad')
+        self.salad.tags.add(self.vegan)
+        self.steak = create_recipe(user=self.user, title='Steak')
+
+    def get_titles(self, params):
+        """ Request filtered recipes and return their titles """
+        response = self.client.get(RECIPES_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in response.data]
+
+    def test_filter_any_returns_distinct_recipes(self):
+        """ Test recipe matching several tags is returned once """
+        titles = self.get_titles(
+            {'tags': f'{self.vegan.id},{self.dessert.id}'}
+        )
+        self.assertEqual(titles, ['Salad', 'Carrot cake'])
+
+    def test_filter_all(self):
+        """ Test recipes must have every requested tag """
+        titles = self.get_titles({
+            'tags': f'{self.vegan.id},{self.dessert.id}',
+            'tags_mode': 'all',
+        })
+        self.assertEqual(titles, ['Carrot cake'])
+
+    def test_filter_none(self):
+        """ Test recipes with any requested tag are excluded """
+        titles = self.get_titles({
+            'tags': f'{self.dessert.id}',
+            'tags_mode': 'none',
+        })
+        self.assertEqual(titles, ['Steak', 'Salad'])
+
+    def test_filter_tags_and_ingredients_combined(self):
+        """ Test tag and ingredient criteria are intersected """
+        titles = self.get_titles({
+            'tags': f'{self.vegan.id}',
+            'ingredients': f'{self.carrot.id}',
+            'ingredients_mode': 'none',
+        })
+        self.assertEqual(titles, ['Salad'])
+
+    def test_filter_reflects_recipe_changes(self):
+        """ Test cached filter index is refreshed after recipe changes """
+        self.assertEqual(self.get_titles({'tags': self.dessert.id}),
+                         ['Carrot cake'])
+
+        self.steak.tags.add(self.dessert)
+        self.cake.delete()
+
+        self.assertEqual(self.get_titles({'tags': self.dessert.id}),
+                         ['Steak'])
+
+    def test_filter_ignores_other_users_attributes(self):
+        """ Test ids of other users tags do not match any recipe """
+        guest = get_user_model().objects.create_user('guest@mail.com', 'pwd')
+        guest_tag = create_tag(user=guest)
+        create_recipe(user=guest).tags.add(guest_tag)
+
+        self.assertEqual(self.get_titles({'tags': guest_tag.id}), [])
+
+    def test_filter_invalid_ids(self):
+        """ Test invalid ids return bad request """
+        response = self.client.get(RECIPES_URL, {'tags': '1,abc'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', response.data)
+
+    def test_filter_non_ascii_digits(self):
+        """ Test digits other than 0-9 return bad request """
+        response = self.client.get(RECIPES_URL, {'tags': '1,\u00b2'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', response.data)
+
+    def test_filter_invalid_mode(self):
+        """ Test unknown filter mode returns bad request """
+        response = self.client.get(
+            RECIPES_URL,
+            {'ingredients': self.carrot.id, 'ingredients_mode': 'some'}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('ingredients_mode', response.data)
+
+
+@patch('recipe.filters.MAX_MATCHED_IDS', 0)
+class RecipeFilterSubqueryTests(RecipeFilterTests):
+    """ Test filtering recipes beyond the id list limit with subqueries """
+
+    def test_no_id_list_for_large_matches(self):
+        """ Test matches above the limit are not sent as an id list """
+        with CaptureQueriesContext(connection) as queries:
+            self.get_titles({'tags': f'{self.vegan.id}'})
+
+        recipe_query = next(query['sql'] for query in queries.captured_queries
+                            if '"core_recipe"."title"' in query['sql'])
+        self.assertIn('"core_recipe"."id" IN (SELECT', recipe_query)
+
+
+class RecipeSearchTests(TestCase):
+    """ Test ranked search of recipes """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        chocolate = create_tag(user=self.user, name='Chocolate')
+        carrot = create_ingredient(user=self.user, name='Carrot')
+
+        self.cake = create_recipe(user=self.user, title='Chocolate cake')
+        self.muffin = create_recipe(user=self.user, title='Muffin')
+        self.muffin.tags.add(chocolate)
+        self.soup = create_recipe(user=self.user, title='Soup')
+        self.soup.ingredients.add(carrot)
+        create_recipe(user=self.user, title='Steak')
+
+    def get_titles(self, params):
+        """ Request searched recipes and return their titles """
+        response = self.client.get(RECIPES_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in response.data]
+
+    def test_search_ranks_title_over_tags(self):
+        """ Test title matches come before tag matches """
+        titles = self.get_titles({'search': 'chocolate'})
+
+        self.assertEqual(titles, ['Chocolate cake', 'Muffin'])
+
+    def test_search_ingredient_name(self):
+        """ Test recipes are found by ingredient name """
+        self.assertEqual(self.get_titles({'search': 'CARROT'}), ['Soup'])
+
+    def test_search_requires_every_term(self):
+        """ Test each term of the query must match """
+        titles = self.get_titles({'search': 'chocolate muffin'})
+
+        self.assertEqual(titles, ['Muffin'])
+
+    def test_search_only_own_recipes(self):
+        """ Test recipes of other users are not searched """
+        other = get_user_model().objects.create_user('other@mail.com', '123')
+        create_recipe(user=other, title='Chocolate pie')
+
+        self.assertNotIn('Chocolate pie',
+                         self.get_titles({'search': 'chocolate'}))
+
+    def test_search_paginates_by_rank(self):
+        """ Test cursor pages continue in rank order """
+        response = self.client.get(RECIPES_URL,
+                                   {'search': 'chocolate', 'page_size': 1})
+        self.assertEqual(response.data[0]['title'], 'Chocolate cake')
+
+        response = self.client.get(get_next_link(response))
+
+        self.assertEqual([recipe['title'] for recipe in response.data],
+                         ['Muffin'])
+        self.assertEqual(get_next_link(response), '')
+
+    def test_search_with_explicit_ordering(self):
+        """ Test matches can be ordered by another field """
+        titles = self.get_titles({'search': 'chocolate', 'ordering': 'title'})
+
+        self.assertEqual(titles, ['Chocolate cake', 'Muffin'])
+
+    def test_empty_search_lists_all(self):
+        """ Test blank search does not filter """
+        self.assertEqual(len(self.get_titles({'search': ' '})), 4)
+
+
+class RecipeSparseFieldsTests(TestCase):
+    """ Test selecting and expanding recipe fields """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@mail.com',
+            'password'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = create_tag(user=self.user)
+        self.ingredient = create_ingredient(user=self.user)
+        for _ in range(3):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+        self.recipe = recipe
+
+    def test_fields_narrow_output_and_queries(self):
+        """ Test only requested fields are loaded and returned """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPES_URL, {'fields': 'id,title'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0],
+                         {'id': self.recipe.id, 'title': 'Sample recipe'})
+        # etag aggregate and recipes, no relation prefetch
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('"price"', queries[1]['sql'])
+
+    def test_fields_with_one_relation(self):
+        """ Test only requested relations are prefetched """
+        with self.assertNumQueries(3):
+            response = self.client.get(RECIPES_URL, {'fields': 'id,tags'})
+
+        self.assertEqual(response.data[0],
+                         {'id': self.recipe.id, 'tags': [self.tag.id]})
+
+    def test_expand_relations(self):
+        """ Test expanded relations are inlined from the prefetch """
+        with self.assertNumQueries(4):
+            response = self.client.get(RECIPES_URL,
+                                       {'expand': 'tags,ingredients'})
+
+        self.assertEqual(response.data[0]['tags'], [
+            {'id': self.tag.id, 'name': self.tag.name}
+        ])
+        self.assertEqual(response.data[0]['ingredients'], [
+            {'id': self.ingredient.id, 'name': self.ingredient.name}
+        ])
+        self.assertIn('price', response.data[0])
+
+    def test_expand_implies_field(self):
+        """ Test expanded relation is returned with selected fields """
+        response = self.client.get(RECIPES_URL,
+                                   {'fields': 'title', 'expand': 'tags'})
+
+        self.assertEqual(response.data[0], {
+            'title': 'Sample recipe',
+            'tags': [{'id': self.tag.id, 'name': self.tag.name}],
+        })
+
+    def test_fields_with_ordering_and_cursor(self):
+        """ Test pages continue when ordering by an unselected field """
+        response = self.client.get(
+            RECIPES_URL, {'fields': 'id', 'ordering': 'price', 'page_size': 2}
+        )
+        self.assertEqual(len(response.data), 2)
+
+        response = self.client.get(get_next_link(response))
+
+        self.assertEqual(len(response.data), 1)
+
+    def test_fields_of_detail(self):
+        """ Test detail response can be narrowed """
+        url = get_detail_recipe_url(self.recipe.id)
+
+        response = self.client.get(url, {'fields': 'id,tags'})
+
+        self.assertEqual(response.data, {
+            'id': self.recipe.id,
+            'tags': [{'id': self.tag.id, 'name': self.tag.name}],
+        })
+
+    def test_fields_of_streamed_list(self):
+        """ Test streamed recipes are narrowed as well """
+        response = self.client.get(RECIPES_URL,
+                                   {'fields': 'title', 'stream': '1'})
+
+        self.assertEqual(
+            json.loads(b''.join(response.streaming_content)),
+            [{'title': 'Sample recipe'}] * 3
+        )
+
+    def test_invalid_fields(self):
+        """ Test unknown fields and relations are rejected """
+        for params in ({'fields': 'id,user'}, {'expand': 'title'}):
+            response = self.client.get(RECIPES_URL, params)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,208 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingredient, Recipe, RecipeStats
+from recipe.bulk import BulkRecipeWriter
+
+
+STATS_URL = reverse('recipe:stats')
+
+
+def create_recipe(user, **params):
+    defaults = {'title': 'Sample recipe', 'time_minutes': 10,
+                'price': Decimal('5.00')}
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeStatsTests(TestCase):
+    """ Test incrementally maintained recipe stats """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+
+    def assertStats(self, **expected):
+        row = RecipeStats.objects.get(user=self.user)
+        for name, value in expected.items():
+            self.assertEqual(getattr(row, name), value, name)
+
+    def assertMatchesRebuild(self):
+        """ Assert maintained stats equal stats computed from scratch """
+        row = RecipeStats.objects.filter(user=self.user).values().first()
+        counts = {model: dict(model.objects.values_list('id', 'recipe_count'))
+                  for model in (Tag, Ingredient)}
+
+        call_command('rebuild_recipe_stats', stdout=StringIO())
+
+        self.assertEqual(
+            RecipeStats.objects.filter(user=self.user).values().first(), row
+        )
+        for model, values in counts.items():
+            self.assertEqual(
+                dict(model.objects.values_list('id', 'recipe_count')), values
+            )
+
+    def test_create_and_update(self):
+        """ Test created and updated recipes change aggregates """
+        create_recipe(self.user, price=Decimal('4.00'), time_minutes=30)
+        recipe = create_recipe(self.user, price=Decimal('8.50'),
+                               time_minutes=10)
+
+        self.assertStats(recipe_count=2, price_total=Decimal('12.50'),
+                         price_min=Decimal('4.00'), price_max=Decimal('8.50'),
+                         time_minutes_total=40, time_minutes_min=10,
+                         time_minutes_max=30)
+
+        recipe.price = Decimal('2.00')
+        recipe.save()
+
+        self.assertStats(recipe_count=2, price_total=Decimal('6.00'),
+                         price_min=Decimal('2.00'), price_max=Decimal('4.00'))
+        self.assertMatchesRebuild()
+
+    def test_delete_extreme(self):
+        """ Test deleting the most expensive recipe recomputes max """
+        create_recipe(self.user, price=Decimal('3.00'))
+        expensive = create_recipe(self.user, price=Decimal('9.00'))
+
+        expensive.delete()
+
+        self.assertStats(recipe_count=1, price_total=Decimal('3.00'),
+                         price_max=Decimal('3.00'))
+        self.assertMatchesRebuild()
+
+    def test_delete_last(self):
+        """ Test deleting every recipe empties aggregates """
+        create_recipe(self.user).delete()
+
+        self.assertStats(recipe_count=0, price_total=Decimal('0'),
+                         price_min=None, time_minutes_max=None)
+
+    def test_recipe_counts(self):
+        """ Test recipe counts follow relation changes """
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        dessert = Tag.objects.create(user=self.user, name='Dessert')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        first = create_recipe(self.user)
+        second = create_recipe(self.user)
+
+        first.tags.add(vegan, dessert)
+        second.tags.add(vegan)
+        second.ingredients.add(salt)
+        vegan.refresh_from_db()
+        self.assertEqual(vegan.recipe_count, 2)
+
+        first.tags.remove(vegan)
+        first.tags.remove(vegan)
+        second.tags.clear()
+        dessert.recipe_set.add(second)
+        first.delete()
+
+        vegan.refresh_from_db()
+        dessert.refresh_from_db()
+        salt.refresh_from_db()
+        self.assertEqual(vegan.recipe_count, 0)
+        self.assertEqual(dessert.recipe_count, 1)
+        self.assertEqual(salt.recipe_count, 1)
+        self.assertMatchesRebuild()
+
+    def test_bulk_writer(self):
+        """ Test bulk created and updated recipes are counted """
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(self.user, price=Decimal('9.00'))
+        recipe.tags.add(tag)
+
+        BulkRecipeWriter(self.user, [
+            {'title': 'New', 'time_minutes': 5, 'price': '1.00',
+             'tags': [tag.id]},
+            {'id': recipe.id, 'price': '2.00', 'tags': []},
+        ]).save()
+
+        self.assertStats(recipe_count=2, price_total=Decimal('3.00'),
+                         price_min=Decimal('1.00'), price_max=Decimal('2.00'))
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+        self.assertMatchesRebuild()
+
+    def test_rebuild_fixes_drift(self):
+        """ Test rebuild recomputes stats changed behind the signals """
+        recipe = create_recipe(self.user)
+        Recipe.objects.filter(pk=recipe.pk).update(time_minutes=99)
+
+        call_command('rebuild_recipe_stats', user_ids=[self.user.id],
+                     stdout=StringIO())
+
+        self.assertStats(recipe_count=1, time_minutes_total=99)
+
+    def test_missing_row_is_rebuilt(self):
+        """ Test stats of a user without summary row start from recipes """
+        create_recipe(self.user, time_minutes=20)
+        RecipeStats.objects.all().delete()
+
+        create_recipe(self.user, time_minutes=40)
+
+        self.assertStats(recipe_count=2, time_minutes_total=60)
+
+
+class RecipeStatsApiTests(TestCase):
+    """ Test the recipe stats endpoint """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@londonappdev.com', 'testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        """ Test that authentication is required """
+        response = APIClient().get(STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_empty(self):
+        """ Test stats of a user without recipes """
+        response = self.client.get(STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recipe_count'], 0)
+        self.assertEqual(response.data['price'],
+                         {'average': None, 'min': None, 'max': None})
+        self.assertEqual(response.data['top_tags'], [])
+
+    def test_stats(self):
+        """ Test aggregates and top tags of the user only """
+        other = get_user_model().objects.create_user(
+            'other@londonappdev.com', 'testpass'
+        )
+        create_recipe(other, price=Decimal('100.00'))
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        quick = Tag.objects.create(user=self.user, name='Quick')
+        Tag.objects.create(user=self.user, name='Unused')
+        for price, time_minutes in (('4.00', 10), ('5.00', 15), ('9.00', 20)):
+            recipe = create_recipe(self.user, price=Decimal(price),
+                                   time_minutes=time_minutes)
+            recipe.tags.add(vegan)
+        recipe.tags.add(quick)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(STATS_URL)
+
+        self.assertEqual(response.data['recipe_count'], 3)
+        self.assertEqual(response.data['price'],
+                         {'average': '6.00', 'min': '4.00', 'max': '9.00'})
+        self.assertEqual(response.data['time_minutes'],
+                         {'average': Decimal('15.0'), 'min': 10, 'max': 20})
+        self.assertEqual(response.data['top_tags'], [
+            {'id': vegan.id, 'name': 'Vegan', 'recipe_count': 3},
+            {'id': quick.id, 'name': 'Quick', 'recipe_count': 1},
+        ])
@@ -1,16 +1,27 @@
+import tempfile
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
-from django.test import TestCase
+from django.db import transaction
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Tag
+from core.models import Tag, Recipe
 
-from recipe.serializers import TagSerializer
+from recipe.autocomplete import autocomplete_indexes
+from recipe.cache import tag_list_cache
+from recipe.serializers import TagUsageSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+GET_OR_CREATE_TAGS_URL = reverse('recipe:tag-get-or-create')
 
 
 class PublicTagsApiTests(TestCase):
@@ -29,6 +40,7 @@ class PrivateTagsApiTests(TestCase):
     """ Test the authorized user tags API """
 
     def setUp(self):
+        cache.clear()
         self.auth_user = get_user_model().objects.create_user(
             'bob@mail.com',
             'secret'
@@ -48,7 +60,7 @@ class PrivateTagsApiTests(TestCase):
         response = self.client.get(TAGS_URL)
 
         tags = Tag.objects.all().order_by('-name')
-        serializer = TagSerializer(tags, many=True)
+        serializer = TagUsageSerializer(tags, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
 
@@ -79,3 +91,247 @@ class PrivateTagsApiTests(TestCase):
 
         self.assertEqual(response.status_code,
                          status.HTTP_400_BAD_REQUEST)
+
+    def test_tags_paginated_by_cursor(self):
+        """ Test tags are paged by name and id with a next link """
+        for name in ('Vegan', 'Dessert', 'Dinner', 'Breakfast'):
+            Tag.objects.create(user=self.auth_user, name=name)
+        expected = TagUsageSerializer(
+            Tag.objects.all().order_by('-name', '-id'), many=True
+        ).data
+
+        pages = []
+        url = TAGS_URL + '?page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.get('Link', '')[1:].partition('>')[0]
+
+        self.assertEqual([len(page) for page in pages], [3, 1])
+        self.assertEqual(pages[0] + pages[1], expected)
+
+    def test_tags_list_cached(self):
+        """ Test repeated tag lists are served from cache """
+        Tag.objects.create(user=self.auth_user, name='Vegan')
+        response = self.client.get(TAGS_URL)
+        stats = tag_list_cache.stats()
+
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(TAGS_URL)
+
+        self.assertEqual(cached_response.data, response.data)
+        self.assertEqual(tag_list_cache.stats()['hits'], stats['hits'] + 1)
+
+    def test_tags_cache_keyed_by_query(self):
+        """ Test pages are cached separately with their next link """
+        for name in ('Vegan', 'Dessert'):
+            Tag.objects.create(user=self.auth_user, name=name)
+        self.client.get(TAGS_URL)
+
+        response = self.client.get(TAGS_URL, {'page_size': 1})
+        cached_response = self.client.get(TAGS_URL, {'page_size': 1})
+
+        self.assertEqual(len(cached_response.data), 1)
+        self.assertEqual(cached_response['Link'], response['Link'])
+
+    def test_tags_cache_invalidated_on_write(self):
+        """ Test creating or deleting a tag refreshes cached lists """
+        self.client.get(TAGS_URL)
+
+        self.client.post(TAGS_URL, {'name': 'New tag'})
+        response = self.client.get(TAGS_URL)
+        self.assertEqual([tag['name'] for tag in response.data], ['New tag'])
+
+        Tag.objects.get(name='New tag').delete()
+        response = self.client.get(TAGS_URL)
+        self.assertEqual(response.data, [])
+
+    def test_tags_cache_limited_to_user(self):
+        """ Test writes of other users keep the cached list """
+        Tag.objects.create(user=self.auth_user, name='Vegan')
+        self.client.get(TAGS_URL)
+
+        Tag.objects.create(user=self.guest_user, name='Fruits')
+
+        with self.assertNumQueries(0):
+            self.client.get(TAGS_URL)
+
+    def test_tags_cache_expires(self):
+        """ Test cached lists expire when a write misses the version bump """
+        tag = Tag.objects.create(user=self.auth_user, name='Vegan')
+        self.client.get(TAGS_URL)
+        # Raw update sends no signal, so the version is not bumped
+        Tag.objects.filter(pk=tag.pk).update(name='Fruits')
+
+        later = time.time() + tag_list_cache.timeout + 1
+        with patch('time.time', return_value=later):
+            response = self.client.get(TAGS_URL)
+
+        self.assertEqual([tag['name'] for tag in response.data], ['Fruits'])
+
+    def test_tags_cache_with_file_backend(self):
+        """ Test versioned cache works with the file based backend """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            caches = {'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.'
+                           'FileBasedCache',
+                'LOCATION': cache_dir,
+            }}
+            with override_settings(CACHES=caches):
+                self.client.get(TAGS_URL)
+                Tag.objects.create(user=self.auth_user, name='Vegan')
+                response = self.client.get(TAGS_URL)
+                with self.assertNumQueries(0):
+                    cached_response = self.client.get(TAGS_URL)
+
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(cached_response.data, response.data)
+
+    def test_create_tag_duplicate_name(self):
+        """ Test creating a tag with existing name in other case fails """
+        Tag.objects.create(user=self.auth_user, name='Vegan')
+        Tag.objects.create(user=self.guest_user, name='Dessert')
+
+        response = self.client.post(TAGS_URL, {'name': 'vegan'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(TAGS_URL, {'name': 'Dessert'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_get_or_create_tags(self):
+        """ Test tags are resolved by name and missing ones created """
+        vegan = Tag.objects.create(user=self.auth_user, name='Vegan')
+        Tag.objects.create(user=self.guest_user, name='Dessert')
+        self.client.get(TAGS_URL)
+
+        response = self.client.post(
+            GET_OR_CREATE_TAGS_URL,
+            {'names': ['vegan', 'Dessert', 'Breakfast', 'DESSERT']},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [tag['id'] for tag in response.data]
+        self.assertEqual(ids[0], vegan.id)
+        self.assertEqual([tag['name'] for tag in response.data],
+                         ['Vegan', 'Dessert', 'Breakfast', 'Dessert'])
+        self.assertEqual(ids[1], ids[3])
+        self.assertEqual(len(set(ids)), 3)
+        tags = Tag.objects.filter(user=self.auth_user)
+        self.assertEqual(sorted(tag.name for tag in tags),
+                         ['Breakfast', 'Dessert', 'Vegan'])
+        listed = self.client.get(TAGS_URL).data
+        self.assertEqual(len(listed), 3)
+
+    def test_get_or_create_tags_single_insert(self):
+        """ Test get-or-create uses one insert and one select """
+        with self.assertNumQueries(2):
+            self.client.post(GET_OR_CREATE_TAGS_URL,
+                             {'names': [f'Tag {i}' for i in range(50)]},
+                             format='json')
+
+    def test_get_or_create_tags_invalid(self):
+        """ Test get-or-create validates names """
+        response = self.client.post(GET_OR_CREATE_TAGS_URL,
+                                    {'names': ['']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def create_recipe(self, *tags):
+        recipe = Recipe.objects.create(user=self.auth_user, title='Recipe',
+                                       time_minutes=5, price=Decimal('1.00'))
+        recipe.tags.add(*tags)
+        return recipe
+
+    def test_recipe_count(self):
+        """ Test tags are listed with recipe counts in one query """
+        vegan = Tag.objects.create(user=self.auth_user, name='Vegan')
+        dessert = Tag.objects.create(user=self.auth_user, name='Dessert')
+        Tag.objects.create(user=self.auth_user, name='Unused')
+        self.create_recipe(vegan, dessert)
+        self.create_recipe(vegan)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(TAGS_URL)
+
+        counts = {tag['name']: tag['recipe_count'] for tag in response.data}
+        self.assertEqual(counts, {'Vegan': 2, 'Dessert': 1, 'Unused': 0})
+
+    def test_assigned_only(self):
+        """ Test only tags used by recipes are listed """
+        vegan = Tag.objects.create(user=self.auth_user, name='Vegan')
+        Tag.objects.create(user=self.auth_user, name='Unused')
+        self.create_recipe(vegan)
+
+        response = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(response.data, [
+            {'id': vegan.id, 'name': 'Vegan', 'recipe_count': 1},
+        ])
+
+    def test_counts_follow_relation_changes(self):
+        """ Test cached lists are invalidated when recipes change """
+        vegan = Tag.objects.create(user=self.auth_user, name='Vegan')
+        recipe = self.create_recipe()
+        self.client.get(TAGS_URL)
+
+        recipe.tags.add(vegan)
+        self.assertEqual(self.client.get(TAGS_URL).data[0]['recipe_count'], 1)
+
+        recipe.delete()
+        self.assertEqual(self.client.get(TAGS_URL).data[0]['recipe_count'], 0)
+
+    @override_settings(RECIPE_COUNT_FROM_COUNTERS=True)
+    def test_recipe_count_from_counters(self):
+        """ Test counts and filter can use maintained counters """
+        vegan = Tag.objects.create(user=self.auth_user, name='Vegan')
+        Tag.objects.create(user=self.auth_user, name='Unused')
+        self.create_recipe(vegan)
+        self.create_recipe(vegan)
+
+        with self.assertNumQueries(1) as context:
+            response = self.client.get(TAGS_URL, {'assigned_only': 'true'})
+
+        sql = context.captured_queries[0]['sql']
+        self.assertNotIn('core_recipe_tags', sql)
+        self.assertEqual(response.data, [
+            {'id': vegan.id, 'name': 'Vegan', 'recipe_count': 2},
+        ])
+
+
+class TagCommitTests(TransactionTestCase):
+    """ Test caches are invalidated when tag writes commit """
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('test@mail.com',
+                                                         'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_cached_before_commit_is_dropped(self):
+        """ Test list cached by a request reading before commit is stale """
+        with transaction.atomic():
+            Tag.objects.create(user=self.user, name='Vegan')
+            # A concurrent request does not see the uncommitted tag yet
+            key, _entry = tag_list_cache.get(self.user.id, QueryDict())
+            tag_list_cache.set(key, {'data': [], 'headers': {}})
+
+        response = self.client.get(TAGS_URL)
+
+        self.assertEqual([tag['name'] for tag in response.data], ['Vegan'])
+
+    def test_autocomplete_names_published_on_commit(self):
+        """ Test names of rolled back tags are not suggested """
+        autocomplete_indexes.get(self.user.id)
+
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Tag.objects.create(user=self.user, name='Vanilla')
+            raise RuntimeError()
+        with transaction.atomic():
+            Tag.objects.create(user=self.user, name='Vegan')
+
+        names = [name for _kind, _id, name in autocomplete_indexes
+                 .get(self.user.id).search('v', {'tag'}, 10)]
+        self.assertEqual(names, ['Vegan'])
@@ -0,0 +1,198 @@
+import io
+import os
+import tempfile
+import threading
+import time
+
+from unittest.mock import patch
+
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe
+
+from recipe import variants
+
+
+def save_image(size=(400, 200)):
+    """ Save sample recipe image and return its storage name """
+    output = io.BytesIO()
+    Image.new('RGB', size).save(output, format='JPEG')
+    return default_storage.save('uploads/recipe/sample.jpg',
+                                ContentFile(output.getvalue()))
+
+
+class SingleFlightTests(TestCase):
+    """ Test sharing concurrent computations """
+
+    def test_concurrent_calls_share_result(self):
+        """ Test only one caller computes while others wait """
+        flight = variants.SingleFlight()
+        calls = []
+        done = set()
+
+        def compute():
+            if 'key' in done:
+                return 'cached'
+            calls.append(1)
+            time.sleep(0.05)
+            done.add('key')
+            return 'computed'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(flight.run('key', compute))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), ['cached'] * 4 + ['computed'])
+        self.assertEqual(flight._locks, {})
+
+
+class VariantCacheTests(TestCase):
+    """ Test on-disk variant cache """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = save_image()
+
+    def tearDown(self):
+        default_storage.delete(self.source)
+
+    def test_generate_variant(self):
+        """ Test variant is resized to requested width """
+        cache = variants.VariantCache(self.directory, 10 ** 6)
+
+        path = cache.get_path(self.source, 100, 'webp')
+
+        with Image.open(path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (100, 50))
+
+    def test_never_upscale(self):
+        """ Test small images keep their size """
+        cache = variants.VariantCache(self.directory, 10 ** 6)
+
+        path = cache.get_path(self.source, 800, 'jpeg')
+
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (400, 200))
+
+    def test_evict_least_recently_used(self):
+        """ Test oldest variants are removed over the size limit """
+        cache = variants.VariantCache(self.directory, 10 ** 6)
+        first = cache.get_path(self.source, 100, 'png')
+        second = cache.get_path(self.source, 200, 'png')
+        os.utime(first, (1, 1))
+        os.utime(second, (2, 2))
+        cache.get_path(self.source, 100, 'png')
+
+        cache.max_size = os.path.getsize(first) + \
+            os.path.getsize(second) - 1
+        cache.evict()
+
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertEqual(cache.size, os.path.getsize(first))
+
+    def test_scan_only_over_size_limit(self):
+        """ Test misses under the limit do not scan the directory """
+        cache = variants.VariantCache(self.directory, 10 ** 6)
+
+        with patch('os.scandir', wraps=os.scandir) as scandir:
+            for width in (100, 200, 400):
+                cache.get_path(self.source, width, 'png')
+
+        self.assertEqual(scandir.call_count, 1)
+        self.assertEqual(cache.size, sum(
+            os.path.getsize(entry.path) for entry in os.scandir(self.directory)
+        ))
+
+    def test_evicted_variant_generated_again(self):
+        """ Test variant removed before it is opened is still served """
+        cache = variants.VariantCache(self.directory, 10 ** 6)
+        get_path = cache.get_path
+
+        def get_evicted_path(*args):
+            path = get_path(*args)
+            os.remove(path)
+            return path
+
+        with patch.object(cache, 'get_path', get_evicted_path):
+            with cache.open(self.source, 100, 'png') as file:
+                image = Image.open(file)
+                self.assertEqual(image.size, (100, 50))
+
+
+class VariantViewTests(TestCase):
+    """ Test serving image variants """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(
+            IMAGE_VARIANT_CACHE_DIR=self.directory
+        )
+        self.settings.enable()
+        self.source = save_image()
+        self.url = reverse('recipe-image-variant',
+                           args=[os.path.basename(self.source)])
+        self.user = get_user_model().objects.create_user('user@mail.com',
+                                                         'secret')
+        Recipe.objects.create(user=self.user, title='Cake', time_minutes=5,
+                              price=5, image=self.source)
+        token = Token.objects.create(user=self.user)
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+
+    def tearDown(self):
+        self.settings.disable()
+        default_storage.delete(self.source)
+
+    def test_serve_variant(self):
+        """ Test variant is served with long lived cache headers """
+        response = self.client.get(self.url, {'w': 200, 'fmt': 'webp'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        image = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(image.width, 200)
+
+    def test_invalid_parameters(self):
+        """ Test unsupported width or format is rejected """
+        for params in ({}, {'w': 'abc'}, {'w': 123}, {'w': 200, 'fmt': 'x'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_other_users_rejected(self):
+        """ Test variants are only served to owners of the image """
+        del self.client.defaults['HTTP_AUTHORIZATION']
+        response = self.client.get(self.url, {'w': 200})
+        self.assertEqual(response.status_code, 404)
+
+        guest = get_user_model().objects.create_user('guest@mail.com',
+                                                     'secret')
+        token = Token.objects.create(user=guest)
+        response = self.client.get(self.url, {'w': 200},
+                                   HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_image(self):
+        """ Test unknown image returns not found """
+        url = reverse('recipe-image-variant', args=['missing.jpg'])
+
+        response = self.client.get(url, {'w': 200})
+
+        self.assertEqual(response.status_code, 404)
@@ -12,5 +12,8 @@ router.register('recipes', views.RecipeViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('autocomplete/', views.AutocompleteView.as_view(),
+         name='autocomplete'),
+    path('stats/', views.RecipeStatsView.as_view(), name='stats'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,189 @@
+import io
+import os
+import tempfile
+import threading
+
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+
+FORMATS = {
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'png': ('PNG', 'png', 'image/png'),
+}
+
+
+class SingleFlight:
+    """ Let concurrent callers for the same key share one computation """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks = {}
+
+    def run(self, key, func):
+        with self._lock:
+            lock, waiters = self._locks.get(key, (threading.Lock(), 0))
+            self._locks[key] = (lock, waiters + 1)
+        try:
+            with lock:
+                return func()
+        finally:
+            with self._lock:
+                lock, waiters = self._locks[key]
+                if waiters == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, waiters - 1)
+
+
+class VariantCache:
+    """
+    Size bounded on-disk LRU cache of resized recipe images.
+
+    Variants are written to a temporary file and renamed into place, hits
+    refresh the file mtime. The size of the directory is kept as a running
+    total of stored variants, counted once per process, and once it grows
+    over `max_size` bytes the least recently used files are evicted down
+    to EVICT_TARGET of it, so the directory is not scanned on every miss.
+    Variants stored by other processes are counted by that scan. Generation
+    of the same variant is shared between threads of the process, other
+    processes at worst generate it again.
+    """
+    EVICT_TARGET = 0.9
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.flight = SingleFlight()
+        self.size = None
+        self._lock = threading.Lock()
+
+    def open(self, source_name, width, fmt):
+        """
+        Return the variant opened for reading, generating it when missing.
+
+        An open file survives eviction. A variant evicted by another
+        request between generation and opening is generated once more,
+        then served from memory.
+        """
+        for _attempt in range(2):
+            path = self.get_path(source_name, width, fmt)
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                continue
+        return io.BytesIO(render_variant(source_name, width, fmt))
+
+    def get_path(self, source_name, width, fmt):
+        """ Return path to the variant, generating it when missing """
+        stem = os.path.splitext(os.path.basename(source_name))[0]
+        path = os.path.join(self.directory,
+                            f'{stem}-w{width}.{FORMATS[fmt][1]}')
+        if self.touch(path):
+            return path
+
+        def generate():
+            if self.touch(path):
+                return path
+            data = render_variant(source_name, width, fmt)
+            self.store(path, data)
+            if self.add_size(len(data)) > self.max_size:
+                self.evict()
+            return path
+
+        return self.flight.run(path, generate)
+
+    @staticmethod
+    def touch(path):
+        """ Mark cached file as recently used, return whether it exists """
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def store(self, path, data):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+
+    def add_size(self, size):
+        """ Add size of a stored variant, return the directory size """
+        with self._lock:
+            if self.size is None:
+                self.size = sum(size for _mtime, size, _path
+                                in self.scan())
+            else:
+                self.size += size
+            return self.size
+
+    def scan(self):
+        """ Return (mtime, size, path) of cached variants """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.tmp') or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """ Remove least recently used variants over the size target """
+        entries = self.scan()
+        total = sum(size for _mtime, size, _path in entries)
+        target = self.max_size * self.EVICT_TARGET
+        if total > self.max_size:
+            for _mtime, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        with self._lock:
+            self.size = total
+
+
+def render_variant(source_name, width, fmt):
+    """ Return source image resized to width (never upscaled) in format """
+    with default_storage.open(source_name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+
+    pil_format = FORMATS[fmt][0]
+    if pil_format == 'JPEG':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    output = io.BytesIO()
+    image.save(output, format=pil_format, quality=80)
+    return output.getvalue()
+
+
+_variant_cache = None
+
+
+def get_variant_cache():
+    """ Return process wide variant cache configured from settings """
+    global _variant_cache
+    directory = getattr(settings, 'IMAGE_VARIANT_CACHE_DIR',
+                        os.path.join(settings.MEDIA_ROOT, 'variants'))
+    max_size = getattr(settings, 'IMAGE_VARIANT_CACHE_SIZE', 512 * 2 ** 20)
+    if _variant_cache is None or _variant_cache.directory != directory \
+            or _variant_cache.max_size != max_size:
+        _variant_cache = VariantCache(directory, max_size)
+    return _variant_cache
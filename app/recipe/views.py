@@ -1,69 +1,304 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max, Prefetch
+from django.http import (
+    FileResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
+)
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
+from django.utils.translation import gettext_lazy as _
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
 from core.models import Tag, Ingredient, Recipe
+from core.views import can_read_media, get_media_path
+from user.authentication import (
+    CachedTokenAuthentication, SignedTokenAuthentication
+)
 
-from recipe import serializers
+from recipe import (
+    serializers, filters, renderers, streaming, conditional, images,
+    variants, search, fast, stats, export
+)
+from recipe.autocomplete import autocomplete_indexes
+from recipe.bulk import BulkRecipeWriter
+from recipe.cache import tag_list_cache, ingredient_list_cache
 
 
 class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """ Base viewset for users owned recipe attributes """
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (SignedTokenAuthentication,
+                              CachedTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    ordering = '-name'
+    list_cache = None
+    fast_serializer_class = None
 
     def get_queryset(self):
-        """ Return objects for the authenticated user """
-        return self.queryset.filter(user=self.request.user).order_by('-name')
+        """
+        Return objects for the authenticated user with their recipe
+        count, only those used by recipes for `?assigned_only=1`.
+        """
+        queryset = self.queryset.filter(user=self.request.user)
+        count_field = self.get_count_field()
+        if count_field != 'recipe_count':
+            queryset = queryset.annotate(**{
+                count_field: stats.count_recipes(self.queryset.model)
+            })
+        if self.request.query_params.get('assigned_only') in ('1', 'true'):
+            queryset = queryset.filter(**{f'{count_field}__gt': 0})
+        return queryset.order_by(self.ordering, '-id')
+
+    @staticmethod
+    def get_count_field():
+        """
+        Return field holding recipe counts, the counters maintained on
+        relation writes when RECIPE_COUNT_FROM_COUNTERS, else counted
+        in the list query.
+        """
+        if getattr(settings, 'RECIPE_COUNT_FROM_COUNTERS', False):
+            return 'recipe_count'
+        return 'counted_recipes'
+
+    def list(self, request, *args, **kwargs):
+        """ List objects, served from the versioned cache when possible """
+        key, entry = self.list_cache.get(request.user.id, request.query_params)
+        if entry is not None:
+            return Response(entry['data'], headers=entry['headers'])
+
+        reader = self.fast_serializer_class(
+            sources={'recipe_count': self.get_count_field()}
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(reader.get_rows(queryset))
+        response = self.get_paginated_response(reader.serialize(page))
+        headers = {name: response[name] for name in ('Link', )
+                   if response.has_header(name)}
+        self.list_cache.set(key, {'data': response.data, 'headers': headers})
+        return response
 
     def perform_create(self, serializer):
         """ Create new object """
-        serializer.save(user=self.request.user)
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise ValidationError({'name': [_('This name already exists.')]})
+
+    def get_serializer_class(self):
+        if self.action == 'get_or_create':
+            return serializers.NamesSerializer
+        return self.serializer_class
+
+    @action(methods=['POST'], detail=False, url_path='get-or-create')
+    def get_or_create(self, request):
+        """ Return ids and stored names for names, creating missing ones """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        names = serializer.validated_data['names']
+
+        rows, created = self.queryset.model.objects.get_or_create_by_names(
+            request.user, names
+        )
+        if created:
+            self.list_cache.bump(request.user.id)
+            autocomplete_indexes.invalidate(request.user.id)
+        return Response([{'id': id_, 'name': name} for id_, name in rows])
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """ Manage tags """
     queryset = Tag.objects.all()
-    serializer_class = serializers.TagSerializer
+    serializer_class = serializers.TagUsageSerializer
+    fast_serializer_class = fast.FastTagUsageSerializer
+    list_cache = tag_list_cache
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """ Manage ingredients """
     queryset = Ingredient.objects.all()
-    serializer_class = serializers.IngredientSerializer
+    serializer_class = serializers.IngredientUsageSerializer
+    fast_serializer_class = fast.FastIngredientUsageSerializer
+    list_cache = ingredient_list_cache
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """ Manage recipes in the database """
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication, )
+    authentication_classes = (SignedTokenAuthentication,
+                              CachedTokenAuthentication, )
     permission_classes = (IsAuthenticated, )
+    filter_backends = (filters.RecipeAttrFilter, search.RecipeSearchFilter)
+    ordering = '-id'
+    ordering_fields = ('id', 'title', 'time_minutes', 'price')
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [
+        renderers.NDJSONRenderer,
+    ]
+    stream_chunk_size = 500
+    export_chunk_size = 2000
+    relation_fields = ('tags', 'ingredients')
 
     def get_queryset(self):
         """ Retrieve the recipes for the authenticated user """
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        queryset = self.queryset.filter(user=self.request.user) \
+            .defer('search_vector') \
+            .prefetch_related(*self.get_prefetch_fields()) \
+            .order_by('-id')
+
+        fields, _expand = self.get_field_selection()
+        if fields:
+            ordering = self.request.query_params.get('ordering', '')
+            columns = {name for name in fields
+                       if name not in self.relation_fields}
+            if ordering.lstrip('-') in self.ordering_fields:
+                columns.add(ordering.lstrip('-'))
+            queryset = queryset.only('id', *columns)
+        return queryset
+
+    def get_field_selection(self):
+        """
+        Return fields and relations to expand requested by `?fields=` and
+        `?expand=` of list and detail requests.
+        """
+        if hasattr(self, '_field_selection'):
+            return self._field_selection
+        if self.action not in ('list', 'retrieve'):
+            self._field_selection = (None, set())
+            return self._field_selection
+
+        params = self.request.query_params
+        expand = filters.parse_names(params.get('expand', ''))
+        fields = filters.parse_names(params.get('fields', ''))
+        errors = {}
+        allowed = serializers.RecipeSerializer.Meta.fields
+        if expand - set(self.relation_fields):
+            errors['expand'] = [_('Expected any of: {fields}.').format(
+                fields=', '.join(self.relation_fields)
+            )]
+        if fields - set(allowed):
+            errors['fields'] = [_('Expected any of: {fields}.').format(
+                fields=', '.join(allowed)
+            )]
+        if errors:
+            raise ValidationError(errors)
+
+        self._field_selection = (fields | expand if fields else None, expand)
+        return self._field_selection
+
+    def get_prefetch_fields(self):
+        """ Return prefetches, ordered by id, of included relations """
+        fields, _expand = self.get_field_selection()
+        return [
+            Prefetch(name, queryset=Recipe._meta.get_field(name)
+                     .related_model.objects.order_by('id'))
+            for name in self.relation_fields if not fields or name in fields
+        ]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields, expand = self.get_field_selection()
+        if fields:
+            context['fields'] = fields
+        if expand and self.action == 'list':
+            context['expand'] = expand
+        return context
+
+    def get_ordering(self):
+        """ Order search results by rank unless asked otherwise """
+        if search.get_search_text(self.request):
+            return '-search_rank'
+        return self.ordering
+
+    def list(self, request, *args, **kwargs):
+        """
+        List recipes, streaming them when requested.
+
+        The ETag is derived from the count and latest modification of the
+        matching recipes, so unchanged lists are answered with 304 without
+        loading any recipe. Last-Modified is informational only, since it
+        can not reflect deleted recipes.
+        """
+        fields, expand = self.get_field_selection()
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.aggregate(count=Count('id'),
+                                   last_modified=Max('updated_at'))
+        etag = conditional.make_etag(
+            request.user.id,
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            state['count'],
+            state['last_modified'],
+        )
+        not_modified = conditional.get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        ndjson = request.accepted_renderer.format == 'ndjson'
+        stream = request.query_params.get('stream') in ('1', 'true')
+        if ndjson or stream:
+            response = streaming.stream_response(
+                queryset,
+                self.get_serializer_class(),
+                self.get_serializer_context(),
+                ndjson=ndjson,
+                chunk_size=self.stream_chunk_size,
+                prefetch=self.get_prefetch_fields(),
+            )
+        elif expand:
+            page = self.paginate_queryset(queryset)
+            serializer = self.get_serializer(page, many=True)
+            response = self.get_paginated_response(serializer.data)
+        else:
+            reader = fast.FastRecipeSerializer(fields)
+            ordering = self.paginator.get_ordering(request, self)
+            page = self.paginate_queryset(
+                reader.get_rows(queryset, extra=[ordering.lstrip('-')])
+            )
+            response = self.get_paginated_response(reader.serialize(page))
 
-        if tags:
-            tag_ids = list(map(int, tags.split(',')))
-            queryset = queryset.filter(tags__id__in=tag_ids)
+        return conditional.set_validators(response, etag,
+                                          state['last_modified'])
 
-        if ingredients:
-            ingredient_ids = list(map(int, ingredients.split(',')))
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+    def retrieve(self, request, *args, **kwargs):
+        """ Retrieve recipe, answering 304 when it did not change """
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            updated_at = self.filter_queryset(self.get_queryset()) \
+                .prefetch_related(None) \
+                .filter(pk=lookup) \
+                .values_list('updated_at', flat=True) \
+                .first()
+        except (TypeError, ValueError):
+            updated_at = None
 
-        return queryset.filter(user=self.request.user)
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag = conditional.make_etag(request.user.id, lookup, updated_at,
+                                     request.accepted_renderer.format)
+        not_modified = conditional.get_not_modified(request, etag, updated_at)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().retrieve(request, *args, **kwargs)
+        return conditional.set_validators(response, etag, updated_at)
 
     def get_serializer_class(self):
         serializers_map = {
             'retrieve': serializers.RecipeDetailSerializer,
             'upload_image': serializers.RecipeImageSerializer,
+            'bulk': serializers.RecipeBulkSerializer,
         }
         return serializers_map.get(self.action, self.serializer_class)
 
@@ -71,9 +306,51 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """ Create new recipe """
         serializer.save(user=self.request.user)
 
+    @action(methods=['POST'], detail=False)
+    def bulk(self, request):
+        """ Create or update many recipes in one request """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        writer = BulkRecipeWriter(request.user,
+                                  serializer.validated_data['recipes'])
+        results = writer.save()
+        failed = all(result['status'] == 'error' for result in results)
+        return Response(
+            {'results': results},
+            status.HTTP_400_BAD_REQUEST if failed else status.HTTP_200_OK
+        )
+
+    @action(methods=['GET'], detail=False, renderer_classes=[
+        renderers.CSVRenderer, renderers.NDJSONRenderer,
+    ])
+    def export(self, request):
+        """
+        Stream every recipe matching the filters with tag and ingredient
+        names, as CSV (default) or NDJSON (`?format=ndjson`).
+        """
+        renderer = request.accepted_renderer
+        fmt = renderer.format
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        queryset = self.filter_queryset(self.get_queryset())
+        response = StreamingHttpResponse(
+            export.export_recipes(queryset, fmt, self.export_chunk_size),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="recipes.{fmt}"'
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """ Upload an image to recipe """
+        """
+        Upload an image to recipe.
+
+        The validated original is stored right away and optimized on
+        the image worker pool, the response reports processing status.
+        """
         recipe = self.get_object()
         serializer = self.get_serializer(
             recipe,
@@ -81,10 +358,84 @@ class RecipeViewSet(viewsets.ModelViewSet):
         )
 
         if serializer.is_valid():
-            serializer.save()
+            recipe = serializer.save(image_status=Recipe.IMAGE_PROCESSING)
+            images.schedule_image_processing(recipe.id, recipe.image.name)
             return Response(
                 serializer.data,
                 status.HTTP_200_OK
             )
 
         return Response(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+
+class AutocompleteView(APIView):
+    """ Suggest names of the user's tags, ingredients and recipes """
+    authentication_classes = (SignedTokenAuthentication,
+                              CachedTokenAuthentication, )
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request):
+        """ Return best prefix or trigram matches of `?q=` """
+        serializer = serializers.AutocompleteQuerySerializer(
+            data=request.query_params
+        )
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        index = autocomplete_indexes.get(request.user.id)
+        matches = index.search(
+            params['q'],
+            params.get('types', serializers.AutocompleteQuerySerializer.KINDS),
+            params['limit']
+        )
+        return Response([
+            {'type': kind, 'id': id_, 'name': name}
+            for kind, id_, name in matches
+        ])
+
+
+class RecipeStatsView(APIView):
+    """ Aggregates of the user's recipes for dashboards """
+    authentication_classes = (SignedTokenAuthentication,
+                              CachedTokenAuthentication, )
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request):
+        """
+        Return count, price and time aggregates and most used tags and
+        ingredients, read from maintained summaries instead of recipes.
+        """
+        return Response(serializers.RecipeStatsSerializer(
+            stats.get_stats(request.user.id)
+        ).data)
+
+
+@require_safe
+def recipe_image_variant(request, filename):
+    """
+    Serve a resized variant of a recipe image, e.g. `?w=200&fmt=webp`.
+
+    Widths are limited to IMAGE_VARIANT_WIDTHS so the variant cache can
+    not be flooded, image names are unique so variants never change.
+    Access is checked as for the image itself by `serve_media`.
+    """
+    fmt = request.GET.get('fmt', 'jpeg')
+    try:
+        width = int(request.GET['w'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('Expected integer "w" parameter.')
+    if width not in getattr(settings, 'IMAGE_VARIANT_WIDTHS', ()):
+        return HttpResponseBadRequest('Unsupported width.')
+    if fmt not in variants.FORMATS:
+        return HttpResponseBadRequest('Unsupported format.')
+
+    source_name = get_media_path(os.path.join('uploads/recipe', filename))
+    if source_name is None or not can_read_media(request, source_name) or \
+            not default_storage.exists(source_name):
+        raise Http404()
+
+    file = variants.get_variant_cache().open(source_name, width, fmt)
+    response = FileResponse(file, content_type=variants.FORMATS[fmt][2])
+    patch_cache_control(response, private=True, max_age=365 * 24 * 3600,
+                        immutable=True)
+    return response
@@ -0,0 +1,111 @@
+import hashlib
+
+from django.conf import settings
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    BaseAuthentication, TokenAuthentication, get_authorization_header
+)
+from rest_framework.authtoken.models import Token
+
+from core.caches import is_shared
+from user import tokens
+from user.tokens import get_token_cache
+
+
+def token_cache_key(key):
+    """
+        Return cache key for the token without exposing the token itself
+    """
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'auth-token:{digest}'
+
+
+def invalidate_token(key):
+    """
+        Drop cached resolution of the token
+    """
+    get_token_cache().delete(token_cache_key(key))
+
+
+def invalidate_user_tokens(user):
+    """
+        Drop cached resolutions of every token of the user
+    """
+    keys = Token.objects.filter(user=user).values_list('key', flat=True)
+    get_token_cache().delete_many([token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+        Token authentication caching token to user resolution.
+
+        Resolved tokens are kept for TOKEN_AUTH_CACHE_TTL seconds and are
+        dropped explicitly when the token is deleted or its user is saved,
+        which covers deactivation and password changes. Those drops only
+        reach other workers through a shared cache backend, so with a
+        process local one every request is checked against the database.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        if not is_shared(cache):
+            return super().authenticate_credentials(key)
+
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is not None and token.key == key:
+            return (token.user, token)
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, token,
+                  getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 300))
+        return (user, token)
+
+
+def signed_tokens_enabled():
+    return getattr(settings, 'SIGNED_TOKEN_AUTH_ENABLED', False)
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """
+        Stateless authentication with HMAC signed access tokens.
+
+        Clients authenticate with `Authorization: Bearer <access token>`.
+        The signature and age of the token are checked without storage,
+        the user and its revocation generation come from the token cache
+        when it is shared between workers, so the database is only hit
+        after the cached user expires.
+    """
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        if not signed_tokens_enabled():
+            return None
+
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            msg = _('Invalid bearer header.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            user_id, generation = tokens.verify_access_token(
+                auth[1].decode()
+            )
+        except (tokens.InvalidToken, UnicodeError):
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        user = tokens.get_token_user(user_id)
+        if user is None or user.token_generation != generation:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            msg = _('User inactive or deleted.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        return (user, None)
+
+    def authenticate_header(self, request):
+        return self.keyword
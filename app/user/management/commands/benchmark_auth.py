@@ -0,0 +1,67 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+
+from user import tokens
+from user.tokens import get_token_cache
+
+
+class Command(BaseCommand):
+    """
+        Django command to compare requests/sec of authentication modes
+        on the profile endpoint. Works in a transaction that is rolled back.
+    """
+    help = 'Benchmark token, cached token and signed token authentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        url = reverse('user:profile')
+
+        allowed_hosts = settings.ALLOWED_HOSTS + ['testserver']
+        with override_settings(SIGNED_TOKEN_AUTH_ENABLED=True,
+                               ALLOWED_HOSTS=allowed_hosts), \
+                transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email='benchmark-auth@example.com',
+                password='benchmark'
+            )
+            token = Token.objects.create(user=user)
+            access = tokens.issue_tokens(user)['access']
+
+            modes = (
+                ('db token', f'Token {token.key}', True),
+                ('cached token', f'Token {token.key}', False),
+                ('signed token', f'Bearer {access}', False),
+            )
+            for name, header, clear_cache in modes:
+                rate = self.measure(url, header, count, clear_cache)
+                self.stdout.write(f'{name:>14}: {rate:10.1f} requests/sec')
+
+            transaction.set_rollback(True)
+        get_token_cache().clear()
+
+    def measure(self, url, header, count, clear_cache):
+        """
+            Return requests/sec for authenticated profile requests
+        """
+        client = Client(HTTP_AUTHORIZATION=header)
+        cache = get_token_cache()
+        client.get(url)
+
+        started = time.perf_counter()
+        for _ in range(count):
+            if clear_cache:
+                cache.clear()
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+        return count / (time.perf_counter() - started)
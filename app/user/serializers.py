@@ -30,6 +30,7 @@ class UserSerializer(serializers.ModelSerializer):
 
         if password:
             user.set_password(password)
+            user.token_generation += 1
             user.save()
         return user
 
@@ -63,3 +64,10 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """
+        Serializer for signed refresh token rotation
+    """
+    refresh = serializers.CharField(trim_whitespace=False)
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token, invalidate_user_tokens
+from user.tokens import invalidate_user
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+        Forget cached resolution of deleted token
+    """
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_saved_user_tokens(sender, instance, created, **kwargs):
+    """
+        Forget cached tokens of changed user, e.g. deactivated one
+    """
+    if not created:
+        invalidate_user_tokens(instance)
+        invalidate_user(instance)
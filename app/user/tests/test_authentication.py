@@ -0,0 +1,117 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+USER_URL = reverse('user:profile')
+
+
+def shared_cache_settings(test):
+    """
+        Use a file based cache, shared between processes, in the test
+    """
+    cache_dir = tempfile.TemporaryDirectory()
+    test.addCleanup(cache_dir.cleanup)
+    settings = override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': cache_dir.name,
+    }})
+    settings.enable()
+    test.addCleanup(settings.disable)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """
+        Test token authentication backed by cache
+    """
+
+    def setUp(self):
+        shared_cache_settings(self)
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@mail.com',
+            password='secret',
+            name='Bob'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_resolved_from_cache(self):
+        """
+            Only the first request should look the token up in database
+        """
+        with self.assertNumQueries(1):
+            self.client.get(USER_URL)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(USER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_invalid_token_rejected(self):
+        """
+            Unknown tokens should not be cached as valid
+        """
+        self.client.credentials(HTTP_AUTHORIZATION='Token unknown')
+
+        response = self.client.get(USER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        """
+            Deleting the token should invalidate cached resolution
+        """
+        self.client.get(USER_URL)
+
+        self.token.delete()
+        response = self.client.get(USER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """
+            Deactivating the user should invalidate cached resolution
+        """
+        self.client.get(USER_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(USER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """
+            Changing the password should drop cached user
+        """
+        self.client.get(USER_URL)
+
+        self.client.patch(USER_URL, {'password': 'new secret',
+                                     'name': 'Alice'})
+
+        with self.assertNumQueries(1):
+            response = self.client.get(USER_URL)
+        self.assertEqual(response.data['name'], 'Alice')
+
+    def test_process_local_cache_not_trusted(self):
+        """
+            Tokens should be checked in database without a shared cache
+        """
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }}):
+            for _ in range(2):
+                with self.assertNumQueries(1):
+                    response = self.client.get(USER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
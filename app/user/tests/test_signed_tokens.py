@@ -0,0 +1,237 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import UsedRefreshToken
+from user.tests.test_authentication import shared_cache_settings
+
+
+SIGNED_TOKEN_URL = reverse('user:signed-token')
+REFRESH_TOKEN_URL = reverse('user:refresh-token')
+REVOKE_TOKENS_URL = reverse('user:revoke-tokens')
+USER_URL = reverse('user:profile')
+
+
+@override_settings(SIGNED_TOKEN_AUTH_ENABLED=True)
+class SignedTokenApiTests(TestCase):
+    """
+        Test stateless signed tokens
+    """
+
+    def setUp(self):
+        shared_cache_settings(self)
+        cache.clear()
+        self.credentials = {'email': 'user@mail.com', 'password': 'secret'}
+        self.user = get_user_model().objects.create_user(**self.credentials)
+        self.client = APIClient()
+
+    def obtain_tokens(self):
+        response = self.client.post(SIGNED_TOKEN_URL, self.credentials)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def get_profile(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        return self.client.get(USER_URL)
+
+    def test_obtain_and_use_access_token(self):
+        """
+            Access token should authenticate requests
+        """
+        pair = self.obtain_tokens()
+
+        response = self.get_profile(pair['access'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+        self.assertIn('refresh', pair)
+
+    def test_access_token_verified_without_database(self):
+        """
+            Access token with cached user should not query database
+        """
+        access = self.obtain_tokens()['access']
+        self.get_profile(access)
+
+        with self.assertNumQueries(0):
+            response = self.get_profile(access)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_credentials(self):
+        """
+            Tokens are not issued for invalid credentials
+        """
+        response = self.client.post(SIGNED_TOKEN_URL,
+                                    {'email': 'user@mail.com',
+                                     'password': 'wrong'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tampered_token_rejected(self):
+        """
+            Modified access token should be rejected
+        """
+        access = self.obtain_tokens()['access']
+
+        response = self.get_profile(access[:-1] + 'x')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_token_rejected(self):
+        """
+            Access token older than its lifetime should be rejected
+        """
+        access = self.obtain_tokens()['access']
+
+        with patch('time.time', return_value=10 ** 10):
+            response = self.get_profile(access)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token_is_not_access_token(self):
+        """
+            Refresh token can not authenticate requests
+        """
+        refresh = self.obtain_tokens()['refresh']
+
+        response = self.get_profile(refresh)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rotation(self):
+        """
+            Refresh token should be exchanged once for a new pair
+        """
+        refresh = self.obtain_tokens()['refresh']
+
+        response = self.client.post(REFRESH_TOKEN_URL, {'refresh': refresh})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['refresh'], refresh)
+        profile = self.get_profile(response.data['access'])
+        self.assertEqual(profile.status_code, status.HTTP_200_OK)
+
+    def test_refresh_reuse_revokes_tokens(self):
+        """
+            Reusing rotated refresh token should revoke every token
+        """
+        refresh = self.obtain_tokens()['refresh']
+        pair = self.client.post(REFRESH_TOKEN_URL, {'refresh': refresh}).data
+
+        response = self.client.post(REFRESH_TOKEN_URL, {'refresh': refresh})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        profile = self.get_profile(pair['access'])
+        self.assertEqual(profile.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_reuse_detected_by_other_workers(self):
+        """
+            Used refresh tokens should be known outside of the cache
+        """
+        refresh = self.obtain_tokens()['refresh']
+        self.client.post(REFRESH_TOKEN_URL, {'refresh': refresh})
+        cache.clear()
+
+        response = self.client.post(REFRESH_TOKEN_URL, {'refresh': refresh})
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_expired_used_refresh_tokens_removed(self):
+        """
+            Ids of refresh tokens that expired should be forgotten
+        """
+        refresh = self.obtain_tokens()['refresh']
+        UsedRefreshToken.objects.create(jti='expired',
+                                        expires_at='2000-01-01T00:00Z')
+
+        self.client.post(REFRESH_TOKEN_URL, {'refresh': refresh})
+
+        self.assertFalse(
+            UsedRefreshToken.objects.filter(jti='expired').exists()
+        )
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_revocation_seen_without_shared_cache(self):
+        """
+            Process local cache should not hide revocations of other workers
+        """
+        access = self.obtain_tokens()['access']
+        self.get_profile(access)
+
+        get_user_model().objects.filter(pk=self.user.pk) \
+            .update(token_generation=self.user.token_generation + 1)
+
+        response = self.get_profile(access)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_tokens(self):
+        """
+            Revoking should invalidate previously issued tokens
+        """
+        pair = self.obtain_tokens()
+        self.get_profile(pair['access'])
+
+        response = self.client.post(REVOKE_TOKENS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        profile = self.get_profile(pair['access'])
+        self.assertEqual(profile.status_code, status.HTTP_401_UNAUTHORIZED)
+        refreshed = self.client.post(REFRESH_TOKEN_URL,
+                                     {'refresh': pair['refresh']})
+        self.assertEqual(refreshed.status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_revokes_tokens(self):
+        """
+            Changing password should invalidate signed tokens
+        """
+        access = self.obtain_tokens()['access']
+        self.get_profile(access)
+
+        self.client.patch(USER_URL, {'password': 'new secret'})
+
+        response = self.get_profile(access)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """
+            Signed tokens of inactive users should be rejected
+        """
+        access = self.obtain_tokens()['access']
+        self.get_profile(access)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.get_profile(access)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_database_tokens_still_accepted(self):
+        """
+            Both token types should be accepted during migration
+        """
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        response = self.client.get(USER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(SIGNED_TOKEN_AUTH_ENABLED=False)
+    def test_signed_tokens_disabled(self):
+        """
+            Signed token endpoints are hidden unless enabled
+        """
+        response = self.client.post(SIGNED_TOKEN_URL, self.credentials)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,156 @@
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.caches import is_shared
+from core.models import UsedRefreshToken
+
+
+ACCESS_SALT = 'user.tokens.access'
+REFRESH_SALT = 'user.tokens.refresh'
+
+
+class InvalidToken(Exception):
+    """
+        Raised when signed token is malformed, expired or revoked
+    """
+
+
+def get_token_cache():
+    """
+        Return cache used to store resolved tokens and users
+    """
+    return caches[getattr(settings, 'TOKEN_AUTH_CACHE', 'default')]
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def get_token_user(user_id):
+    """
+        Return user by id, cached for TOKEN_AUTH_CACHE_TTL seconds.
+
+        Revocations made by other workers only drop the cached user from
+        a shared cache, without one the user is read from database.
+    """
+    cache = get_token_cache()
+    if not is_shared(cache):
+        return get_user_model().objects.filter(pk=user_id).first()
+
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model().objects.filter(pk=user_id).first()
+        if user is None:
+            return None
+        cache.set(key, user, getattr(settings, 'TOKEN_AUTH_CACHE_TTL', 300))
+    return user
+
+
+def invalidate_user(user):
+    """
+        Drop cached user so token checks see its latest state
+    """
+    get_token_cache().delete(user_cache_key(user.pk))
+
+
+def access_token_ttl():
+    return getattr(settings, 'SIGNED_TOKEN_ACCESS_TTL', 300)
+
+
+def refresh_token_ttl():
+    return getattr(settings, 'SIGNED_TOKEN_REFRESH_TTL', 14 * 24 * 3600)
+
+
+def issue_tokens(user):
+    """
+        Return new access and refresh token pair for the user
+    """
+    payload = {'uid': user.pk, 'gen': user.token_generation}
+    return {
+        'access': signing.dumps(payload, salt=ACCESS_SALT),
+        'refresh': signing.dumps(dict(payload, jti=uuid.uuid4().hex),
+                                 salt=REFRESH_SALT),
+        'expires_in': access_token_ttl(),
+    }
+
+
+def read_token(token, salt, max_age):
+    """
+        Verify token signature and age and return its payload
+    """
+    try:
+        payload = signing.loads(token, salt=salt, max_age=max_age)
+        return int(payload['uid']), int(payload['gen']), payload
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken()
+
+
+def verify_access_token(token):
+    """
+        Return (user id, generation) of valid access token
+    """
+    user_id, generation, _ = read_token(token, ACCESS_SALT,
+                                        access_token_ttl())
+    return user_id, generation
+
+
+def rotate_refresh_token(token):
+    """
+        Exchange refresh token for new token pair.
+
+        Each refresh token can be used once. Reusing a rotated token is
+        treated as a leak and revokes every signed token of the user.
+        Used token ids are stored in database until the tokens expire, so
+        every worker sees them.
+    """
+    user_id, generation, payload = read_token(token, REFRESH_SALT,
+                                              refresh_token_ttl())
+    user = get_user_model().objects.filter(pk=user_id, is_active=True) \
+        .first()
+    if user is None or user.token_generation != generation:
+        raise InvalidToken()
+
+    jti = payload.get('jti')
+    if not isinstance(jti, str):
+        raise InvalidToken()
+    if not mark_refresh_token_used(jti):
+        revoke_tokens(user)
+        raise InvalidToken()
+
+    return issue_tokens(user)
+
+
+def mark_refresh_token_used(jti):
+    """
+        Record refresh token id as used, return False if it already was
+    """
+    now = timezone.now()
+    UsedRefreshToken.objects.filter(expires_at__lt=now).delete()
+    try:
+        with transaction.atomic():
+            UsedRefreshToken.objects.create(
+                jti=jti,
+                expires_at=now + timedelta(seconds=refresh_token_ttl())
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def revoke_tokens(user):
+    """
+        Invalidate every signed token issued to the user so far
+    """
+    get_user_model().objects.filter(pk=user.pk) \
+        .update(token_generation=F('token_generation') + 1)
+    user.refresh_from_db(fields=['token_generation'])
+    invalidate_user(user)
@@ -9,5 +9,11 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserAPIView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
+    path('token/signed/', views.CreateSignedTokenView.as_view(),
+         name='signed-token'),
+    path('token/refresh/', views.RefreshSignedTokenView.as_view(),
+         name='refresh-token'),
+    path('token/revoke/', views.RevokeSignedTokensView.as_view(),
+         name='revoke-tokens'),
     path('profile/', views.ManageUserView.as_view(), name='profile'),
 ]
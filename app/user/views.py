@@ -1,8 +1,19 @@
-from rest_framework import generics, authentication, permissions
+from django.utils.translation import ugettext_lazy as _
+
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
-from user.serializers import UserSerializer, AuthTokenSerializer
+from user import tokens
+from user.authentication import (
+    CachedTokenAuthentication, SignedTokenAuthentication,
+    signed_tokens_enabled
+)
+from user.serializers import (
+    UserSerializer, AuthTokenSerializer, RefreshTokenSerializer
+)
 
 
 class CreateUserAPIView(generics.CreateAPIView):
@@ -25,7 +36,8 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         Manage the authenticated user
     """
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication, )
+    authentication_classes = (SignedTokenAuthentication,
+                              CachedTokenAuthentication, )
     permission_classes = (permissions.IsAuthenticated, )
 
     def get_object(self):
@@ -33,3 +45,62 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
             Retrieve and return the authenticated user
         """
         return self.request.user
+
+
+class SignedTokenViewMixin:
+    """
+        Hide signed token endpoints unless the mode is enabled
+    """
+
+    def initial(self, request, *args, **kwargs):
+        if not signed_tokens_enabled():
+            raise NotFound()
+        super().initial(request, *args, **kwargs)
+
+    def get_authenticate_header(self, request):
+        return SignedTokenAuthentication.keyword
+
+
+class CreateSignedTokenView(SignedTokenViewMixin, generics.GenericAPIView):
+    """
+        Create signed access and refresh tokens for the user
+    """
+    serializer_class = AuthTokenSerializer
+    authentication_classes = ()
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(tokens.issue_tokens(serializer.validated_data['user']))
+
+
+class RefreshSignedTokenView(SignedTokenViewMixin, generics.GenericAPIView):
+    """
+        Exchange refresh token for a new token pair
+    """
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = ()
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            pair = tokens.rotate_refresh_token(
+                serializer.validated_data['refresh']
+            )
+        except tokens.InvalidToken:
+            raise AuthenticationFailed(_('Invalid refresh token.'))
+        return Response(pair)
+
+
+class RevokeSignedTokensView(SignedTokenViewMixin, generics.GenericAPIView):
+    """
+        Revoke every signed token of the authenticated user
+    """
+    authentication_classes = (SignedTokenAuthentication,
+                              CachedTokenAuthentication, )
+    permission_classes = (permissions.IsAuthenticated, )
+
+    def post(self, request, *args, **kwargs):
+        tokens.revoke_tokens(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)